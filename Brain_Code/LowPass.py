@@ -1,5 +1,9 @@
+import logging
+import math
 import time
 
+import numpy as np
+
 
 class LowPassFilter:
     def __init__(self, cutoff_hz):
@@ -8,18 +12,20 @@ class LowPassFilter:
         self.last_time = None
 
     def compute_alpha(self, cutoff, dt):
-        rc = 1 / (2 * 3.1416 * cutoff)
+        rc = 1 / (2 * math.pi * cutoff)
         return dt / (rc + dt)
 
-    def filter(self, input_value):
-        now = time.time()
+    def filter(self, input_value, dt=None):
+        # dt: feste Abtastzeit (Simulation), sonst aus der Uhrzeit
+        if dt is None:
+            now = time.time()
 
-        if self.last_time is None:
-            dt = 0.02  # Defaultwert (für z. B. 50 Hz) beim ersten Aufruf
-        else:
-            dt = now - self.last_time
+            if self.last_time is None:
+                dt = 0.02  # Defaultwert (für z. B. 50 Hz) beim ersten Aufruf
+            else:
+                dt = now - self.last_time
 
-        self.last_time = now
+            self.last_time = now
         alpha = self.compute_alpha(self.cutoff_hz, dt)
 
         if self.last_output is None:
@@ -28,3 +34,147 @@ class LowPassFilter:
             self.last_output = alpha * input_value + (1 - alpha) * self.last_output
 
         return self.last_output
+
+
+# filter types of FilterBank channels
+LOWPASS = "lowpass"  # first order, same as LowPassFilter
+BUTTER2 = "butter2"  # second order Butterworth (biquad)
+
+
+class FilterBank:
+    """
+    All filter channels of the loop in one array, updated with one call per tick.
+
+    channels: list of (name, cutoff_hz) or (name, cutoff_hz, type) with type
+    LOWPASS or BUTTER2. Every channel is a biquad in direct form I
+    (first order: b1 = b2 = a2 = 0)
+        y = b0 x + b1 x1 + b2 x2 - a1 y1 - a2 y2
+    and all channels together are one matrix step y = M [x, x1, y1, x2, y2]
+    (like LQG). The state holds the past inputs and outputs only, so the
+    coefficients can change between two steps without a jump. M is
+    precomputed for the nominal `dt`; filter() takes the measured dt of the
+    tick and only rebuilds it when the dt differs by more than `tolerance`
+    (e.g. after an overrun). A channel starts (and restarts after reset()) at
+    its first input, like LowPassFilter.
+    """
+    def __init__(self, channels, dt=0.02, tolerance=0.05, name="FilterBank", logging_level=logging.INFO):
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+        self.names = [channel[0] for channel in channels]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.cutoff = np.array([channel[1] for channel in channels], dtype=np.float64)
+        self.types = [channel[2] if len(channel) > 2 else LOWPASS for channel in channels]
+        for name, kind in zip(self.names, self.types):
+            if kind not in (LOWPASS, BUTTER2):
+                raise ValueError(f"{name}: unbekannter Filtertyp {kind}")
+        self.butter = np.array([kind == BUTTER2 for kind in self.types])
+
+        self.n = len(self.names)
+        self.dt = dt
+        self.tolerance = tolerance
+        self.nominal = self.coefficients(dt)
+        self.M_nominal = self.matrix(self.nominal)
+        self.z = np.zeros(5 * self.n)  # [x, x1, y1, x2, y2]
+        self.y = np.zeros(self.n)
+        self.primed = np.zeros(self.n, dtype=bool)
+        self.all_primed = False
+
+    def coefficients(self, dt):
+        """b0, b1, b2, a1, a2 of all channels for the sample time dt."""
+        b0, b1, b2, a1, a2 = np.zeros((5, self.n))
+
+        # erste Ordnung: y = y + alpha (x - y)
+        rc = 1 / (2 * math.pi * self.cutoff)
+        alpha = dt / (rc + dt)
+        b0[:] = alpha
+        a1[:] = alpha - 1.0
+
+        if self.butter.any():
+            # Bilineartransformation mit Vorverzerrung, Grenzfrequenz unter Nyquist
+            nyquist = 0.5 / dt
+            cutoff = self.cutoff[self.butter]
+            if np.any(cutoff >= 0.95 * nyquist):
+                self.logger.warning(f"Grenzfrequenz nahe Nyquist ({nyquist:.1f} Hz), auf 0.45/dt begrenzt")
+                cutoff = np.minimum(cutoff, 0.9 * nyquist)
+            K = np.tan(math.pi * cutoff * dt)
+            norm = 1 / (1 + math.sqrt(2) * K + K * K)
+            b0[self.butter] = K * K * norm
+            b1[self.butter] = 2 * K * K * norm
+            b2[self.butter] = K * K * norm
+            a1[self.butter] = 2 * (K * K - 1) * norm
+            a2[self.butter] = (1 - math.sqrt(2) * K + K * K) * norm
+        return b0, b1, b2, a1, a2
+
+    def matrix(self, coefficients):
+        """Step matrix of all channels, y = M [x, x1, y1, x2, y2]."""
+        b0, b1, b2, a1, a2 = coefficients
+        n = self.n
+        M = np.zeros((n, 5 * n))
+        M[:, :n] = np.diag(b0)
+        M[:, n:2 * n] = np.diag(b1)
+        M[:, 2 * n:3 * n] = np.diag(-a1)
+        M[:, 3 * n:4 * n] = np.diag(b2)
+        M[:, 4 * n:] = np.diag(-a2)
+        return M
+
+    def _prime(self):
+        """Steady state of the new channels for their current input."""
+        n = self.n
+        new = np.flatnonzero(~self.primed)
+        x = self.z[new]
+        for k in range(1, 5):
+            self.z[k * n + new] = x
+        self.primed[:] = True
+        self.all_primed = True
+
+    def reset(self, names=None):
+        """Restarts the given (default: all) channels at their next input."""
+        if names is None:
+            self.primed[:] = False
+        else:
+            for name in names:
+                self.primed[self.index[name]] = False
+        self.all_primed = False
+
+    def filter(self, values, dt=None):
+        """Filters one sample of every channel (sequence in channel order), returns the output array."""
+        n = self.n
+        z = self.z
+        z[:n] = values
+        if not self.all_primed:
+            self._prime()
+        if dt is None or abs(dt - self.dt) <= self.tolerance * self.dt:
+            M = self.M_nominal
+        else:
+            M = self.matrix(self.coefficients(dt))
+        y = self.y
+        np.dot(M, z, out=y)
+        z[3 * n:] = z[n:3 * n]
+        z[n:2 * n] = z[:n]
+        z[2 * n:3 * n] = y
+        return y
+
+    def output(self, name):
+        return self.y[self.index[name]]
+
+
+if __name__ == "__main__":
+    # Benchmark gegen einzelne LowPassFilter (Vergleich und Frequenzgang: tests/test_lowpass.py)
+    dt = 0.02
+    channels = [("pitch", 25.0), ("gyro_x", 25.0), ("vel_left", 5.0), ("vel_right", 5.0),
+                ("sp_p", 0.5), ("sp_x", 0.5), ("sp_pv", 0.5), ("sp_v", 0.5), ("sp_yaw", 0.5)]
+    bank = FilterBank(channels, dt=dt)
+    singles = [LowPassFilter(cutoff) for _, cutoff in channels]
+    row = np.random.default_rng(0).normal(size=len(channels)).tolist()
+
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        [f.filter(value, dt) for f, value in zip(singles, row)]
+    t_single = (time.perf_counter() - start) / n
+    start = time.perf_counter()
+    for _ in range(n):
+        bank.filter(row, dt).tolist()
+    t_bank = (time.perf_counter() - start) / n
+    print(f"FilterBank: {t_bank * 1e6:.2f} µs, 9x LowPassFilter: {t_single * 1e6:.2f} µs")
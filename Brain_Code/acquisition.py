@@ -0,0 +1,135 @@
+import collections
+import logging
+import threading
+import time
+import traceback
+
+
+class Sample:
+    __slots__ = ("value", "time", "seq")
+
+    def __init__(self, value, time, seq):
+        self.value = value
+        self.time = time
+        self.seq = seq
+
+    def age(self, now):
+        return now - self.time
+
+
+class LatestSlot:
+    """
+    Latest-value slot for exactly one writer.
+
+    publish() replaces a single reference, which is atomic under the GIL, so
+    readers never wait for the writer and always see a complete sample.
+    """
+    def __init__(self):
+        self.sample = None
+        self.seq = 0
+
+    def publish(self, value, t):
+        self.seq += 1
+        self.sample = Sample(value, t, self.seq)
+
+    def get(self):
+        return self.sample
+
+    def age(self, now):
+        sample = self.sample
+        return float("inf") if sample is None else now - sample.time
+
+
+class SampleRing:
+    """Small ring of the last samples; deque.append() is thread-safe."""
+    def __init__(self, size=16):
+        self.samples = collections.deque(maxlen=size)
+
+    def append(self, sample):
+        self.samples.append(sample)
+
+    def latest(self):
+        try:
+            return self.samples[-1]
+        except IndexError:
+            return None
+
+    def window(self, since):
+        return [sample for sample in self.samples.copy() if sample.time >= since]
+
+    def bracket(self, t):
+        """The samples right before and after time t, None where the ring does not reach."""
+        samples = self.samples.copy()
+        after = None
+        for sample in reversed(samples):
+            if sample.time <= t:
+                return sample, after
+            after = sample
+        return None, after
+
+
+class Reader:
+    """
+    Reads a device on its own thread and publishes timestamped samples.
+
+    `read` is called repeatedly and has to return a new object per sample (or
+    None if nothing was received). `period` limits the read rate for devices
+    that do not block on their own.
+    """
+    def __init__(self, read, name="Reader", logging_level=logging.INFO, period=0.0, ring=0,
+                 clock=time.perf_counter):
+        self.read = read
+        self.period = period
+        self.clock = clock
+        self.slot = LatestSlot()
+        self.ring = SampleRing(ring) if ring else None
+
+        self.thread = None
+        self.running = False
+        self.errors = 0
+
+        self.name = name
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._thread_loop, name=self.name, daemon=True)
+            self.thread.start()
+            self.logger.info("Reader-Thread gestartet.")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.logger.info("Reader-Thread gestoppt.")
+
+    def _thread_loop(self):
+        next_time = self.clock()
+        while self.running:
+            try:
+                value = self.read()
+                if value is not None:
+                    now = self.clock()
+                    self.slot.publish(value, now)
+                    if self.ring is not None:
+                        self.ring.append(self.slot.sample)
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"Fehler im Reader-Thread: {e}")
+                traceback.print_exc()
+                time.sleep(0.01)
+            if self.period > 0:
+                next_time += self.period
+                remaining = next_time - self.clock()
+                if remaining > 0:
+                    time.sleep(remaining)
+                else:
+                    next_time = self.clock()
+
+    def get(self):
+        return self.slot.get()
+
+    def age(self, now):
+        return self.slot.age(now)
@@ -0,0 +1,25 @@
+class VirtualClock:
+    """
+    Simulated time for the scheduler and the simulated devices.
+
+    Used as clock=clock, sleep=clock.sleep of the (RateGroup)Scheduler: sleep()
+    does not wait but moves the time forward, so a loop runs as fast as its
+    code allows. Time only passes in sleep(), the work of a tick takes no
+    simulated time (lateness is always 0, the profiler and the task budgets
+    of the RateGroupScheduler still measure the real cost).
+    """
+    def __init__(self, start=0.0):
+        self.now = start
+        self.sleeps = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+        self.sleeps += 1
+
+    def advance(self, seconds):
+        self.sleep(seconds)
+
@@ -1,9 +1,16 @@
 import logging
 import time
 import numpy as np
-import spidev
 import ws2812
 
+SpidevImported = False
+try:
+    import spidev
+    SpidevImported = True
+except ImportError:
+    # print("Warning: no spidev found, EYES needs an spi object (hal.NullSPI)")
+    pass
+
 COLORS = {
     "red": [0, 255, 0],
     "green": [255, 0, 0],
@@ -16,12 +23,17 @@ COLORS = {
 }
 
 class EYES:
-    def __init__(self, name = "Eyes", logging_level = logging.INFO):
+    def __init__(self, name = "Eyes", logging_level = logging.INFO, spi=None, gamma=1.0, brightness=1.0):
         self.frequency = 0.0
         self.now = 0.0
         self.last_time = 0.0
 
-        self.spi = spidev.SpiDev()
+        # own SPI device of the Raspberry Pi or the one passed in (simulation)
+        self.spi = spi
+        # table encoder with persistent SPI buffer, gamma/brightness are applied in its table
+        self.gamma = gamma
+        self.brightness = brightness
+        self.encoder = None
 
         # Jedes NeoHex hat 37 LEDs, beide zusammen 74
         self.num_leds_per_module = 37
@@ -59,8 +71,11 @@ class EYES:
         self.logger.setLevel(logging_level)
 
         try:
-            self.spi.open(0, 0)
-            ws2812.write2812(self.spi, self.leds)
+            if self.spi is None:
+                self.spi = spidev.SpiDev()
+                self.spi.open(0, 0)
+            self.encoder = ws2812.WS2812Encoder(self.spi, self.num_leds_total, gamma=gamma, brightness=brightness)
+            self.encoder.write(self.leds)
 
             self.logger.info("Erfolgreich initialisiert.")
         except Exception as e:
@@ -73,14 +88,14 @@ class EYES:
             self.last_time = self.now
 
             try:
-                ws2812.write2812(self.spi, [[10, 0, 10]])  # [G, R, B] :contentReference[oaicite:11]{index=11}
+                self.encoder.write([[10, 0, 10]])  # [G, R, B] :contentReference[oaicite:11]{index=11}
 
                 self.logger.debug("I'm alive")
             except Exception as e:
                 self.logger.error(str(e))
 
     def clear(self):
-        ws2812.write2812(self.spi, [COLORS["black"]] * self.num_leds_total)
+        self.encoder.write([COLORS["black"]] * self.num_leds_total)
 
     def clear_range(self, start, end):
         for i in range(start, end):
@@ -140,6 +155,6 @@ class EYES:
 
     def show(self):
         if not self.leds == self.leds_last:
-            ws2812.write2812(self.spi, self.leds)
+            self.encoder.write(self.leds)
             for i in range(self.num_leds_total):
                 self.leds_last[i] = self.leds[i]
\ No newline at end of file
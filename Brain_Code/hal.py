@@ -0,0 +1,294 @@
+"""
+Device backends of main_loop.
+
+main_loop only uses these interfaces:
+    imu:    loop() -> dict (pitch, gyro_x, yaw, ...), reset(), start(), stop()
+    motors: get() -> (left, right) dicts, set(left, right), reset()
+    eyes:   drawing methods of EYES, show(), clear()
+    ps4:    start(), get() -> dict, stop()
+
+robot_devices() builds the hardware classes; their modules (board, busio,
+serial, evdev, ...) are imported only there. sim_devices() builds the same
+interfaces on top of a SimPlant, so the whole loop runs without hardware:
+motor commands drive the model, the model state is what the simulated IMU
+and wheel encoders report. With a VirtualClock the loop runs faster than
+real time.
+"""
+import logging
+import math
+import random
+
+from eyes import EYES
+
+
+class Devices:
+    """The devices of one backend."""
+    def __init__(self, backend, imu, motors, eyes, ps4, plant=None):
+        self.backend = backend
+        self.imu = imu
+        self.motors = motors
+        self.eyes = eyes
+        self.ps4 = ps4
+        self.plant = plant
+
+
+def robot_devices(imu_streaming=False, imu_sampling="interpolate", imu_window=0.01, motor_aggregate=False,
+                  motor_window=0.02, motor_protocol="ascii"):
+    """The real robot: BNO085, two SimpleFOC boards, LED eyes and the PS4 controller."""
+    from imu import IMU
+    from motor import MOTOR, DualMotor
+    from ps4_controller import PS4Controller
+
+    if imu_streaming:
+        imu = IMU(streaming=True, sampling=imu_sampling, window=imu_window)
+    else:
+        imu = IMU()
+    motor_left = MOTOR(name="Motor_Left",
+                       port="/dev/serial/by-id/usb-STMicroelectronics_STM32_STLink_0668FF485671664867185737-if02",
+                       invert=True, min_max=7.5,
+                       aggregate=motor_aggregate, window=motor_window,
+                       protocol=motor_protocol)
+    motor_right = MOTOR(name="Motor_Right",
+                        port="/dev/serial/by-id/usb-STMicroelectronics_STM32_STLink_066EFF485671664867185641-if02",
+                        invert=True, min_max=7.5,
+                        aggregate=motor_aggregate, window=motor_window,
+                        protocol=motor_protocol)
+    # both ports are read and written together
+    motors = DualMotor(motor_left, motor_right)
+    return Devices("robot", imu, motors, EYES(), PS4Controller())
+
+
+def sim_devices(physics, clock, pitch=0.02, noise=True, seed=0, ps4=None):
+    """Simulated robot on `clock`, starts held upright at `pitch` rad."""
+    plant = SimPlant(physics=physics, clock=clock, pitch=pitch, seed=seed)
+    if not noise:
+        plant.noise = dict.fromkeys(plant.noise, 0.0)
+    return Devices("sim", SimIMU(plant), SimMotors(plant), EYES(spi=NullSPI()),
+                   ps4 if ps4 is not None else SimPS4(clock), plant)
+
+
+class SimPlant:
+    """
+    Balancing robot for sim_devices(): pendulum on two velocity controlled wheels.
+
+    Same equations as continuous_model() (lqr.py) with sin/cos of the pitch,
+    each wheel follows its command with K_m and tau_m, pitch acceleration
+    from the mean wheel acceleration. The model is integrated (RK4, `step` s)
+    up to the clock time whenever a device reads or writes it. The robot is
+    held at its start pitch until the motors are enabled the first time (like
+    someone holding it up at the start) and lies on the ground once it
+    tipped over 90 degrees.
+    """
+    def __init__(self, name="SimPlant", logging_level=logging.INFO, physics={}, clock=None, pitch=0.02,
+                 step=0.001, seed=0):
+        self.clock = clock
+        self.step = step
+        self.r = physics["r"]
+        self.r_y = physics["r_y"]
+        self.K_m = physics["K_m"]
+        self.tau_m = physics["tau_m"]
+        self.a = physics["m"] * physics["g"] * physics["R"] / physics["J"]
+        self.c = physics["m"] * physics["r"] * physics["R"] / physics["J"]
+
+        # [pitch, pitch velocity, angle left, angle right, velocity left, velocity right]
+        self.x = [pitch, 0.0, 0.0, 0.0, 0.0, 0.0]
+        self.u = [0.0, 0.0]
+        self.held = True
+        self.fallen = False
+        self.t = clock()
+        self.steps = 0
+
+        # std of the sensor noise
+        self.noise = {"pitch": 0.002, "gyro": 0.02, "position": 0.001, "velocity": 0.05}
+        self.random = random.Random(seed)
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+    def command(self, side, en, sp):
+        """Motor command of one side (0 left, 1 right) in the units of MotorState.sp."""
+        self.advance()
+        self.u[side] = sp if en else 0.0
+        if en and self.held:
+            self.held = False
+            self.logger.info("Losgelassen.")
+
+    def _derivative(self, x):
+        pitch, pv, _, _, w_l, w_r = x
+        dw_l = (self.K_m * self.u[0] - w_l) / self.tau_m
+        dw_r = (self.K_m * self.u[1] - w_r) / self.tau_m
+        if self.held or self.fallen:
+            dpv = 0.0
+            pv = 0.0
+        else:
+            dpv = self.a * math.sin(pitch) - self.c * 0.5 * (dw_l + dw_r) * math.cos(pitch)
+        return [pv, dpv, w_l, w_r, dw_l, dw_r]
+
+    def advance(self):
+        """Integrates up to the clock time."""
+        now = self.clock()
+        while self.t < now:
+            h = min(self.step, now - self.t)
+            x = self.x
+            k1 = self._derivative(x)
+            k2 = self._derivative([xi + 0.5 * h * ki for xi, ki in zip(x, k1)])
+            k3 = self._derivative([xi + 0.5 * h * ki for xi, ki in zip(x, k2)])
+            k4 = self._derivative([xi + h * ki for xi, ki in zip(x, k3)])
+            self.x = [xi + h / 6.0 * (a + 2.0 * b + 2.0 * c + d) for xi, a, b, c, d in zip(x, k1, k2, k3, k4)]
+            self.t += h
+            self.steps += 1
+            if not self.fallen and abs(self.x[0]) >= math.pi / 2:
+                self.fallen = True
+                self.x[0] = math.copysign(math.pi / 2, self.x[0])
+                self.x[1] = 0.0
+                self.logger.info("Umgefallen.")
+
+    def measure(self, key, value):
+        std = self.noise[key]
+        return value + self.random.gauss(0.0, std) if std else value
+
+    @property
+    def pitch(self):
+        return self.x[0]
+
+    @property
+    def yaw(self):
+        return self.r * (self.x[3] - self.x[2]) / self.r_y
+
+
+class SimIMU:
+    """IMU interface on a SimPlant, reports the pitch like IMU.loop() (upright = 0)."""
+    def __init__(self, plant, name="SimIMU", logging_level=logging.INFO):
+        self.plant = plant
+        self.yaw_offset = 0.0
+        self.data = {
+            "roll": 0.0,
+            "pitch": 0.0,
+            "yaw": 0.0,
+            "gyro_x": 0.0,
+            "gyro_y": 0.0,
+            "gyro_z": 0.0,
+            "time": 0.0,
+            "frequency": 0.0,
+            "age": 0.0
+        }
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def loop(self, at=None):
+        plant = self.plant
+        plant.advance()
+        self.data["pitch"] = plant.measure("pitch", plant.x[0])
+        self.data["gyro_x"] = plant.measure("gyro", plant.x[1])
+        self.data["yaw"] = plant.yaw - self.yaw_offset
+        self.data["gyro_z"] = plant.r * (plant.x[5] - plant.x[4]) / plant.r_y
+        self.data["time"] = plant.t
+        return self.data
+
+    def reset(self):
+        self.yaw_offset = self.plant.yaw
+
+
+class SimMotors:
+    """DualMotor interface on a SimPlant: wheel angle and velocity as MOTOR reports them."""
+    def __init__(self, plant, name="SimMotors", logging_level=logging.INFO):
+        self.plant = plant
+        self.offset = [0.0, 0.0]
+        self.data = tuple({
+            "sp": 0.0,
+            "en": False,
+            "position": 0.0,
+            "velocity": 0.0,
+            "velocity_LP": 0.0,
+            "velocity_mean": 0.0,
+            "velocity_slope": 0.0,
+            "frames": 1,
+            "time": 0.0,
+            "frequency": 0.0} for _ in range(2))
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+    def get(self):
+        plant = self.plant
+        plant.advance()
+        for side, data in enumerate(self.data):
+            velocity = plant.measure("velocity", plant.x[4 + side])
+            data["position"] = plant.measure("position", plant.x[2 + side]) - self.offset[side]
+            data["velocity"] = velocity
+            data["velocity_mean"] = velocity
+            data["velocity_slope"] = velocity
+            data["time"] = plant.t
+        return self.data
+
+    def set(self, left, right):
+        for side, command in enumerate((left, right)):
+            self.data[side]["en"] = command["en"]
+            self.data[side]["sp"] = command["sp"]
+            self.plant.command(side, command["en"], command["sp"])
+
+    def reset(self):
+        self.offset = [self.plant.x[2], self.plant.x[3]]
+
+
+class SimPS4:
+    """PS4Controller interface with values set by a script (press(), set()); disconnected by default."""
+    def __init__(self, clock, name="SimPS4", logging_level=logging.INFO, connected=False):
+        self.clock = clock
+        self.data = {
+            "time": 0.0,
+            "frequency": 0.0,
+            "connected": connected,
+            "x": False, "v": False, "d": False, "o": False,
+            "l1": False, "r1": False, "share": False, "option": False,
+            "l3": False, "r3": False, "ps": False,
+            "dpad_x": 0, "dpad_y": 0,
+            "left_x": 128, "left_y": 128, "right_x": 128, "right_y": 128,
+            "l2": 0, "r2": 0
+        }
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def set(self, **values):
+        self.data.update(values)
+
+    def get(self):
+        self.data["time"] = self.clock()
+        return self.data
+
+
+class NullSPI:
+    """SPI device for EYES without LEDs, only counts the transfers."""
+    def __init__(self):
+        self.transfers = 0
+        self.bytes = 0
+
+    def open(self, bus, device):
+        pass
+
+    def close(self):
+        pass
+
+    def xfer(self, data, speed_hz=0, *args):
+        self.transfers += 1
+        self.bytes += len(data)
+        return data
+
+    def writebytes(self, data):
+        self.transfers += 1
+        self.bytes += len(data)
+
+    def writebytes2(self, data):
+        self.transfers += 1
+        self.bytes += len(data)
@@ -1,20 +1,97 @@
 import logging
+import struct
 import time
 import board
 import busio
-import numpy as np
 from adafruit_bno08x import (
     BNO_REPORT_GYROSCOPE,
     BNO_REPORT_MAGNETOMETER,
     BNO_REPORT_ACCELEROMETER,
     BNO_REPORT_GEOMAGNETIC_ROTATION_VECTOR,
     BNO_REPORT_ROTATION_VECTOR,
+    _separate_batch,
     )
 from adafruit_bno08x.i2c import BNO08X_I2C
-from scipy.spatial.transform import Rotation as R
+
+from acquisition import Reader, Sample, SampleRing
+from orientation import quaternion_to_euler, quaternion_nlerp, quaternion_mean
+
+# SH-2 timestamp reports, time unit of all SH-2 timestamps is 100 µs
+BASE_TIMESTAMP = 0xFB
+TIMESTAMP_REBASE = 0xFA
+SH2_TICK = 100e-6
+
+
+class StreamingBNO08X(BNO08X_I2C):
+    """
+    BNO08X driver that keeps every sensor report instead of only the last one.
+
+    drain() reads all pending packets; each packet is a batch of reports that
+    starts with a base timestamp. Reports of tracked ids are stored with their
+    sensor time converted to the host clock: time of the packet read - base
+    delta + report delay. The batch is processed in order, the library pops
+    it from the end and keeps the oldest report.
+    """
+    def __init__(self, i2c_bus, clock=time.perf_counter, **kwargs):
+        # initialize() in the base class already processes packets
+        self.clock = clock
+        self.rings = {}
+        self.reports = 0
+        self._packet_time = 0.0
+        self._base_delta = 0.0
+        super().__init__(i2c_bus, **kwargs)
+
+    def track(self, report_id, size=64):
+        self.rings[report_id] = SampleRing(size)
+        return self.rings[report_id]
+
+    def drain(self):
+        self._process_available_packets()
+
+    def _read_packet(self):
+        self._packet_time = self.clock()
+        self._base_delta = 0.0
+        return super()._read_packet()
+
+    def _handle_packet(self, packet):
+        slices = []
+        _separate_batch(packet, slices)
+        for report_id, report_bytes in slices:
+            self._process_report(report_id, report_bytes)
+
+    def _process_report(self, report_id, report_bytes):
+        if report_id == BASE_TIMESTAMP:
+            self._base_delta = struct.unpack_from("<I", report_bytes, 1)[0] * SH2_TICK
+            return
+        if report_id == TIMESTAMP_REBASE:
+            self._base_delta -= struct.unpack_from("<i", report_bytes, 1)[0] * SH2_TICK
+            return
+        super()._process_report(report_id, report_bytes)
+        ring = self.rings.get(report_id)
+        if ring is not None:
+            # 14 bit delay: status bits 7:2 and byte 3
+            delay = (((report_bytes[2] & 0xFC) << 6) | report_bytes[3]) * SH2_TICK
+            self.reports += 1
+            ring.append(Sample(self._readings[report_id], self._packet_time - self._base_delta + delay,
+                               self.reports))
+
 
 class IMU:
-    def __init__(self, name = "IMU", logging_level = logging.INFO):
+    """
+    BNO085 orientation and angular velocity.
+
+    Default: loop() polls the last gyro and rotation vector report once per call.
+    With streaming=True the reports are configured with explicit intervals and
+    drained on an own thread (start()) into timestamped rings; loop() then
+    returns, depending on `sampling`:
+        "latest":      the newest reports
+        "mean":        the mean of the reports of the last `window` seconds
+        "interpolate": both reports interpolated to the same time `at`
+                       (default: the newest time covered by both)
+    data["age"] is the age of the used sample.
+    """
+    def __init__(self, name = "IMU", logging_level = logging.INFO, streaming=False, gyro_interval=0.0025,
+                 quaternion_interval=0.0025, sampling="latest", window=0.01, ring=64):
         self.frequency = 0.0
         self.now = 0.0
         self.last_time = 0.0
@@ -36,22 +113,51 @@ class IMU:
             "frequency": self.frequency
         }
 
+        self.streaming = streaming
+        self.sampling = sampling
+        self.window = window
+        self.reader = None
+
         self.logger = logging.getLogger(name)
         self.logger.setLevel(logging_level)
 
         try:
             self.i2c = busio.I2C(board.SCL, board.SDA, frequency=800000)
-            self.bno = BNO08X_I2C(self.i2c)
-            #self.bno.enable_feature(BNO_REPORT_ACCELEROMETER)
-            self.bno.enable_feature(BNO_REPORT_GYROSCOPE)
-            #self.bno.enable_feature(BNO_REPORT_MAGNETOMETER)
-            #self.bno.enable_feature(BNO_REPORT_GEOMAGNETIC_ROTATION_VECTOR)
-            self.bno.enable_feature(BNO_REPORT_ROTATION_VECTOR)
+            if streaming:
+                self.bno = StreamingBNO08X(self.i2c)
+                # report intervals in µs
+                self.bno.enable_feature(BNO_REPORT_GYROSCOPE, int(gyro_interval * 1e6))
+                self.bno.enable_feature(BNO_REPORT_ROTATION_VECTOR, int(quaternion_interval * 1e6))
+                self.gyro_ring = self.bno.track(BNO_REPORT_GYROSCOPE, ring)
+                self.quaternion_ring = self.bno.track(BNO_REPORT_ROTATION_VECTOR, ring)
+                self.reader = Reader(self._drain, name=name + "_Stream",
+                                     period=min(gyro_interval, quaternion_interval) / 2)
+            else:
+                self.bno = BNO08X_I2C(self.i2c)
+                #self.bno.enable_feature(BNO_REPORT_ACCELEROMETER)
+                self.bno.enable_feature(BNO_REPORT_GYROSCOPE)
+                #self.bno.enable_feature(BNO_REPORT_MAGNETOMETER)
+                #self.bno.enable_feature(BNO_REPORT_GEOMAGNETIC_ROTATION_VECTOR)
+                self.bno.enable_feature(BNO_REPORT_ROTATION_VECTOR)
             self.logger.info("Erfolgreich initialisiert.")
         except Exception as e:
             self.logger.critical(str(e))
             self.bno = None
 
+    def start(self):
+        """Starts draining the sensor reports (streaming mode)."""
+        if self.reader is not None:
+            self.reader.start()
+
+    def stop(self):
+        if self.reader is not None:
+            self.reader.stop()
+
+    def _drain(self):
+        self.bno.drain()
+        # samples are published through the rings, not the reader slot
+        return None
+
     def quaternion_to_euler(self, i, j, k, r):
         """
         Convert a quaternion into euler angles [roll, pitch, yaw]
@@ -59,25 +165,68 @@ class IMU:
         - pitch is rotation around y in radians (CCW)
         - yaw is rotation around z in radians (CCW)
         """
-        quat = np.array([r, i, j, k])  # scipy erwartet die Reihenfolge [w, x, y, z]
-        euler = R.from_quat(quat, scalar_first=True).as_euler("xyz", degrees=False)  # Konvertierung nach Roll, Pitch, Yaw
-        return euler[0], euler[1], euler[2]
+        # geschlossene Form, gleiche Konvention wie scipy as_euler("xyz")
+        return quaternion_to_euler(i, j, k, r)
 
-    def loop(self):
+    def _select(self, ring, at, quaternion=False):
+        """Value and time of a report ring according to self.sampling, (None, None) if empty."""
+        newest = ring.latest()
+        if newest is None:
+            return None, None
+        if self.sampling == "mean":
+            samples = ring.window(newest.time - self.window)
+            values = [sample.value for sample in samples]
+            t = sum(sample.time for sample in samples) / len(samples)
+            if quaternion:
+                return quaternion_mean(values), t
+            return tuple(sum(v) / len(values) for v in zip(*values)), t
+        if self.sampling == "interpolate":
+            before, after = ring.bracket(at)
+            if before is None:
+                return after.value, after.time
+            if after is None or after.time <= before.time:
+                return before.value, before.time
+            w = (at - before.time) / (after.time - before.time)
+            if quaternion:
+                return quaternion_nlerp(before.value, after.value, w), at
+            return tuple(a + w * (b - a) for a, b in zip(before.value, after.value)), at
+        return newest.value, newest.time
+
+    def _stream(self, at):
+        if at is None and self.sampling == "interpolate":
+            gyro, quat = self.gyro_ring.latest(), self.quaternion_ring.latest()
+            if gyro is None or quat is None:
+                return None
+            at = min(gyro.time, quat.time)
+        gyro, t_gyro = self._select(self.gyro_ring, at)
+        quat, t_quat = self._select(self.quaternion_ring, at, quaternion=True)
+        if gyro is None or quat is None:
+            return None
+        return gyro, quat, min(t_gyro, t_quat)
+
+    def loop(self, at=None):
             self.now = time.perf_counter()
             self.frequency = (1 / (self.now - self.last_time))
             self.last_time = self.now
 
             try:
-                # tmp = time.perf_counter()
-                self.gyro_x, self.gyro_y, self.gyro_z = self.bno.gyro
-                # print(f"\n\nGyro: {time.perf_counter()-tmp}")
+                if self.streaming:
+                    sample = self._stream(at)
+                    if sample is None:
+                        self.data["age"] = float("inf")
+                        return self.data
+                    (self.gyro_x, self.gyro_y, self.gyro_z), (quat_i, quat_j, quat_k, quat_real), t = sample
+                    self.data["age"] = self.now - t
+                else:
+                    # tmp = time.perf_counter()
+                    self.gyro_x, self.gyro_y, self.gyro_z = self.bno.gyro
+                    # print(f"\n\nGyro: {time.perf_counter()-tmp}")
 
-                # quat_i, quat_j, quat_k, quat_real = self.bno.geomagnetic_quaternion
+                    # quat_i, quat_j, quat_k, quat_real = self.bno.geomagnetic_quaternion
 
-                # tmp = time.perf_counter()
-                quat_i, quat_j, quat_k, quat_real = self.bno.quaternion
-                # print(f"\n\nQuat: {time.perf_counter()-tmp}")
+                    # tmp = time.perf_counter()
+                    quat_i, quat_j, quat_k, quat_real = self.bno.quaternion
+                    # print(f"\n\nQuat: {time.perf_counter()-tmp}")
 
                 # tmp = time.perf_counter()
                 pitch, self.roll, yaw = self.quaternion_to_euler(quat_i, quat_j, quat_k, quat_real)
@@ -86,16 +235,14 @@ class IMU:
                 self.pitch = pitch
                 self.yaw = yaw-self.yaw_offset
 
-                self.data = {
-                    "roll": self.roll,
-                    "pitch": -self.pitch+0.022725,
-                    "yaw": self.yaw,
-                    "gyro_x": -self.gyro_x,
-                    "gyro_y": self.gyro_y,
-                    "gyro_z": self.gyro_z,
-                    "time": self.now,
-                    "frequency": self.frequency
-                }
+                self.data["roll"] = self.roll
+                self.data["pitch"] = -self.pitch+0.022725
+                self.data["yaw"] = self.yaw
+                self.data["gyro_x"] = -self.gyro_x
+                self.data["gyro_y"] = self.gyro_y
+                self.data["gyro_z"] = self.gyro_z
+                self.data["time"] = self.now
+                self.data["frequency"] = self.frequency
 
                 self.logger.debug(self.data)
             except Exception as e:
@@ -105,4 +252,3 @@ class IMU:
 
     def reset(self):
         self.yaw_offset = self.yaw_offset + self.yaw
-
@@ -2,10 +2,11 @@ import traceback
 import logging
 import time
 import numpy as np
-import control
+
+from model_cache import continuous_model, get_cache
 
 class KalmanFilter:
-    def __init__(self, name="KalmanFilter", logging_level=logging.INFO, freq=50.0, config={}, physics={}):
+    def __init__(self, name="KalmanFilter", logging_level=logging.INFO, freq=50.0, config={}, physics={}, cache=None):
         self.freq = freq
         self.frequency = 0.0
         self.now = 0.0
@@ -13,6 +14,7 @@ class KalmanFilter:
         self.dt = 0.0
         self.config = config
         self.physics = physics
+        self.cache = cache if cache is not None else get_cache()
 
         # 🟢 Empfohlene Startwerte für Balancer-Roboter
         # self.Q = np.diag(self.config["Q"])  # Prozessrauschen (Modell)
@@ -30,15 +32,7 @@ class KalmanFilter:
         self.K_m = self.physics["K_m"]
 
         # Systemmatrizen
-        self.A = np.array([[0, 0, 1, 0],
-                           [0, 0, 0, 1],
-                           [(self.m * self.g * self.R_phys) / self.J, 0, 0, (self.m * self.r * self.R_phys) / (self.tau_m * self.J)],
-                           [0, 0, 0, -1 / self.tau_m]])
-
-        self.B = np.array([[0],
-                           [0],
-                           [(-self.K_m * self.m * self.r * self.R_phys) / (self.tau_m * self.J)],
-                           [self.K_m / self.tau_m]])
+        self.A, self.B = continuous_model(self.physics)
 
         self.C = np.eye(4)  # Volle Zustandsmessung
         self.D = np.zeros((4,1))
@@ -49,14 +43,22 @@ class KalmanFilter:
         self.Dd = None
 
         self.L = None  # Kalman-Gain
+        # fused steady-state update [(I-LC)Ad | (I-LC)Bd | L], see _fuse()
+        self.M = None
+        self._rows = None
 
-        self.x_hat = np.zeros((4, 1))  # Zustands-Schätzung
+        self.x_hat = [0.0, 0.0, 0.0, 0.0]  # Zustands-Schätzung, wird in-place aktualisiert
         self.u = 0.0  # Steuerungseingang
 
-        self.out = [0, 0, 0, 0]
+        self.out = self.x_hat
 
         self.data = {
-            "x_hat": self.x_hat.flatten().tolist(),
+            "out": {
+                "p": 0.0,
+                "x": 0.0,
+                "pv": 0.0,
+                "v": 0.0
+            },
             "time": self.now,
             "frequency": self.frequency
         }
@@ -71,34 +73,30 @@ class KalmanFilter:
             self.logger.critical(str(e))
             traceback.format_exc()
 
-    def _loop(self, y_meas):
+    def _loop(self, u, y1, y2, y3, y4):
         self.now = time.perf_counter()
         self.dt = self.now - self.last_time
         self.frequency = (1 / self.dt)
         self.last_time = self.now
 
         try:
-            # 1. Prediction
-            self.x_hat = self.Ad @ self.x_hat + self.Bd * self.u
-
-            # 2. Correction
-            y_hat = self.C @ self.x_hat
-            innovation = y_meas.reshape(-1, 1) - y_hat
-            self.x_hat = self.x_hat + self.L @ innovation
-
-            self.out = self.x_hat.flatten().tolist()
-            # print(self.out)
-
-            self.data = {
-                "out": {
-                "p": self.out[0],
-                "x": self.out[1],
-                "pv": self.out[2],
-                "v": self.out[3]
-            },
-                "time": self.now,
-                "frequency": self.frequency
-            }
+            # Prediction und Correction in einem Schritt:
+            # x = (I-LC)Ad x + (I-LC)Bd u + L y, ausgerollt auf Python-Floats (4 Zustände)
+            x = self.x_hat
+            x0, x1, x2, x3 = x
+            r0, r1, r2, r3 = self._rows
+            x[0] = r0[0]*x0 + r0[1]*x1 + r0[2]*x2 + r0[3]*x3 + r0[4]*u + r0[5]*y1 + r0[6]*y2 + r0[7]*y3 + r0[8]*y4
+            x[1] = r1[0]*x0 + r1[1]*x1 + r1[2]*x2 + r1[3]*x3 + r1[4]*u + r1[5]*y1 + r1[6]*y2 + r1[7]*y3 + r1[8]*y4
+            x[2] = r2[0]*x0 + r2[1]*x1 + r2[2]*x2 + r2[3]*x3 + r2[4]*u + r2[5]*y1 + r2[6]*y2 + r2[7]*y3 + r2[8]*y4
+            x[3] = r3[0]*x0 + r3[1]*x1 + r3[2]*x2 + r3[3]*x3 + r3[4]*u + r3[5]*y1 + r3[6]*y2 + r3[7]*y3 + r3[8]*y4
+
+            out = self.data["out"]
+            out["p"] = x[0]
+            out["x"] = x[1]
+            out["pv"] = x[2]
+            out["v"] = x[3]
+            self.data["time"] = self.now
+            self.data["frequency"] = self.frequency
 
             self.logger.debug(self.data)
         except Exception as e:
@@ -106,28 +104,64 @@ class KalmanFilter:
             traceback.format_exc()
 
     def loop(self, x1, x2, x3, x4, u, data):
-        y_meas = np.array([x1, x2, x3, x4])
         self.u = u
 
-        self._loop(y_meas)
+        self._loop(u, x1, x2, x3, x4)
 
         return self.data
 
     def calc_gains(self, config):
+        # Diskretisierung und Kalman-Gain, gecacht für bekannte Parameter
+        Ad, Bd = self.cache.discrete(self.physics, self.freq)
+        L, P = self.cache.kalman(self.physics, config["Q"], config["R"], self.freq)
+        self.set_gains(config, Ad, Bd, L, P)
+        print("Kalman Gain L:", self.L)
+
+    def set_gains(self, config, Ad, Bd, L, P=None):
+        """Takes matrices computed elsewhere (GainTuner), call between two loop() calls."""
         self.config = config
         self.Q = np.diag(self.config["Q"])  # Prozessrauschen (Modell)
         self.R = np.diag(self.config["R"])  # Messrauschen (Sensoren)
-
-        # 1. System erstellen
-        sys_cont = control.StateSpace(self.A, self.B, self.C, self.D)
-
-        # 2. Diskretisieren
-        Ts = 1 / self.freq
-        sys_disc = control.c2d(sys_cont, Ts, method='zoh')
-
-        self.Ad = sys_disc.A
-        self.Bd = sys_disc.B
-
-        # 3. Kalman-Gain berechnen
-        self.L, P, E = control.dlqe(self.Ad, np.eye(self.Ad.shape[0]), self.C, self.Q, self.R)
-        print("Kalman Gain L:", self.L)
+        self.Ad = Ad
+        self.Bd = Bd
+        self.L = L
+        self.P = P
+        self._fuse()
+
+    def _fuse(self):
+        """
+        Precomputes the steady-state update: with a constant gain, prediction
+        x' = Ad x + Bd u and correction x = x' + L (y - C x') collapse into
+            x = (I-LC)Ad x + (I-LC)Bd u + L y
+        The rows of [(I-LC)Ad | (I-LC)Bd | L] are kept as Python floats for _loop().
+        """
+        I_LC = np.eye(self.Ad.shape[0]) - self.L @ self.C
+        self.M = np.hstack([I_LC @ self.Ad, I_LC @ self.Bd, self.L])
+        self._rows = tuple(tuple(row) for row in self.M.tolist())
+
+
+if __name__ == "__main__":
+    # Benchmark gegen den bisherigen Predict/Correct-Schritt (Vergleich der Ergebnisse: tests/test_kalman.py)
+    from state import State
+
+    state = State()
+    kf = KalmanFilter(config=state.kalman.config, physics=state.physics, freq=50.0)
+
+    def reference_step(x_hat, y1, y2, y3, y4, u):
+        y_meas = np.array([y1, y2, y3, y4])
+        x_hat = kf.Ad @ x_hat + kf.Bd * u
+        innovation = y_meas.reshape(-1, 1) - kf.C @ x_hat
+        x_hat = x_hat + kf.L @ innovation
+        return x_hat, x_hat.flatten().tolist()
+
+    x_ref = np.zeros((4, 1))
+    n = 20000
+    t = time.perf_counter()
+    for _ in range(n):
+        x_ref, ref = reference_step(x_ref, 0.1, 0.2, 0.3, 0.4, 0.5)
+    t_ref = (time.perf_counter() - t) / n
+    t = time.perf_counter()
+    for _ in range(n):
+        kf.loop(0.1, 0.2, 0.3, 0.4, 0.5, None)
+    t_fast = (time.perf_counter() - t) / n
+    print(f"loop(): {t_fast * 1e6:.2f} µs, bisher (nur Filter): {t_ref * 1e6:.2f} µs")
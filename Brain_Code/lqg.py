@@ -0,0 +1,165 @@
+import traceback
+import logging
+import time
+import numpy as np
+
+from model_cache import get_cache
+
+
+class LQG:
+    """
+    Kalman filter and LQR as one discrete compensator.
+
+    State z = [x_hat (4), u (1), y (4), sp (4)]; one matrix step
+        [x_hat'; u_raw] = M z
+    with
+        x_hat' = (I-LC)Ad x_hat + (I-LC)Bd u + L y
+        u_raw  = -K x_hat' + K sp
+    gives the new estimate and the unsaturated command. The command is
+    clipped to min/max and the clipped value is what the observer gets as u
+    in the next step (anti-windup: the estimate follows the input the motors
+    really received, also while disabled with u = 0).
+    Same results as KalmanFilter.loop() followed by LQR.loop().
+    """
+    def __init__(self, name="LQG", logging_level=logging.INFO, freq=50.0, lqr_config={}, kalman_config={},
+                 physics={}, min_max=100.0, cache=None):
+        self.freq = freq
+        self.frequency = 0.0
+        self.now = 0.0
+        self.last_time = 0.0
+        self.dt = 0.0
+        self.en = False
+        self.lqr_config = lqr_config
+        self.kalman_config = kalman_config
+        self.physics = physics
+        self.cache = cache if cache is not None else get_cache()
+
+        self.min = -min_max
+        self.max = min_max
+
+        self.C = np.eye(4)  # Volle Zustandsmessung
+        self.K = None
+        self.L = None
+        self.M = None
+
+        self.z = np.zeros(13)
+        self.w = np.zeros(5)
+        self.out = 0.0
+        self.data = {
+            "out": self.out,
+            "en": self.en,
+            "estimate": {
+                "p": 0.0,
+                "x": 0.0,
+                "pv": 0.0,
+                "v": 0.0
+            },
+            "time": self.now,
+            "frequency": self.frequency
+        }
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+        try:
+            self.calc_gains(self.lqr_config, self.kalman_config)
+            self.logger.info("Erfolgreich initialisiert.")
+        except Exception as e:
+            self.logger.critical(str(e))
+            traceback.format_exc()
+
+    def calc_gains(self, lqr_config, kalman_config):
+        K = self.cache.lqr(self.physics, lqr_config["Q"], lqr_config["R"], self.freq)
+        Ad, Bd = self.cache.discrete(self.physics, self.freq)
+        L, P = self.cache.kalman(self.physics, kalman_config["Q"], kalman_config["R"], self.freq)
+        self.set_gains(lqr_config, K, kalman_config, Ad, Bd, L)
+        print("LQG Matrix:", self.M)
+
+    def set_gains(self, lqr_config, K, kalman_config, Ad, Bd, L):
+        """Builds the compensator matrix; call between two loop() calls (GainTuner)."""
+        self.lqr_config = lqr_config
+        self.kalman_config = kalman_config
+        self.K = np.asarray(K).reshape(1, -1)
+        self.L = L
+        I_LC = np.eye(Ad.shape[0]) - L @ self.C
+        observer = np.hstack([I_LC @ Ad, I_LC @ Bd, L, np.zeros((4, 4))])
+        command = -self.K @ observer
+        command[0, 9:] = self.K[0]
+        self.M = np.vstack([observer, command])
+
+    def reset(self):
+        self.z[:] = 0.0
+        self.out = 0.0
+
+    def loop(self, sp, y1, y2, y3, y4, en):
+        self.now = time.perf_counter()
+        self.dt = self.now - self.last_time
+        self.frequency = (1 / self.dt)
+        self.last_time = self.now
+        self.en = en
+
+        try:
+            z = self.z
+            z[5] = y1
+            z[6] = y2
+            z[7] = y3
+            z[8] = y4
+            z[9] = sp["p"]
+            z[10] = sp["x"]
+            z[11] = sp["pv"]
+            z[12] = sp["v"]
+            np.dot(self.M, z, out=self.w)
+            p, x, pv, v, u = self.w.tolist()
+
+            if en:
+                # Sättigung, der begrenzte Wert geht zurück in den Beobachter
+                u = self.max if u > self.max else self.min if u < self.min else u
+            else:
+                u = 0.0
+            z[0] = p
+            z[1] = x
+            z[2] = pv
+            z[3] = v
+            z[4] = u
+            self.out = u
+
+            estimate = self.data["estimate"]
+            estimate["p"] = p
+            estimate["x"] = x
+            estimate["pv"] = pv
+            estimate["v"] = v
+            self.data["out"] = u
+            self.data["en"] = en
+            self.data["time"] = self.now
+            self.data["frequency"] = self.frequency
+        except Exception as e:
+            self.logger.error(str(e))
+            traceback.format_exc()
+
+        return self.data
+
+
+if __name__ == "__main__":
+    # Benchmark gegen KalmanFilter + LQR (Vergleich der Ergebnisse: tests/test_lqg.py)
+    from kalman import KalmanFilter
+    from lqr import LQR
+    from state import State
+
+    state = State()
+    kalman = KalmanFilter(config=state.kalman.config, physics=state.physics)
+    lqr = LQR(config=state.lqr.config, physics=state.physics)
+    lqg = LQG(lqr_config=state.lqr.config, kalman_config=state.kalman.config, physics=state.physics)
+
+    u_last = 0.0
+    n = 20000
+    sp = {"p": 0.0, "x": 0.0, "pv": 0.0, "v": 0.0}
+    t = time.perf_counter()
+    for _ in range(n):
+        estimate = kalman.loop(0.01, 0.0, 0.02, 0.0, u=u_last, data=None)["out"]
+        u_last = lqr.loop(sp, estimate["p"], estimate["x"], estimate["pv"], estimate["v"], {"en": True})["out"]
+    t_separate = (time.perf_counter() - t) / n
+    t = time.perf_counter()
+    for _ in range(n):
+        lqg.loop(sp, 0.01, 0.0, 0.02, 0.0, en=True)
+    t_lqg = (time.perf_counter() - t) / n
+    print(f"LQG: {t_lqg * 1e6:.2f} µs, KalmanFilter + LQR: {t_separate * 1e6:.2f} µs")
@@ -2,10 +2,11 @@ import traceback
 import logging
 import time
 import numpy as np
-import control
+
+from model_cache import continuous_model, get_cache
 
 class LQR:
-    def __init__(self, name = "LQR", logging_level = logging.INFO, freq=50.0, config={}, physics={}, min_max=100.0):
+    def __init__(self, name = "LQR", logging_level = logging.INFO, freq=50.0, config={}, physics={}, min_max=100.0, cache=None):
         self.freq = freq
         self.frequency = 0.0
         self.now = 0.0
@@ -14,6 +15,7 @@ class LQR:
         self.en = False
         self.config = config
         self.physics = physics
+        self.cache = cache if cache is not None else get_cache()
 
         self.Q = np.diag(self.config["Q"])
         self.R_c = np.array([[self.config["R"]]])
@@ -26,15 +28,7 @@ class LQR:
         self.tau_m = self.physics["tau_m"]
         self.K_m = self.physics["K_m"]
 
-        self.A = np.array([[0, 0, 1, 0],
-                            [0, 0, 0, 1],
-                            [(self.m * self.g * self.R) / self.J, 0, 0, (self.m * self.r * self.R) / (self.tau_m * self.J)],
-                            [0, 0, 0, -1 / self.tau_m]])
-
-        self.B = np.array([[0],
-                            [0],
-                            [(-self.K_m * self.m * self.r * self.R) / (self.tau_m * self.J)],
-                            [self.K_m / self.tau_m]])
+        self.A, self.B = continuous_model(self.physics)
 
         self.C = np.array([[1, 1, 1, 1]])
         self.D = np.array([[0]])
@@ -74,20 +68,18 @@ class LQR:
 
         try:
             if self.en:
-
-                u = -self.Gains @ (self.x - self.sp)
+                # Gains (1, 4) @ (4,) is a 1-element array, float() of it raises TypeError on NumPy 2
+                u = -(self.Gains @ (self.x - self.sp)).item()
                 self.out = float(np.clip(u, self.min, self.max))
                 # self.out = 100.0
             else:
                 self.out = 0.0
 
-            self.data = {
-                "config": self.config,
-                "out": self.out,
-                "en": self.en,
-                "time": self.now,
-                "frequency": self.frequency
-            }
+            self.data["config"] = self.config
+            self.data["out"] = self.out
+            self.data["en"] = self.en
+            self.data["time"] = self.now
+            self.data["frequency"] = self.frequency
 
             self.logger.debug(self.data)
         except Exception as e:
@@ -107,25 +99,16 @@ class LQR:
         return self.data
 
     def calc_gains(self, config):
-        self.config = config
-        Q = np.diag(self.config["Q"])
-        R_c = np.array([[self.config["R"]]])
-        self.Q = Q
-        self.R_c = R_c
-
-        # 1. create system
-        sys_cont = control.StateSpace(self.A, self.B, self.C, self.D)
-
-        # 2. discretize
-        Ts = 1/self.freq
-        sys_disc = control.c2d(sys_cont, Ts, method='zoh')
-
-        Ad = sys_disc.A
-        Bd = sys_disc.B
-
-        # 3. calc gains
-        self.Gains, S, E = control.dlqr(Ad, Bd, self.Q, self.R_c)
+        # discretize and calc gains, cached for known physics, weights and rate
+        self.set_gains(config, self.cache.lqr(self.physics, config["Q"], config["R"], self.freq))
         print("Diskreter LQR Gain K:", self.Gains)
+
+    def set_gains(self, config, gains):
+        """Takes gains computed elsewhere (GainTuner), call between two loop() calls."""
+        self.config = config
+        self.Q = np.diag(self.config["Q"])
+        self.R_c = np.array([[self.config["R"]]])
+        self.Gains = gains
     # def reset(self):
     #     self.integral = 0.0
     #     self.derivative = 0.0
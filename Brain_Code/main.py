@@ -1,456 +1,511 @@
+import argparse
 import traceback
-import copy
 import json
 import math
+import multiprocessing
+import os
+import signal
+import sys
 import time
 import threading
 
 import numpy as np
 
-from imu import IMU
-from motor import MOTOR
-from LowPass import LowPassFilter
+from LowPass import FilterBank, LOWPASS
 from pid import PID
 from lqr import LQR
+from lqg import LQG
 from kalman import KalmanFilter
-from ps4_controller import PS4Controller
-from eyes import EYES
+from state import StateBuffer, MOTOR_FEEDBACK, reply_message
+from tuning import GainTuner
+from acquisition import Reader
+from telemetry import TelemetryRing
+from profiler import StageProfiler
+from scheduler import RateGroupScheduler, SKIP
+from hal import robot_devices, sim_devices
+from clock import VirtualClock
 import zmq
 
 
-current_values = [0.0] * 8
-
-def main_loop():
-    # Globals
-    global current_values
+# values shown in the web client
+TELEMETRY_WIDTH = 8
+# measured stages of the control tick
+STAGES = ["ps4", "imu", "motors_get", "filter", "kalman", "lqr", "pid", "motors_set", "eyes", "control"]
+(S_PS4, S_IMU, S_MOTORS_GET, S_FILTER, S_KALMAN, S_LQR, S_PID, S_MOTORS_SET, S_EYES,
+ S_CONTROL) = range(len(STAGES))
+telemetry = None
+profiler = None
+
+def main_loop(telemetry, profiler=None, backend="robot", duration=None, realtime=False, port="5556", verbose=True):
+    """
+    Control loop. backend "robot" or "sim" (hal.py); the simulation runs on a
+    VirtualClock as fast as possible unless realtime. Stops after `duration`
+    seconds (of its clock) if given, port=None disables the ZMQ interface.
+    """
+    if profiler is None:
+        profiler = StageProfiler(STAGES)
     freq_sp = 50.0
-    data = {
-        "main": {
-            "mode": 0,  # 0=off, 1=armed, 2=tolerance, 3=activation_delay 4=on
-            "upright": False,
-            "upright_tol": math.radians(3.0),
-            "activation_delay": 5.0,
-            "en": False,
-            "tol": math.radians(30.0),
-            "in_tol": False,
-            "yaw": 0.0,
-            "time": 0.0,
-            "frequency": 0.0
-        },
-        "physics": {
-            "r": 57.75 / 1000,  # wheel radius in m
-            "r_y": 272.59000 / 1000,  # wheel distance (center to center)
-            "R": 138.441 / 1000,  # wheel to cog in m
-            "g": 9.81,  # gravitation im m/s^2
-            "m": 885.54481 / 1000,  # mass of robot in kg
-            "J": 25612452.77099 / 1000000000,  # 0.00545106520548, # Inertia of chassis kg*m^2
-            "tau_m": (0.103 + 0.108) / 2,  # time constant of motors
-            "K_m": (0.231 + 0.235) / 2,  # motor Gain
-            "v_max": 1.0,  # m/s
-            "y_max": math.pi / 4  # rad/s
-        },
-        "motor_left": {
-            "sp": 0.0,
-            "en": False,
-            "position": 0.0,
-            "velocity": 0.0,
-            "velocity_LP": 0.0,
-            "time": 0.0,
-            "frequency": 0.0
-        },
-        "motor_right": {
-            "sp": 0.0,
-            "en": False,
-            "position": 0.0,
-            "velocity": 0.0,
-            "velocity_LP": 0.0,
-            "time": 0.0,
-            "frequency": 0.0
-        },
-        "imu": {
-            'roll': 0.0,
-            'pitch': 0.0,
-            'pitch_LP': 0.0,
-            'yaw': 0.0,
-            'gyro_x': 0.0,
-            'gyro_x_LP': 0.0,
-            'gyro_y': 0.0,
-            'gyro_z': 0.0,
-            'time': 0.0,
-            'frequency': 0.0
-        },
-        "sp": {
-            "p": 0.0,
-            "x": 0.0,
-            "pv": 0.0,
-            "v": 0.0,
-            "yaw": 0.0
-        },
-        "sp_LP": {
-            "p": 0.0,
-            "x": 0.0,
-            "pv": 0.0,
-            "v": 0.0,
-            "yaw": 0.0
-        },
-        "lqr": {
-            "config": {
-                "Q": [100, 15, 50, 25],
-                "R": 1.0
-            },
-            "out": 0.0,
-            "en": False,
-            "time": 0.0,
-            "frequency": 0.0
-        },
-        "kalman": {
-            "config": {
-                "Q": [50, 50, 25, 25],
-                "R": [0.05, 0.05, 0.5, 0.5]
-            },
-            "out": {
-                "p": 0.0,
-                "x": 0.0,
-                "pv": 0.0,
-                "v": 0.0
-            },
-            "time": 0.0,
-            "frequency": 0.0
-        },
-        "yaw_pid": {
-            "config": {
-                "Kp": 15,
-                "Ki": 1,
-                "Kd": 0.0
-            },
-            "out": 0.0,
-            "en": False,
-            "time": 0.0,
-            "frequency": 0.0
-        },
-        "ps4": {
-            "time": 0,
-            "frequency": 0,
-            "connected": False,
-            "x": False,
-            "v": False,
-            "d": False,
-            "o": False,
-            "l1": False,
-            "r1": False,
-            "share": False,
-            "option": False,
-            "l3": False,
-            "r3": False,
-            "ps": False,
-            "dpad_x": 0,
-            "dpad_y": 0,
-            "left_x": 0,
-            "left_y": 0,
-            "right_x": 0,
-            "right_y": 0,
-            "l2": 0,
-            "r2": 0
-        }
-    }
-    data_last = data
+    # rates of the task groups in Hz, all have to divide the base rate
+    freq_base = 100.0
+    freq_imu = 100.0
+    freq_ps4 = 50.0
+    freq_eyes = 25.0
+    freq_report = 1.0
+    freq_comm = 10.0
+    # read IMU and motors on own threads, the loop only takes the latest samples
+    acquisition_threads = True
+    max_age_imu = 0.05  # s
+    # stream all BNO085 reports into timestamped rings instead of polling once per tick,
+    # the IMU then delivers the "latest", "mean" or "interpolate"d sample
+    imu_streaming = False
+    imu_sampling = "interpolate"
+    max_age_motor = 0.05  # s
+    # wheel velocity for the Kalman filter: "lowpass" (5 Hz low-pass of the newest frame),
+    # "mean" or "slope" (mean velocity / position slope of all frames of the last control period)
+    motor_velocity = "lowpass"
+    # "binary" needs the command frame support of Motor_Code/src/main.cpp, "ascii" uses the Commander
+    motor_protocol = "ascii"
+    # "separate": KalmanFilter and LQR, "lqg": both fused into one compensator step (lqg.py)
+    controller = "separate"
+    if backend == "sim":
+        # simulated devices are read in the loop, deterministic and without real time threads
+        acquisition_threads = False
+        imu_streaming = False
+    state = StateBuffer()
+    data = state.cur
+    data_last = state.last  # fields of the previous tick
     # Main
-    now = time.perf_counter()
-    last_time = now
-    dt = 0.0
-    frequency = 50.0
+    if backend == "sim" and not realtime:
+        clock = VirtualClock()
+        # deadlines on the simulated time, task budgets measured in real time
+        scheduler = RateGroupScheduler(base_freq=freq_base, policy=SKIP, clock=clock, sleep=clock.sleep, spin=0.0,
+                                       timer=time.perf_counter)
+    else:
+        clock = time.perf_counter
+        scheduler = RateGroupScheduler(base_freq=freq_base, policy=SKIP)
+    now = clock()
     upright_time = 0.0
-    # IMU
-    imu = IMU()
-    # Motor
-    motor_left = MOTOR(name="Motor_Left",
-                       port="/dev/serial/by-id/usb-STMicroelectronics_STM32_STLink_0668FF485671664867185737-if02",
-                       invert=True, min_max=7.5)
-    motor_right = MOTOR(name="Motor_Right",
-                        port="/dev/serial/by-id/usb-STMicroelectronics_STM32_STLink_066EFF485671664867185641-if02",
-                        invert=True, min_max=7.5)
-    # Filter
-    pitch_LP = LowPassFilter(25.0)
-    gyro_x_LP = LowPassFilter(25.0)
-    motor_left_vel_LP = LowPassFilter(5.0)
-    motor_right_vel_LP = LowPassFilter(5.0)
-    p_sp_LP = LowPassFilter(0.5)
-    x_sp_LP = LowPassFilter(0.5)
-    pv_sp_LP = LowPassFilter(0.5)
-    v_sp_LP = LowPassFilter(0.5)
-    yaw_sp_LP = LowPassFilter(0.5)
-
-    kalman = KalmanFilter(config=data["kalman"]["config"], physics=data["physics"], freq=freq_sp)
-    # Controller
-    lqr_controller = LQR(config=data["lqr"]["config"], physics=data["physics"], freq=freq_sp)
-    yaw_controller = PID(config=data["yaw_pid"]["config"], mini=-50, maxi=50)
-
-    # Communication
-    # context = zmq.Context()
-    # socket = context.socket(zmq.REP)
-    # port = "5556"
-    # socket.bind("tcp://*:%s" % port)
+    # Devices
+    if backend == "sim":
+        devices = sim_devices(data.physics, clock)
+    else:
+        devices = robot_devices(imu_streaming=imu_streaming, imu_sampling=imu_sampling, imu_window=1 / freq_imu,
+                                motor_aggregate=motor_velocity != "lowpass", motor_window=1 / freq_sp,
+                                motor_protocol=motor_protocol)
+    imu = devices.imu
+    motors = devices.motors
+    # Filter: all channels in one bank, one call per tick with the dt of the tick;
+    # BUTTER2 (2nd order Butterworth) for the sensor channels needs cutoffs below freq_sp / 2
+    sensor_filter = LOWPASS
+    filters = FilterBank([("pitch", 25.0, sensor_filter),
+                          ("gyro_x", 25.0, sensor_filter),
+                          ("velocity_left", 5.0, sensor_filter),
+                          ("velocity_right", 5.0, sensor_filter),
+                          ("sp_p", 0.5),
+                          ("sp_x", 0.5),
+                          ("sp_pv", 0.5),
+                          ("sp_v", 0.5),
+                          ("sp_yaw", 0.5)], dt=1 / freq_sp)
+
+    kalman = None
+    lqr_controller = None
+    lqg = None
+    if controller == "lqg":
+        # Estimator + Controller
+        lqg = LQG(lqr_config=data.lqr.config, kalman_config=data.kalman.config, physics=data.physics, freq=freq_sp)
+    else:
+        kalman = KalmanFilter(config=data.kalman.config, physics=data.physics, freq=freq_sp)
+        # Controller
+        lqr_controller = LQR(config=data.lqr.config, physics=data.physics, freq=freq_sp)
+    yaw_controller = PID(config=data.yaw_pid.config, mini=-50, maxi=50)
+
+    # Communication (config_changer.py / sp_changer.py)
+    socket = None
+    tuner = None
+    if port is not None:
+        context = zmq.Context()
+        socket = context.socket(zmq.REP)
+        socket.bind("tcp://*:%s" % port)
+        # new LQR / Kalman weights are solved in a worker process and swapped in between two ticks
+        tuner = GainTuner(data.physics, freq_sp)
+        tuner.start()
 
     # PS4Controller
-    ps4 = PS4Controller()
+    ps4 = devices.ps4
     ps4.start()
     ps4_connection_last = now
     ps4_connection_timeout = 5
 
     # Eyes
-    eyes = EYES()
+    eyes = devices.eyes
+
+    # Acquisition
+    imu_reader = None
+    motors_reader = None
+    if acquisition_threads:
+        if not imu_streaming:
+            imu_reader = Reader(lambda: dict(imu.loop()), name="IMU_Reader", period=1 / (2 * freq_imu))
+            imu_reader.start()
+        motors_reader = Reader(lambda: tuple(dict(d) for d in motors.get()), name="Motors_Reader")
+        motors_reader.start()
+    if imu_streaming:
+        # own thread drains the sensor, loop() only picks from the rings
+        imu.start()
+
+    def take(reader, record, now):
+        """Copies the latest sample of a reader into the record and returns its age."""
+        sample = reader.get()
+        if sample is None:
+            record.age = float("inf")
+        else:
+            record.update(sample.value)
+            record.age = sample.age(now)
+        return record.age
+
+    def read_ps4(now, dt):
+        nonlocal ps4_connection_last
+        t = time.perf_counter_ns()
+        data.ps4.update(ps4.get())
+        if data.ps4.connected:
+            ps4_connection_last = now
+        profiler.lap(S_PS4, t)
+
+    def read_imu(now, dt):
+        t = time.perf_counter_ns()
+        if imu_reader is None:
+            data.imu.update(imu.loop())
+        else:
+            take(imu_reader, data.imu, now)
+        profiler.lap(S_IMU, t)
+
+    current_values = [0.0] * TELEMETRY_WIDTH
+
+    def control(now, dt):
+        nonlocal upright_time
+        t_start = time.perf_counter_ns()
+        frequency = (1 / dt)
+
+        # swap in gains of a finished retune, at the start of a tick so the whole tick uses one set
+        gains = tuner.poll() if tuner is not None else None
+        if gains is not None:
+            if lqg is not None:
+                lqg.set_gains(gains["lqr"]["config"], gains["lqr"]["K"], gains["kalman"]["config"],
+                              gains["kalman"]["Ad"], gains["kalman"]["Bd"], gains["kalman"]["L"])
+            else:
+                lqr_controller.set_gains(gains["lqr"]["config"], gains["lqr"]["K"])
+                kalman.set_gains(gains["kalman"]["config"], gains["kalman"]["Ad"], gains["kalman"]["Bd"],
+                                 gains["kalman"]["L"], gains["kalman"]["P"])
+            data.lqr.config = gains["lqr"]["config"]
+            data.kalman.config = gains["kalman"]["config"]
+            data.main.gains_version = gains["version"]
+
+        # check pitch tolerance
+        data.main.in_tol = (data.main.tol > data.imu.pitch > -data.main.tol)
+        # check upright
+        data.main.upright = (data.main.upright_tol > data.imu.pitch > -data.main.upright_tol)
+
+        # Program Control
+        match data.main.mode:
+            case 0: # off
+                if data.ps4.x and not data_last.ps4.x:
+                    data.main.mode = 1
+                if ps4_connection_last + ps4_connection_timeout < now:
+                    data.main.mode = 1
+            case 1:  # armed
+                if data.ps4.x and not data_last.ps4.x:
+                    data.main.mode = 0
+                if data.main.in_tol:
+                    data.main.mode = 2
+            case 2:  # tolerance
+                if data.ps4.x and not data_last.ps4.x:
+                    data.main.mode = 0
+                if not data.main.in_tol:
+                    data.main.mode = 1
+                if data.main.upright:
+                    data.main.mode = 3
+                    upright_time = now
+            case 3:  # activation_delay
+                if data.ps4.x and not data_last.ps4.x:
+                    data.main.mode = 0
+                if not data.main.upright:
+                    data.main.mode = 2
+                if (upright_time + data.main.activation_delay) < now:
+                    data.main.mode = 4
+            case 4: # on
+                if data.ps4.x and not data_last.ps4.x:
+                    data.main.mode = 0
+                if not data.main.in_tol:
+                    data.main.mode = 0
+                if data.main.stale:
+                    data.main.mode = 0
+
+        # enabled?
+        data.main.en = data.main.mode==4
+        if not data.main.en:
+            data.motor_left.en = False
+            data.motor_right.en = False
+            data.yaw_pid.en = False
+            data.lqr.en = False
+        else:
+            data.motor_left.en = True
+            data.motor_right.en = True
+            data.yaw_pid.en = True
+            data.lqr.en = True
+
+        # reset
+        if not (data.main.mode == data_last.main.mode):
+            imu.reset()
+            motors.reset()
+            yaw_controller.reset()
+            data.sp.reset()
+            data.sp_LP.reset()
+
+        # Read Motors
+        t = time.perf_counter_ns()
+        if motors_reader is None:
+            left, right = motors.get()
+            data.motor_left.update(left, MOTOR_FEEDBACK)
+            data.motor_right.update(right, MOTOR_FEEDBACK)
+        else:
+            sample = motors_reader.get()
+            if sample is None:
+                data.motor_left.age = data.motor_right.age = float("inf")
+            else:
+                data.motor_left.update(sample.value[0], MOTOR_FEEDBACK)
+                data.motor_right.update(sample.value[1], MOTOR_FEEDBACK)
+                data.motor_left.age = data.motor_right.age = sample.age(now)
+        profiler.lap(S_MOTORS_GET, t)
+        data.main.stale = (data.imu.age > max_age_imu
+                           or data.motor_left.age > max_age_motor
+                           or data.motor_right.age > max_age_motor)
+        data.main.yaw = data.physics["r"] * (data.motor_right.position - data.motor_left.position) / data.physics["r_y"]
+
+        # Process inputs
+        if data.main.mode==4:
+            d = 0
+            r = 0
+            if not data.ps4.dpad_y == data_last.ps4.dpad_y:
+                d = d + 0.5 * data.ps4.dpad_y# distance in meters per click
+            if not data.ps4.dpad_x == data_last.ps4.dpad_x:
+                r = r + 1/8 * data.ps4.dpad_x # angle per click
+
+            v_sp = np.interp((data.ps4.r2-data.ps4.l2),[-255, 255],[-data.physics["v_max"], data.physics["v_max"]] )
+            y_sp = np.interp(data.ps4.left_x,[0, 255],[-data.physics["y_max"], data.physics["y_max"]] )
+            d = d + v_sp*dt  # distance in meters per click
+            r = r + y_sp*dt
+            data.sp.x = data.sp.x + d / data.physics["r"]
+            data.sp.yaw = data.sp.yaw + r * 2 * math.pi
+
+        # Filtering
+        t = time.perf_counter_ns()
+        (data.imu.pitch_LP, data.imu.gyro_x_LP, velocity_left_LP, velocity_right_LP,
+         data.sp_LP.p, data.sp_LP.x, data.sp_LP.pv, data.sp_LP.v, data.sp_LP.yaw) = filters.filter(
+            [data.imu.pitch, data.imu.gyro_x, data.motor_left.velocity, data.motor_right.velocity,
+             data.sp.p, data.sp.x, data.sp.pv, data.sp.v, data.sp.yaw], dt).tolist()
+        if motor_velocity == "lowpass":
+            data.motor_left.velocity_LP = velocity_left_LP
+            data.motor_right.velocity_LP = velocity_right_LP
+        elif motor_velocity == "mean":
+            data.motor_left.velocity_LP = data.motor_left.velocity_mean
+            data.motor_right.velocity_LP = data.motor_right.velocity_mean
+        else:
+            data.motor_left.velocity_LP = data.motor_left.velocity_slope
+            data.motor_right.velocity_LP = data.motor_right.velocity_slope
+        t = profiler.lap(S_FILTER, t)
+
+        if lqg is not None:
+            # Kalman + LQR in one step, profiled as kalman stage
+            lqg_data = lqg.loop(sp = data.sp_LP,
+                                y1 = data.imu.pitch_LP,
+                                y2 = (data.motor_left.position+data.motor_right.position)/2,
+                                y3 = data.imu.gyro_x_LP,
+                                y4 = (data.motor_left.velocity_LP+data.motor_right.velocity_LP)/2,
+                                en = data.lqr.en)
+            data.kalman.out.update(lqg_data["estimate"])
+            data.lqr.out = lqg_data["out"]
+            t = profiler.lap(S_KALMAN, t)
+        else:
+            data.kalman.update(kalman.loop(u = data.lqr.out,
+                                           x1 = data.imu.pitch_LP,
+                                           x2 = (data.motor_left.position+data.motor_right.position)/2,
+                                           x3 = data.imu.gyro_x_LP,
+                                           x4 = (data.motor_left.velocity_LP+data.motor_right.velocity_LP)/2,
+                                           data = data.kalman))
+            t = profiler.lap(S_KALMAN, t)
+
+            # Controller
+            data.lqr.update(lqr_controller.loop(sp = data.sp_LP,
+                                                x1 = data.kalman.out.p,
+                                                x2 = data.kalman.out.x,
+                                                x3 = data.kalman.out.pv,
+                                                x4 = data.kalman.out.v,
+                                                data=data.lqr))
+            t = profiler.lap(S_LQR, t)
+        data.yaw_pid.update(yaw_controller.loop(sp=data.sp_LP.yaw,x=data.main.yaw,data=data.yaw_pid,dt=dt))
+        t = profiler.lap(S_PID, t)
+
+        # Set Motors
+        data.motor_left.sp = data.lqr.out - data.yaw_pid.out
+        data.motor_right.sp = data.lqr.out + data.yaw_pid.out
+        motors.set(data.motor_left, data.motor_right)
+        profiler.lap(S_MOTORS_SET, t)
+
+        # Misc
+        data.main.frequency = frequency
+        data.main.lateness = scheduler.loop.last_lateness
+        data.main.time = now
+        state.advance()
+
+        current_values[0] = data.kalman.out.p
+        current_values[1] = data.sp_LP.p
+        current_values[2] = data.kalman.out.x
+        current_values[3] = data.sp_LP.x
+        current_values[4] = data.main.yaw
+        current_values[5] = data.sp_LP.yaw
+        current_values[6] = data.kalman.out.p
+        current_values[7] = data.main.gains_version
+        telemetry.write(current_values)
+        profiler.lap(S_CONTROL, t_start)
+
+        # Debugging
+        if verbose:
+            mode = data.main.mode
+            lateness = data.main.lateness * 1000
+            print(f"{frequency:.3f}\t{lateness:.3f}\t{mode}")
+        # value = data.imu.yaw
+        # value2 = data.main.yaw
+        # print( f"imu:{value:.3f}\tmot:{value2:.3f}")
+        # value = data.sp.yaw
+        # value3 = data.main.yaw
+        # value2 = data.sp_LP.yaw
+        # print( f"y_sp:{value:.3f}, y_sp_LP:{value2:.3f}, out:{value3:.3f}")
+        # value = data.sp.x
+        # value3 = data.kalman.out.x
+        # value2 = data.sp_LP.x
+        # print( f"x_sp:{value:.3f}, x_sp_LP:{value2:.3f}, out:{value3:.3f}")
+        # print(json.dumps(data.as_dict(), indent=4))
+        # print(str(controller.integral))
+
+    def show_eyes(now, dt):
+        t = time.perf_counter_ns()
+        match data.main.mode:
+            case 0: # off
+                eyes.fill_range(0,eyes.num_leds_total,"red")
+            case 1:  # armed
+                eyes.fill_range(0, eyes.num_leds_total, "red")
+                eyes.line(orientation="horizontal", module_name="left",
+                          color1_name="yellow", value1=-data.kalman.out.p,
+                          min_value1=-data.main.tol, max_value1=data.main.tol)
+                eyes.line(orientation="horizontal", module_name="right",
+                          color1_name="yellow", value1=-data.kalman.out.p,
+                          min_value1=-data.main.tol, max_value1=data.main.tol)
+            case 2:  # tolerance
+                eyes.fill_range(0, eyes.num_leds_total, "yellow")
+                eyes.line(orientation="horizontal", module_name="left",
+                          color1_name="red", value1=-data.kalman.out.p,
+                          min_value1=-data.main.tol, max_value1=data.main.tol)
+                eyes.line(orientation="horizontal", module_name="right",
+                          color1_name="red", value1=-data.kalman.out.p,
+                          min_value1=-data.main.tol, max_value1=data.main.tol)
+            case 3:  # activation_delay
+                eyes.fill_range(0, eyes.num_leds_total, "green")
+                eyes.line(orientation="horizontal", module_name="left",
+                          color1_name="white", value1=-data.kalman.out.p,
+                          min_value1=-data.main.tol, max_value1=data.main.tol)
+                eyes.line(orientation="horizontal", module_name="right",
+                          color1_name="white", value1=-data.kalman.out.p,
+                          min_value1=-data.main.tol, max_value1=data.main.tol)
+            case 4: # on
+                eyes.clear_range(0, eyes.num_leds_total)
+                eyes.line(orientation="cross", module_name="left",
+                          color1_name="blue", value1=data.ps4.left_x,
+                          min_value1=0, max_value1=255,
+                          color2_name="red", value2=-(data.ps4.r2-data.ps4.l2),
+                          min_value2=-255,
+                          max_value2=255,
+                          comb_color_name="green")
+                eyes.line(orientation="cross", module_name="right",
+                          color1_name="blue", value1=data.yaw_pid.out,
+                          min_value1=-50, max_value1=+50,
+                          color2_name="red", value2=-data.lqr.out,
+                          min_value2=-100/2, max_value2=100/2,
+                          comb_color_name="green")
+        eyes.show()
+        profiler.lap(S_EYES, t)
+
+    def communicate(now, dt):
+        tuner.flush()
+        try:
+            msg = socket.recv_string(flags=zmq.NOBLOCK)
+        except zmq.Again:
+            return
+        try:
+            rcv = json.loads(msg)
+            print(f"got data: {rcv}")
+            if not isinstance(rcv, dict):
+                raise ValueError("kein JSON-Objekt")
+            if "lqr" in rcv:
+                lqr_config, kalman_config, yaw_config = rcv["lqr"], rcv["kalman"], rcv["yaw"]
+                tuner.request(lqr_config, kalman_config)
+                data.yaw_pid.config = yaw_config
+            if "sp" in rcv:
+                unknown = [key for key in rcv["sp"] if key not in data.sp]
+                if unknown:
+                    raise KeyError(f"unbekannte Sollwerte {unknown}")
+                data.sp.update(rcv["sp"])
+        except Exception as e:
+            print(f"Ungültige Nachricht: {e}")
+        finally:
+            # REP socket: every request needs an answer, otherwise every further recv fails (EFSM)
+            socket.send_string(reply_message(data, tuner.busy))
+
+    def report(now, dt):
+        print(scheduler.report())
+
+    # Tasks (order = execution order within a minor frame)
+    scheduler.add("ps4", read_ps4, freq_ps4)
+    scheduler.add("imu", read_imu, freq_imu)
+    scheduler.add("control", control, freq_sp)
+    scheduler.add("eyes", show_eyes, freq_eyes, phase=1)  # between two control ticks
+    if socket is not None:
+        scheduler.add("comm", communicate, freq_comm, phase=3)
+    if verbose:
+        scheduler.add("report", report, freq_report, phase=3)
+    start_time = clock()
+    start_wall = time.perf_counter()
     try:
-        while True:
+        scheduler.start()
+        while duration is None or clock() - start_time < duration:
             try:
-                now = time.perf_counter()
-                if (now - last_time) > (1 / freq_sp):
-                    dt = now - last_time
-                    frequency = (1 / dt)
-                    last_time = now
-
-                    # check pitch tolerance
-                    data["main"]["in_tol"] = (data["main"]["tol"] > data["imu"]["pitch"] > -data["main"]["tol"])
-                    # check upright
-                    data["main"]["upright"] = (data["main"]["upright_tol"] > data["imu"]["pitch"] > -data["main"]["upright_tol"])
-
-                    # Read PS4-Input
-                    data["ps4"] = ps4.get()
-                    if data["ps4"]["connected"]:
-                        ps4_connection_last = now
-
-                    # Program Control
-                    match data["main"]["mode"]:
-                        case 0: # off
-                            if data["ps4"]["x"] and not data_last["ps4"]["x"]:
-                                data["main"]["mode"] = 1
-                            if ps4_connection_last + ps4_connection_timeout < now:
-                                data["main"]["mode"] = 1
-
-                            eyes.fill_range(0,eyes.num_leds_total,"red")
-                        case 1:  # armed
-                            if data["ps4"]["x"] and not data_last["ps4"]["x"]:
-                                data["main"]["mode"] = 0
-                            if data["main"]["in_tol"]:
-                                data["main"]["mode"] = 2
-
-                            eyes.fill_range(0, eyes.num_leds_total, "red")
-                            eyes.line(orientation="horizontal", module_name="left",
-                                      color1_name="yellow", value1=-data["kalman"]["out"]["p"],
-                                      min_value1=-data["main"]["tol"], max_value1=data["main"]["tol"])
-                            eyes.line(orientation="horizontal", module_name="right",
-                                      color1_name="yellow", value1=-data["kalman"]["out"]["p"],
-                                      min_value1=-data["main"]["tol"], max_value1=data["main"]["tol"])
-                        case 2:  # tolerance
-                            if data["ps4"]["x"] and not data_last["ps4"]["x"]:
-                                data["main"]["mode"] = 0
-                            if not data["main"]["in_tol"]:
-                                data["main"]["mode"] = 1
-                            if data["main"]["upright"]:
-                                data["main"]["mode"] = 3
-                                upright_time = now
-
-                            eyes.fill_range(0, eyes.num_leds_total, "yellow")
-                            eyes.line(orientation="horizontal", module_name="left",
-                                      color1_name="red", value1=-data["kalman"]["out"]["p"],
-                                      min_value1=-data["main"]["tol"], max_value1=data["main"]["tol"])
-                            eyes.line(orientation="horizontal", module_name="right",
-                                      color1_name="red", value1=-data["kalman"]["out"]["p"],
-                                      min_value1=-data["main"]["tol"], max_value1=data["main"]["tol"])
-                        case 3:  # activation_delay
-                            if data["ps4"]["x"] and not data_last["ps4"]["x"]:
-                                data["main"]["mode"] = 0
-                            if not data["main"]["upright"]:
-                                data["main"]["mode"] = 2
-                            if (upright_time + data["main"]["activation_delay"]) < now:
-                                data["main"]["mode"] = 4
-
-                            eyes.fill_range(0, eyes.num_leds_total, "green")
-                            eyes.line(orientation="horizontal", module_name="left",
-                                      color1_name="white", value1=-data["kalman"]["out"]["p"],
-                                      min_value1=-data["main"]["tol"], max_value1=data["main"]["tol"])
-                            eyes.line(orientation="horizontal", module_name="right",
-                                      color1_name="white", value1=-data["kalman"]["out"]["p"],
-                                      min_value1=-data["main"]["tol"], max_value1=data["main"]["tol"])
-                        case 4: # on
-                            if data["ps4"]["x"] and not data_last["ps4"]["x"]:
-                                data["main"]["mode"] = 0
-                            if not data["main"]["in_tol"]:
-                                data["main"]["mode"] = 0
-
-                            eyes.clear_range(0, eyes.num_leds_total)
-                            eyes.line(orientation="cross", module_name="left",
-                                      color1_name="blue", value1=data["ps4"]["left_x"],
-                                      min_value1=0, max_value1=255,
-                                      color2_name="red", value2=-(data["ps4"]["r2"]-data["ps4"]["l2"]),
-                                      min_value2=-255,
-                                      max_value2=255,
-                                      comb_color_name="green")
-                            eyes.line(orientation="cross", module_name="right",
-                                      color1_name="blue", value1=data["yaw_pid"]["out"],
-                                      min_value1=-50, max_value1=+50,
-                                      color2_name="red", value2=-data["lqr"]["out"],
-                                      min_value2=-100/2, max_value2=100/2,
-                                      comb_color_name="green")
-
-                    # enabled?
-                    data["main"]["en"] = data["main"]["mode"]==4
-                    if not data["main"]["en"]:
-                        data["motor_left"]["en"] = False
-                        data["motor_right"]["en"] = False
-                        data["yaw_pid"]["en"] = False
-                        data["lqr"]["en"] = False
-                    else:
-                        data["motor_left"]["en"] = True
-                        data["motor_right"]["en"] = True
-                        data["yaw_pid"]["en"] = True
-                        data["lqr"]["en"] = True
-
-                    # reset
-                    if not (data["main"]["mode"] == data_last["main"]["mode"]):
-                        imu.reset()
-                        motor_left.reset()
-                        motor_right.reset()
-                        yaw_controller.reset()
-                        data["sp"] = {
-                                "p":0.0,
-                                "x":0.0,
-                                "pv": 0.0,
-                                "v": 0.0,
-                                "yaw": 0.0
-                                }
-                        data["sp_LP"] = {
-                                "p":0.0,
-                                "x":0.0,
-                                "pv": 0.0,
-                                "v": 0.0,
-                                "yaw": 0.0
-                                }
-
-                    # Read IMU
-                    data["imu"] = imu.loop()
-                    # Read Motors
-                    data["motor_left"] = motor_left.get()
-                    data["motor_right"] = motor_right.get()
-                    data["main"]["yaw"] = data["physics"]["r"] * (data["motor_right"]["position"] - data["motor_left"]["position"]) / data["physics"]["r_y"]
-
-                    # Process inputs
-                    if data["main"]["mode"]==4:
-                        d = 0
-                        r = 0
-                        if not data["ps4"]["dpad_y"] == data_last["ps4"]["dpad_y"]:
-                            d = d + 0.5 * data["ps4"]["dpad_y"]# distance in meters per click
-                        if not data["ps4"]["dpad_x"] == data_last["ps4"]["dpad_x"]:
-                            r = r + 1/8 * data["ps4"]["dpad_x"] # angle per click
-
-                        v_sp = np.interp((data["ps4"]["r2"]-data["ps4"]["l2"]),[-255, 255],[-data["physics"]["v_max"], data["physics"]["v_max"]] )
-                        y_sp = np.interp(data["ps4"]["left_x"],[0, 255],[-data["physics"]["y_max"], data["physics"]["y_max"]] )
-                        d = d + v_sp*dt  # distance in meters per click
-                        r = r + y_sp*dt
-                        data["sp"]["x"] = data["sp"]["x"] + d / data["physics"]["r"]
-                        data["sp"]["yaw"] = data["sp"]["yaw"] + r * 2 * math.pi
-
-
-
-
-                    # Filtering
-                    data["imu"]["gyro_x_LP"] = gyro_x_LP.filter(data["imu"]["gyro_x"])
-                    data["imu"]["pitch_LP"] = pitch_LP.filter(data["imu"]["pitch"])
-                    data["motor_left"]["velocity_LP"] = motor_left_vel_LP.filter(data["motor_left"]["velocity"])
-                    data["motor_right"]["velocity_LP"] = motor_right_vel_LP.filter(data["motor_right"]["velocity"])
-
-                    data["sp_LP"]["p"] = p_sp_LP.filter(data["sp"]["p"])
-                    data["sp_LP"]["x"] = x_sp_LP.filter(data["sp"]["x"])
-                    data["sp_LP"]["pv"] = pv_sp_LP.filter(data["sp"]["pv"])
-                    data["sp_LP"]["v"] = v_sp_LP.filter(data["sp"]["v"])
-                    data["sp_LP"]["yaw"] = yaw_sp_LP.filter(data["sp"]["yaw"])
-
-                    data["kalman"] = kalman.loop(u = data["lqr"]["out"],
-                                                x1 = data["imu"]["pitch_LP"],
-                                                x2 = (data["motor_left"]["position"]+data["motor_right"]["position"])/2,
-                                                x3 = data["imu"]["gyro_x_LP"],
-                                                x4 = (data["motor_left"]["velocity_LP"]+data["motor_right"]["velocity_LP"])/2,
-                                                data = data["kalman"])
-
-                    # Controller
-                    data["lqr"] = lqr_controller.loop(sp = data["sp_LP"],
-                                                      x1 = data["kalman"]["out"]["p"],
-                                                      x2 = data["kalman"]["out"]["x"],
-                                                      x3 = data["kalman"]["out"]["pv"],
-                                                      x4 = data["kalman"]["out"]["v"],
-                                                      data=data["lqr"])
-                    data["yaw_pid"] = yaw_controller.loop(sp=data["sp_LP"]["yaw"],x=data["main"]["yaw"],data=data["yaw_pid"])
-
-                    # Set Motors
-                    data["motor_left"]["sp"] = data["lqr"]["out"] - data["yaw_pid"]["out"]
-                    data["motor_right"]["sp"] = data["lqr"]["out"] + data["yaw_pid"]["out"]
-                    motor_left.set(data["motor_left"])
-                    motor_right.set(data["motor_right"])
-
-                    # Show Eyes
-                    eyes.show()
-
-                    # Misc
-                    data["main"]["frequency"] = frequency
-                    data["main"]["time"] = now
-                    data_last = copy.deepcopy(data)
-
-                    # Communication
-                    # msg = socket.recv_string()
-                    # if not "blabla" in msg:
-                    #     if "lqr" in msg:
-                    #         rcv = json.loads(msg)
-                    #         print(f"got data: {rcv}")
-                    #         data["yaw_pid"]["config"] = rcv["yaw"]
-                    #         data["lqr"]["config"] = rcv["lqr"]
-                    #         lqr_controller.calc_gains(data["lqr"]["config"])
-                    #         data["kalman"]["config"] = rcv["kalman"]
-                    #         kalman.calc_gains(data["kalman"]["config"])
-                    #     if "sp" in msg:
-                    #         rcv = json.loads(msg)
-                    #         print(f"got data: {rcv}")
-                    #         data["sp"] = rcv["sp"]
-                    #
-                    # message = json.dumps(data)
-                    # socket.send_string(message)
-                    current_values = [data["kalman"]["out"]["p"],
-                                      data["sp_LP"]["p"],
-                                      data["kalman"]["out"]["x"],
-                                      data["sp_LP"]["x"],
-                                      data["main"]["yaw"],
-                                      data["sp_LP"]["yaw"],
-                                      data["kalman"]["out"]["p"],
-                                      data["kalman"]["out"]["p"]
-                                        ]
-
-                    # Debugging
-                    mode = data["main"]["mode"]
-                    print(f"{frequency:.3f}\t{mode}")
-                    # value = data["imu"]["yaw"]
-                    # value2 = data["main"]["yaw"]
-                    # print( f"imu:{value:.3f}\tmot:{value2:.3f}")
-                    # value = data["sp"]["yaw"]
-                    # value3 = data["main"]["yaw"]
-                    # value2 = data["sp_LP"]["yaw"]
-                    # print( f"y_sp:{value:.3f}, y_sp_LP:{value2:.3f}, out:{value3:.3f}")
-                    # value = data["sp"]["x"]
-                    # value3 = data["kalman"]["out"]["x"]
-                    # value2 = data["sp_LP"]["x"]
-                    # print( f"x_sp:{value:.3f}, x_sp_LP:{value2:.3f}, out:{value3:.3f}")
-                    # print(json.dumps(data, indent=4))
-                    # print(str(controller.integral))
-                else:
-                    time.sleep(1/1000)
+                scheduler.run_once()
             except Exception as e:
                 print(str(e))
                 traceback.format_exc()
     except Exception as e:
         print(str(e))
     finally:
-        data["motor_left"]["en"] = False
-        data["motor_right"]["en"] = False
-        motor_left.set(data["motor_left"])
-        motor_right.set(data["motor_right"])
+        data.motor_left.en = False
+        data.motor_right.en = False
+        motors.set(data.motor_left, data.motor_right)
         eyes.clear()
+        if tuner is not None:
+            tuner.close()
+        if socket is not None:
+            socket.close(linger=0)
+
+    result = {
+        "backend": backend,
+        "ticks": scheduler.loop.ticks,
+        "time": clock() - start_time,
+        "wall": time.perf_counter() - start_wall,
+        "mode": data.main.mode,
+        "pitch": data.kalman.out.p,
+        "tasks": scheduler.stats()
+    }
+    if devices.plant is not None:
+        result["plant_pitch"] = devices.plant.pitch
+        result["fallen"] = devices.plant.fallen
+    return result
 
 from fastapi import FastAPI, WebSocket
 from fastapi.staticfiles import StaticFiles
@@ -466,24 +521,99 @@ async def read_index():
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    global current_values
     await websocket.accept()
     try:
         while True:
-            await websocket.send_text(json.dumps(current_values))
+            values = telemetry.read()
+            if values is None:
+                values = [0.0] * TELEMETRY_WIDTH
+            await websocket.send_text(json.dumps(values))
             await asyncio.sleep(0.02)  # 50 Hz
     except Exception as e:
         print(f"Verbindung geschlossen: {e}")
 
-def start_system():
-    # Main-Thread starten
-    main_thread = threading.Thread(target=main_loop, daemon=True)
-    main_thread.start()
+@app.get("/latency")
+async def latency():
+    """Latency histograms of the control tick stages (count, mean, p50, p99, max in µs)."""
+    return profiler.summary()
+
+@app.post("/latency/reset")
+async def latency_reset():
+    profiler.reset()
+    return {"reset": True}
+
+def run_controller(telemetry_name, profiler_name, core=None, backend="robot"):
+    """Entry point of the controller process."""
+    # SIGTERM als normales Beenden behandeln, damit die Motoren abgeschaltet werden
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if core is not None:
+        os.sched_setaffinity(0, {core})
+    ring = TelemetryRing(name=telemetry_name)
+    stage_profiler = StageProfiler(STAGES, name=profiler_name)
+    try:
+        # the simulation runs in real time next to the web server
+        main_loop(ring, stage_profiler, backend=backend, realtime=True)
+    finally:
+        ring.close()
+        stage_profiler.close()
+
+def start_system(mode="process", core=None, backend="robot"):
+    global telemetry, profiler
+    telemetry = TelemetryRing(create=True, width=TELEMETRY_WIDTH)
+    profiler = StageProfiler(STAGES, create=True)
+
+    controller = None
+    if mode == "process":
+        # Regler in eigenem Prozess starten (kein GIL-Wettbewerb mit dem Webserver)
+        controller = multiprocessing.Process(target=run_controller, args=(telemetry.name, profiler.name, core, backend),
+                                             name="Controller")
+        controller.start()
+    else:
+        # Main-Thread starten
+        main_thread = threading.Thread(target=main_loop, args=(telemetry, profiler),
+                                       kwargs={"backend": backend, "realtime": True}, daemon=True)
+        main_thread.start()
 
     # FastAPI Server starten
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    try:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
+    finally:
+        if controller is not None:
+            controller.terminate()
+            controller.join()
+        telemetry.close()
+        profiler.close()
+
+def run_headless(backend="sim", duration=60.0, realtime=False):
+    """Runs only the control loop for `duration` seconds, e.g. as throughput benchmark of the simulation."""
+    ring = TelemetryRing(create=True, width=TELEMETRY_WIDTH)
+    stage_profiler = StageProfiler(STAGES, create=True)
+    try:
+        result = main_loop(ring, stage_profiler, backend=backend, duration=duration, realtime=realtime,
+                           port=None, verbose=False)
+        result["ticks_per_second"] = result["ticks"] / result["wall"]
+        result["latency"] = stage_profiler.summary()
+    finally:
+        ring.close()
+        stage_profiler.close()
+    return result
 
 # Starten
 if __name__ == "__main__":
-    start_system()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="BalanceBoy")
+    parser.add_argument("--mode", choices=["process", "thread"], default="process",
+                        help="Regler in eigenem Prozess oder als Thread neben dem Webserver")
+    parser.add_argument("--core", type=int, default=None, help="CPU-Kern für den Regler-Prozess")
+    parser.add_argument("--backend", choices=["robot", "sim"], default="robot",
+                        help="echte Hardware oder simulierter Roboter (hal.py)")
+    parser.add_argument("--headless", action="store_true",
+                        help="nur den Regler ohne Webserver laufen lassen und eine Zusammenfassung ausgeben")
+    parser.add_argument("--duration", type=float, default=60.0, help="Laufzeit im headless-Betrieb in s")
+    parser.add_argument("--realtime", action="store_true", help="Simulation in Echtzeit statt so schnell wie möglich")
+    args = parser.parse_args()
+    if args.headless:
+        print(json.dumps(run_headless(backend=args.backend, duration=args.duration, realtime=args.realtime),
+                         indent=4))
+    else:
+        start_system(mode=args.mode, core=args.core, backend=args.backend)
\ No newline at end of file
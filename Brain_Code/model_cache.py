@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+# part of every key, increase when the cached content changes
+CACHE_VERSION = 1
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "balanceboy")
+
+
+def continuous_model(physics):
+    """State space matrices A, B of the balancing robot, state [pitch, x, pitch velocity, v]."""
+    r = physics["r"]
+    R = physics["R"]
+    g = physics["g"]
+    m = physics["m"]
+    J = physics["J"]
+    tau_m = physics["tau_m"]
+    K_m = physics["K_m"]
+    A = np.array([[0, 0, 1, 0],
+                  [0, 0, 0, 1],
+                  [(m * g * R) / J, 0, 0, (m * r * R) / (tau_m * J)],
+                  [0, 0, 0, -1 / tau_m]])
+    B = np.array([[0],
+                  [0],
+                  [(-K_m * m * r * R) / (tau_m * J)],
+                  [K_m / tau_m]])
+    return A, B
+
+
+def _plain(value):
+    """JSON-serializable form of configs that may contain numpy values."""
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_plain(v) for v in value]
+    if isinstance(value, (np.floating, np.integer)):
+        return value.item()
+    return value
+
+
+class ModelCache:
+    """
+    Discretized model and LQR/Kalman gains, computed once per parameter set.
+
+    Results are kept in memory and as .npz files in `path`, keyed by a hash of
+    the physics dict, the weights and the rate. Ad/Bd are shared by both gain
+    calculations, so a boot or a retune with known values does not run c2d or
+    a Riccati solver at all. path=None disables the disk cache.
+    python-control (and with it scipy) is only imported when a value has to be
+    computed, a boot with a warm cache does not load it.
+    """
+    def __init__(self, name="ModelCache", logging_level=logging.INFO, path=DEFAULT_PATH):
+        self.path = path
+        self.memory = {}
+        self.hits = 0
+        self.misses = 0
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+    def key(self, kind, **parts):
+        parts = _plain(parts)
+        parts["version"] = CACHE_VERSION
+        digest = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:24]
+        return f"{kind}-{digest}"
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".npz")
+
+    def _load(self, key):
+        if key in self.memory:
+            return self.memory[key]
+        if self.path is not None:
+            try:
+                with np.load(self._file(key)) as f:
+                    value = {name: f[name] for name in f.files}
+                self.memory[key] = value
+                return value
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self.logger.warning(f"Cache-Datei {key} unlesbar: {e}")
+        return None
+
+    def _store(self, key, value):
+        self.memory[key] = value
+        if self.path is None:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # write to a temporary file first, a crash must not leave a broken entry
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".npz")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **value)
+            os.replace(tmp, self._file(key))
+        except OSError as e:
+            self.logger.warning(f"Cache nicht gespeichert: {e}")
+
+    def _get(self, key, compute):
+        value = self._load(key)
+        if value is None:
+            self.misses += 1
+            value = compute()
+            self._store(key, value)
+        else:
+            self.hits += 1
+        return value
+
+    def discrete(self, physics, freq):
+        """Zero-order hold discretization (Ad, Bd) of the model at `freq`."""
+        def compute():
+            import control
+            A, B = continuous_model(physics)
+            sys_disc = control.c2d(control.StateSpace(A, B, np.eye(4), np.zeros((4, 1))), 1 / freq, method='zoh')
+            return {"Ad": np.asarray(sys_disc.A), "Bd": np.asarray(sys_disc.B)}
+        value = self._get(self.key("model", physics=physics, freq=freq), compute)
+        return value["Ad"], value["Bd"]
+
+    def lqr(self, physics, Q, R, freq):
+        """Discrete LQR gain K for the weights Q (diagonal) and R."""
+        def compute():
+            import control
+            Ad, Bd = self.discrete(physics, freq)
+            K, S, E = control.dlqr(Ad, Bd, np.diag(Q), np.array([[R]]))
+            return {"K": np.asarray(K), "S": np.asarray(S), "E": np.asarray(E)}
+        return self._get(self.key("lqr", physics=physics, Q=Q, R=R, freq=freq), compute)["K"]
+
+    def kalman(self, physics, Q, R, freq):
+        """Steady-state Kalman gain L and error covariance P for full state measurement."""
+        def compute():
+            import control
+            Ad, Bd = self.discrete(physics, freq)
+            n = Ad.shape[0]
+            L, P, E = control.dlqe(Ad, np.eye(n), np.eye(n), np.diag(Q), np.diag(R))
+            return {"L": np.asarray(L), "P": np.asarray(P), "E": np.asarray(E)}
+        value = self._get(self.key("kalman", physics=physics, Q=Q, R=R, freq=freq), compute)
+        return value["L"], value["P"]
+
+
+_cache = None
+
+
+def get_cache():
+    """Process-wide cache shared by LQR and KalmanFilter."""
+    global _cache
+    if _cache is None:
+        _cache = ModelCache()
+    return _cache
@@ -1,11 +1,15 @@
+import os
+import select
 import time
 import serial
 import logging
-import struct
 import json
 
+from motor_protocol import TelemetryParser, FrameWindow, COMMAND_FRAME_SIZE, encode_command
+
 class MOTOR:
-    def __init__(self, name="Motor", logging_level=logging.INFO, port="/dev/ttyACM0", invert=False, min_max=7.5):
+    def __init__(self, name="Motor", logging_level=logging.INFO, port="/dev/ttyACM0", invert=False, min_max=7.5,
+                 aggregate=False, window=0.02, frame_period=0.013, protocol="ascii", refresh=0.1):
         self.invert = invert
         self.factor = (min_max/100.0)
         self.pos = 0.0
@@ -13,7 +17,7 @@ class MOTOR:
         self.vel = 0.0
         self.sp = 0.0
         self.en = False
-        self.en_last = False
+        self.en_last = None
         self.frequency = 0.0
         self.now = 0.0
         self.last_time = 0.0
@@ -23,15 +27,40 @@ class MOTOR:
             "position": self.pos,
             "velocity": self.vel,
             "velocity_LP": self.vel,
+            "velocity_mean": self.vel,
+            "velocity_slope": self.vel,
+            "frames": 0,
             "time": self.now,
             "frequency": self.frequency}
 
+        # keep every received frame and evaluate the ones of the last `window` seconds
+        self.aggregate = aggregate
+        self.window = window
+        self.frame_period = frame_period  # reportCycle of the firmware
+        self.frames = FrameWindow() if aggregate else None
+
+        # "ascii": Commander commands (TE0/TE1, T<target>), "binary": command frames (motor_protocol.py)
+        self.protocol = protocol
+        self.refresh = refresh  # resend unchanged commands after this time in s
+        self.seq = 0
+        self.command = bytearray(COMMAND_FRAME_SIZE)
+        self.target_last = None
+        self.send_time = 0.0
+        self.writes = 0
+
         self.name = name
         self.logger = logging.getLogger(self.name)
         self.logger.setLevel(logging_level)
 
+        self.timeout = 0.1
+        self.parser = TelemetryParser()
+        self.fd = None
+
         try:
-            self.mot = serial.Serial(port, 921600, timeout=0.1)
+            self.mot = serial.Serial(port, 921600, timeout=self.timeout)
+            # pyserial opens the port non-blocking on POSIX, so os.readv() returns what is buffered
+            if hasattr(os, "readv") and hasattr(self.mot, "fileno"):
+                self.fd = self.mot.fileno()
 
             # # foc_current
             # config_string = "TT2\n"
@@ -52,53 +81,94 @@ class MOTOR:
             self.logger.error("Initialisierung fehlgeschlagen: " + str(e))
             self.mot = None
 
+    def _read_available(self):
+        """Reads everything the driver has buffered into the parser, one syscall on POSIX."""
+        free = self.parser.free()
+        if self.fd is not None:
+            try:
+                n = os.readv(self.fd, [free])
+            except BlockingIOError:
+                n = 0
+        else:
+            waiting = self.mot.in_waiting
+            n = self.mot.readinto(free[:min(waiting, len(free))]) if waiting else 0
+        self.parser.commit(n)
+        return n
+
+    def _poll(self):
+        """Newest frame from the bytes buffered right now, without waiting."""
+        self._read_available()
+        return self.parser.parse(self.frames, time.perf_counter(), self.frame_period)
+
     def _read_floats_with_markers(self):
-        while True:
-            byte = self.mot.read(size=1)
-            if not byte:
-                return None
-            if byte[0] == 0x02:  # Startmarker gefunden
-                data = self.mot.read(size=8)  # Zwei Float-Werte (2 x 4 Bytes)
-                if len(data) != 8:
-                    continue  # Unvollständige Daten, erneut versuchen
-                end = self.mot.read(size=1)
-                if not end or end[0] != 0x03:
-                    continue  # Endmarker nicht gefunden, erneut versuchen
-                self.mot.reset_input_buffer()
-                return struct.unpack('<ff', data)
+        floats = self._poll()
+        if floats is None:
+            # nothing complete buffered: wait for the next frame like the blocking read did
+            deadline = time.perf_counter() + self.timeout
+            while floats is None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                if self.fd is not None:
+                    select.select([self.fd], [], [], remaining)
+                else:
+                    self.parser.feed(self.mot.read(1))
+                self._read_available()
+                floats = self.parser.parse(self.frames, time.perf_counter(), self.frame_period)
+        return floats
+
+    def _store(self, floats):
+        pos, vel = floats
+        if self.invert:
+            self.pos = -pos - self.offset
+            self.vel = -vel
+        else:
+            self.pos = pos - self.offset
+            self.vel = vel
 
     def _rcv_data(self):
         try:
             floats = self._read_floats_with_markers()
             if floats:
-                pos, vel = floats
-                if self.invert:
-                    self.pos = -pos - self.offset
-                    self.vel = -vel
-                else:
-                    self.pos = pos - self.offset
-                    self.vel = vel
+                self._store(floats)
         except (ValueError, UnicodeDecodeError):
             self.logger.info("Falsches Datenformat")
 
     def _send_data(self):
         try:
-            # Motor ein-/ausschalten
+            if self.invert:
+                target = -self.sp*self.factor
+            else:
+                target = self.sp*self.factor
             if not self.en:
-                en_string = "TE0\n"
-                self.mot.write(en_string.encode('utf-8'))
-            elif self.en and not self.en_last:
-                en_string = "TE1\n"
-                self.mot.write(en_string.encode('utf-8'))
-            self.en_last = self.en
+                target = 0.0
 
-            # Sollwert senden (mit 3 Nachkommastellen)
-            if self.en:
-                if self.invert:
-                    sp_string = f"T{(-self.sp*self.factor):.3f}\n"
+            now = time.perf_counter()
+            if self.protocol == "binary":
+                # nothing changed: only refresh from time to time in case a frame got lost
+                if (self.en == self.en_last and target == self.target_last
+                        and now - self.send_time < self.refresh):
+                    return
+                self.seq = (self.seq + 1) & 0xFF
+                self.mot.write(encode_command(self.command, self.seq, self.en, target))
+            else:
+                # Sollwert mit 3 Nachkommastellen
+                sp_string = f"T{target:.3f}\n"
+                if (self.en == self.en_last and sp_string == self.target_last
+                        and now - self.send_time < self.refresh):
+                    return
+                # Motor ein-/ausschalten und Sollwert in einem write()
+                if not self.en:
+                    self.mot.write(b"TE0\n")
+                elif self.en_last:
+                    self.mot.write(sp_string.encode('utf-8'))
                 else:
-                    sp_string = f"T{(self.sp*self.factor):.3f}\n"
-                self.mot.write(sp_string.encode('utf-8'))
+                    self.mot.write(("TE1\n" + sp_string).encode('utf-8'))
+                target = sp_string
+            self.en_last = self.en
+            self.target_last = target
+            self.send_time = now
+            self.writes += 1
             # self.logger.error(self.data)
             # print(self.name+json.dumps(self.data, indent=4))
         except Exception as e:
@@ -112,19 +182,107 @@ class MOTOR:
         self._send_data()
         self.logger.debug("set")
 
-    def get(self):
+    def _start_get(self):
         self.now = time.perf_counter()
         self.frequency = (1 / (self.now - self.last_time))
         self.last_time = self.now
-        self._rcv_data()
+
+    def _update_data(self):
         self.data["position"] = self.pos
         self.data["velocity"] = self.vel
+        if self.aggregate:
+            sign = -1.0 if self.invert else 1.0
+            self.data["frames"] = self.frames.aggregate(self.now, self.window)
+            self.data["velocity_mean"] = sign * self.frames.velocity_mean
+            self.data["velocity_slope"] = sign * self.frames.velocity_slope
+        else:
+            self.data["velocity_mean"] = self.vel
+            self.data["velocity_slope"] = self.vel
         self.data["time"] = self.now
         self.data["frequency"] = self.frequency
+        return self.data
+
+    def get(self):
+        self._start_get()
+        self._rcv_data()
+        self._update_data()
         self.logger.debug("get")
         return self.data
 
     def reset(self):
         self.logger.debug("reset")
         self.offset = self.offset + self.pos
-        self.pos = 0.0
\ No newline at end of file
+        self.pos = 0.0
+
+class DualMotor:
+    """
+    Reads and writes two MOTORs concurrently.
+
+    get() first takes what both ports have buffered and then waits with one
+    select() on the ports that still miss their frame, so a tick waits as long
+    as the slower port and not for the sum of both. Ports without file
+    descriptor are read one after the other like before.
+    """
+    def __init__(self, left, right, name="Motors", logging_level=logging.INFO):
+        self.left = left
+        self.right = right
+        self.motors = (left, right)
+        self.timeout = max(left.timeout, right.timeout)
+        self.pending = []
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+        self.concurrent = all(motor.fd is not None for motor in self.motors)
+        if not self.concurrent:
+            self.logger.info("Kein Dateideskriptor, Motoren werden nacheinander gelesen.")
+
+    def get(self):
+        """Returns the data of both motors after each received a frame (or the timeout passed)."""
+        if not self.concurrent:
+            return self.left.get(), self.right.get()
+
+        pending = self.pending
+        pending.clear()
+        for motor in self.motors:
+            motor._start_get()
+            try:
+                floats = motor._poll()
+            except (ValueError, OSError) as e:
+                motor.logger.error(str(e))
+                continue
+            if floats is None:
+                pending.append(motor)
+            else:
+                motor._store(floats)
+
+        deadline = time.perf_counter() + self.timeout
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            # only the ports still waiting: a finished port stays readable and would wake select() at once
+            readable = select.select([motor.fd for motor in pending], [], [], remaining)[0]
+            for motor in self.motors:
+                if motor not in pending or motor.fd not in readable:
+                    continue
+                try:
+                    floats = motor._poll()
+                except (ValueError, OSError) as e:
+                    motor.logger.error(str(e))
+                    pending.remove(motor)
+                    continue
+                if floats is not None:
+                    motor._store(floats)
+                    pending.remove(motor)
+
+        return self.left._update_data(), self.right._update_data()
+
+    def set(self, left, right):
+        """Sends both setpoints; the writes do not wait for the ports."""
+        self.left.set(left)
+        self.right.set(right)
+
+    def reset(self):
+        self.left.reset()
+        self.right.reset()
@@ -0,0 +1,288 @@
+import argparse
+import collections
+import logging
+import math
+import os
+import random
+import select
+import threading
+import time
+import tty
+
+from motor_protocol import STX, ETX, TELEMETRY, COMMAND_FRAME_SIZE, decode_command
+from state import State
+
+# motor model of the robot: physics K_m is the wheel velocity in rad/s per % of the command
+# (MotorState.sp, ±100), MOTOR sends sp * min_max / 100 as target voltage (min_max of hal.robot_devices)
+MIN_MAX = 7.5  # V at sp = 100
+K_M = State.fields["physics"]["K_m"] * 100.0 / MIN_MAX  # rad/s per V, about 3.1
+TAU_M = State.fields["physics"]["tau_m"]  # s
+
+
+class MotorEmulator:
+    """
+    Emulates one motor board (Motor_Code/src/main.cpp) on a pseudo-terminal.
+
+    MOTOR can open `port` like the real /dev/serial/by-id/... device. Incoming
+    bytes are handled like readSerial() of the firmware: commander lines (TT, TC,
+    TVF, TE, T<target>) and binary command frames. Every `report_cycle` seconds
+    a telemetry frame 0x02 <float position> <float velocity> 0x03 is written.
+
+    The motor is a first-order model, shaft velocity (rad/s) follows
+    K_m * target (V) with the time constant tau_m, by default the identified
+    motor of state.py (K_M, TAU_M); the reported velocity is low-pass filtered
+    with the TVF time constant like motor.shaft_velocity.
+
+    Faults for stress tests:
+        latency: delay in s until a received command takes effect
+        jitter:  standard deviation in s of the report time
+        corrupt: probability that one byte of a frame is flipped
+        drop:    probability that a frame is not sent
+    """
+    def __init__(self, name="Motor_Emulator", logging_level=logging.INFO, report_cycle=0.013, tau_m=TAU_M,
+                 K_m=K_M, voltage_limit=8.0, latency=0.0, jitter=0.0, corrupt=0.0, drop=0.0, seed=None,
+                 clock=time.perf_counter):
+        self.report_cycle = report_cycle
+        self.tau_m = tau_m
+        self.K_m = K_m  # shaft velocity in rad/s per target unit (V in voltage torque mode)
+        self.voltage_limit = voltage_limit
+        self.latency = latency
+        self.jitter = jitter
+        self.corrupt = corrupt
+        self.drop = drop
+        self.random = random.Random(seed)
+        self.clock = clock
+
+        # Zustand der Firmware
+        self.enabled = False
+        self.target = 0.0
+        self.torque_type = 0
+        self.controller = 0
+        self.velocity_tf = 0.0
+        self.last_seq = 0
+        self.position = 0.0
+        self.velocity = 0.0
+        self.velocity_LP = 0.0
+
+        # statistics
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.frames_corrupted = 0
+        self.commands = 0
+        self.command_frames = 0
+        self.bad_frames = 0
+        self.unknown = 0
+        self.last_command_time = 0.0
+
+        self._pending = collections.deque()  # (apply time, command) waiting for `latency`
+        self._frame = bytearray(COMMAND_FRAME_SIZE)
+        self._frame_len = 0
+        self._line = bytearray()
+        self._out = bytearray(1 + TELEMETRY.size + 1)
+        self._out[0] = STX
+        self._out[-1] = ETX
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        self.thread = None
+        self.running = False
+
+        self.name = name
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+        self.logger.info(f"Emulator auf {self.port}")
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._thread_loop, name=self.name, daemon=True)
+            self.thread.start()
+            self.logger.info("Emulator gestartet.")
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.logger.info("Emulator gestoppt.")
+
+    def close(self):
+        self.stop()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def stats(self):
+        return {
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "frames_corrupted": self.frames_corrupted,
+            "commands": self.commands,
+            "command_frames": self.command_frames,
+            "bad_frames": self.bad_frames,
+            "unknown": self.unknown
+        }
+
+    # --- input ---------------------------------------------------------------
+
+    def feed(self, data, now):
+        """Handles received bytes like readSerial() of the firmware."""
+        for ch in data:
+            if self._frame_len > 0 or (len(self._line) == 0 and ch == STX):
+                self._frame[self._frame_len] = ch
+                self._frame_len += 1
+                if self._frame_len == COMMAND_FRAME_SIZE:
+                    command = decode_command(self._frame)
+                    if command is not None:
+                        self.command_frames += 1
+                        self._schedule(("frame", command), now)
+                        self._frame_len = 0
+                    else:
+                        # resync at the next start marker inside the frame
+                        self.bad_frames += 1
+                        start = self._frame.find(STX, 1)
+                        if start < 0:
+                            start = COMMAND_FRAME_SIZE
+                        self._frame_len = COMMAND_FRAME_SIZE - start
+                        self._frame[:self._frame_len] = self._frame[start:]
+                continue
+            if ch == ord("\n"):
+                self._schedule(("line", self._line.decode("ascii", "replace").strip()), now)
+                self._line.clear()
+            elif len(self._line) < 63:
+                self._line.append(ch)
+
+    def _schedule(self, command, now):
+        self.last_command_time = now
+        self._pending.append((now + self.latency, command))
+
+    def _apply_pending(self, now):
+        while self._pending and self._pending[0][0] <= now:
+            kind, command = self._pending.popleft()[1]
+            if kind == "frame":
+                self.last_seq, enable, target = command
+                self.enabled = enable
+                self.target = target if enable else 0.0
+            else:
+                self.run(command)
+
+    def run(self, line):
+        """Subset of Commander::motion() used by MOTOR."""
+        self.commands += 1
+        if not line.startswith("T") or len(line) < 2:
+            self.unknown += 1
+            return
+        cmd = line[1:]
+        try:
+            if cmd.startswith("VF"):
+                self.velocity_tf = float(cmd[2:])
+            elif cmd[0] == "T":
+                self.torque_type = int(float(cmd[1:]))
+            elif cmd[0] == "C":
+                self.controller = int(float(cmd[1:]))
+            elif cmd[0] == "E":
+                self.enabled = bool(int(float(cmd[1:])))
+                if not self.enabled:
+                    self.target = 0.0
+            else:
+                self.target = float(cmd)
+        except ValueError:
+            self.unknown += 1
+
+    # --- model and output ----------------------------------------------------
+
+    def step(self, dt):
+        """Advances the motor model by dt seconds."""
+        if dt <= 0:
+            return
+        u = 0.0
+        if self.enabled:
+            u = max(-self.voltage_limit, min(self.voltage_limit, self.target))
+        # exakte Diskretisierung des PT1-Glieds
+        a = math.exp(-dt / self.tau_m)
+        self.velocity = a * self.velocity + (1 - a) * self.K_m * u
+        self.position += self.velocity * dt
+        if self.velocity_tf > 0:
+            b = math.exp(-dt / self.velocity_tf)
+            self.velocity_LP = b * self.velocity_LP + (1 - b) * self.velocity
+        else:
+            self.velocity_LP = self.velocity
+
+    def frame(self):
+        """Telemetry frame of the current state, with injected corruption."""
+        TELEMETRY.pack_into(self._out, 1, self.position, self.velocity_LP)
+        out = self._out
+        if self.corrupt and self.random.random() < self.corrupt:
+            out = bytearray(out)
+            out[self.random.randrange(len(out))] ^= 1 << self.random.randrange(8)
+            self.frames_corrupted += 1
+        return out
+
+    def _send(self):
+        if self.drop and self.random.random() < self.drop:
+            self.frames_dropped += 1
+            return
+        os.write(self.master, self.frame())
+        self.frames_sent += 1
+
+    def _next_report(self, t):
+        if self.jitter:
+            return t + max(0.0, self.random.gauss(self.report_cycle, self.jitter))
+        return t + self.report_cycle
+
+    def _thread_loop(self):
+        last = self.clock()
+        report = self._next_report(last)
+        while self.running:
+            now = self.clock()
+            wait = report - now
+            if self._pending:
+                wait = min(wait, self._pending[0][0] - now)
+            readable, _, _ = select.select([self.master], [], [], max(0.0, min(wait, 0.05)))
+            now = self.clock()
+            if readable:
+                try:
+                    self.feed(os.read(self.master, 4096), now)
+                except OSError:
+                    # Gegenseite geschlossen
+                    time.sleep(0.001)
+            self._apply_pending(now)
+            self.step(now - last)
+            last = now
+            if now >= report:
+                self._send()
+                report = self._next_report(report)
+                if report < now:
+                    report = self._next_report(now)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SimpleFOC motor board emulator on a pseudo-terminal")
+    parser.add_argument("--count", type=int, default=1, help="number of emulated boards")
+    parser.add_argument("--rate", type=float, default=1 / 0.013, help="telemetry frames per second")
+    parser.add_argument("--tau-m", type=float, default=TAU_M, help="motor time constant in s")
+    parser.add_argument("--K-m", type=float, default=K_M, help="motor gain in rad/s per V")
+    parser.add_argument("--latency", type=float, default=0.0, help="command latency in s")
+    parser.add_argument("--jitter", type=float, default=0.0, help="report jitter in s")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="probability of a corrupted frame")
+    parser.add_argument("--drop", type=float, default=0.0, help="probability of a dropped frame")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    emulators = [MotorEmulator(name=f"Motor_Emulator_{i}", report_cycle=1 / args.rate, tau_m=args.tau_m,
+                               K_m=args.K_m, latency=args.latency, jitter=args.jitter, corrupt=args.corrupt,
+                               drop=args.drop, seed=args.seed).start()
+                 for i in range(args.count)]
+    for emulator in emulators:
+        print(emulator.port)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for emulator in emulators:
+            print(emulator.port, emulator.stats())
+            emulator.close()
@@ -0,0 +1,195 @@
+import struct
+
+import numpy as np
+
+# Telemetry frame of Motor_Code/src/main.cpp: 0x02 <float position> <float velocity> 0x03
+STX = 0x02
+ETX = 0x03
+TELEMETRY = struct.Struct("<ff")
+TELEMETRY_FRAME_SIZE = 1 + TELEMETRY.size + 1
+
+# Command frame: 0x02 <uint8 seq> <uint8 flags> <float target> <uint8 checksum> 0x03
+# flags bit 0 = enable, checksum = XOR of seq, flags and the four target bytes
+COMMAND = struct.Struct("<BBBfBB")
+COMMAND_FRAME_SIZE = COMMAND.size
+COMMAND_ENABLE = 0x01
+
+
+def encode_command(buffer, seq, enable, target):
+    """Writes a command frame into buffer (bytearray of COMMAND_FRAME_SIZE bytes)."""
+    flags = COMMAND_ENABLE if enable else 0
+    COMMAND.pack_into(buffer, 0, STX, seq, flags, target, 0, ETX)
+    checksum = 0
+    for i in range(1, COMMAND_FRAME_SIZE - 2):
+        checksum ^= buffer[i]
+    buffer[COMMAND_FRAME_SIZE - 2] = checksum
+    return buffer
+
+
+def decode_command(frame):
+    """Returns (seq, enable, target) of a command frame or None if it is invalid."""
+    stx, seq, flags, target, checksum, etx = COMMAND.unpack_from(frame, 0)
+    check = 0
+    for i in range(1, COMMAND_FRAME_SIZE - 2):
+        check ^= frame[i]
+    if stx != STX or etx != ETX or check != checksum:
+        return None
+    return seq, bool(flags & COMMAND_ENABLE), target
+
+
+class TelemetryParser:
+    """
+    Stream parser for the telemetry frames of the motor controller.
+
+    Bytes are read directly into a reusable buffer (free() / commit()), parse()
+    decodes all complete frames in place and keeps an incomplete tail for the
+    next read. Frames are not checksummed, so a start marker is only accepted
+    if the end marker follows at the expected position; everything else counts
+    as resync.
+    """
+    def __init__(self, size=4096):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.length = 0
+
+        self.frames = 0  # valid frames
+        self.dropped = 0  # valid frames superseded by a newer one in the same read
+        self.resyncs = 0  # skipped bytes / invalid start markers
+        self.overflows = 0  # buffer full, content discarded
+
+        self._offsets = []
+
+    def free(self):
+        """Writable view of the unused part of the buffer."""
+        if self.length == len(self.buffer):
+            # keep only what could still be the start of a frame
+            rest = TELEMETRY_FRAME_SIZE - 1
+            self.view[:rest] = self.view[self.length - rest:self.length]
+            self.length = rest
+            self.overflows += 1
+        return self.view[self.length:]
+
+    def commit(self, n):
+        self.length += n
+
+    def feed(self, data):
+        """Copies bytes into the buffer, for sources that can not read into a buffer."""
+        data = memoryview(data)
+        while len(data):
+            free = self.free()
+            n = min(len(free), len(data))
+            free[:n] = data[:n]
+            self.commit(n)
+            data = data[n:]
+
+    def parse(self, window=None, t=0.0, frame_period=0.0):
+        """
+        Decodes all complete frames and returns the newest one as (position, velocity) or None.
+
+        With a FrameWindow every frame is stored there. All frames of one read
+        arrived at host time t; older frames of the same read are dated back by
+        frame_period, the sending interval of the firmware.
+        """
+        buf = self.buffer
+        end = self.length
+        i = 0
+        newest = None
+        offsets = self._offsets
+        offsets.clear()
+        while True:
+            start = buf.find(STX, i, end)
+            if start < 0:
+                i = end
+                break
+            if start != i:
+                self.resyncs += 1
+            if start + TELEMETRY_FRAME_SIZE > end:
+                i = start
+                break
+            if buf[start + TELEMETRY_FRAME_SIZE - 1] != ETX:
+                self.resyncs += 1
+                i = start + 1
+                continue
+            if newest is not None and window is None:
+                self.dropped += 1
+            newest = start
+            offsets.append(start)
+            self.frames += 1
+            i = start + TELEMETRY_FRAME_SIZE
+
+        frame = None if newest is None else TELEMETRY.unpack_from(buf, newest + 1)
+        if window is not None:
+            n = len(offsets)
+            for k, offset in enumerate(offsets):
+                pos, vel = TELEMETRY.unpack_from(buf, offset + 1)
+                window.append(t - (n - 1 - k) * frame_period, pos, vel)
+
+        rest = end - i
+        if rest and i:
+            self.view[:rest] = self.view[i:end]
+        self.length = rest
+        return frame
+
+
+class FrameWindow:
+    """
+    Ring of the last telemetry frames with host receive timestamps.
+
+    aggregate() evaluates all frames of the last `window` seconds: mean
+    velocity, least-squares slope of position over time and newest sample.
+    """
+    def __init__(self, size=64):
+        self.size = size
+        self.t = np.zeros(size)
+        self.pos = np.zeros(size)
+        self.vel = np.zeros(size)
+        self.count = 0
+        self.last_time = -np.inf
+
+        self.n = 0
+        self.velocity_mean = 0.0
+        self.velocity_slope = 0.0
+
+    def append(self, t, pos, vel):
+        # keep timestamps monotonic when a read is dated back into the previous one
+        if t <= self.last_time:
+            t = self.last_time + 1e-6
+        idx = self.count % self.size
+        self.t[idx] = t
+        self.pos[idx] = pos
+        self.vel[idx] = vel
+        self.last_time = t
+        self.count += 1
+
+    def newest(self):
+        """(time, position, velocity) of the newest frame or None."""
+        if self.count == 0:
+            return None
+        idx = (self.count - 1) % self.size
+        return self.t[idx], self.pos[idx], self.vel[idx]
+
+    def aggregate(self, now, window):
+        """Updates n, velocity_mean and velocity_slope over the frames since now - window."""
+        self.n = 0
+        if self.count == 0:
+            return self.n
+        mask = self.t >= now - window
+        if self.count < self.size:
+            mask[self.count:] = False
+        n = int(mask.sum())
+        if n == 0:
+            # nothing new in the window: hold the newest sample
+            self.velocity_mean = float(self.vel[(self.count - 1) % self.size])
+            self.velocity_slope = self.velocity_mean
+            return self.n
+        self.velocity_mean = float(self.vel[mask].mean())
+        self.velocity_slope = self.velocity_mean
+        if n > 1:
+            t = self.t[mask]
+            t = t - t.mean()
+            var = float(t @ t)
+            if var > 0.0:
+                pos = self.pos[mask]
+                self.velocity_slope = float(t @ (pos - pos.mean())) / var
+        self.n = n
+        return self.n
@@ -0,0 +1,141 @@
+import math
+import time
+
+import numpy as np
+
+# angle distance to gimbal lock below which the third angle is set to zero (like scipy)
+GIMBAL_EPS = 1e-7
+
+
+def _wrap(angle):
+    if angle < -math.pi:
+        return angle + 2 * math.pi
+    if angle > math.pi:
+        return angle - 2 * math.pi
+    return angle
+
+
+def quaternion_to_euler(i, j, k, r):
+    """
+    Quaternion (i, j, k, real) to extrinsic "xyz" euler angles (roll, pitch, yaw) in radians.
+
+    Same result as scipy Rotation.from_quat([r, i, j, k], scalar_first=True).as_euler("xyz").
+    The quaternion does not have to be normalized. The angles are computed from
+    half-angle atan2 terms (Bernardes & Viollet 2022), which stay accurate close
+    to pitch = ±90°; in gimbal lock yaw is set to zero and the rotation is
+    expressed by roll alone.
+    """
+    a = r - j
+    b = i + k
+    c = j + r
+    d = k - i
+    pitch = 2 * math.atan2(math.hypot(c, d), math.hypot(a, b))
+    half_sum = math.atan2(b, a)
+    half_diff = math.atan2(d, c)
+    if abs(pitch) <= GIMBAL_EPS:
+        roll = 2 * half_sum
+        yaw = 0.0
+    elif abs(pitch - math.pi) <= GIMBAL_EPS:
+        roll = -2 * half_diff
+        yaw = 0.0
+    else:
+        roll = half_sum - half_diff
+        yaw = half_sum + half_diff
+    return _wrap(roll), pitch - math.pi / 2, _wrap(yaw)
+
+
+def quaternions_to_euler(quat, scalar_first=False):
+    """
+    Batched quaternion_to_euler() for logged data.
+
+    quat: array (..., 4) in the order (i, j, k, real), or (real, i, j, k) with
+    scalar_first=True. Returns an array (..., 3) of roll, pitch, yaw.
+    """
+    quat = np.asarray(quat, dtype=np.float64)
+    if scalar_first:
+        r, i, j, k = np.moveaxis(quat, -1, 0)
+    else:
+        i, j, k, r = np.moveaxis(quat, -1, 0)
+    a = r - j
+    b = i + k
+    c = j + r
+    d = k - i
+    pitch = 2 * np.arctan2(np.hypot(c, d), np.hypot(a, b))
+    half_sum = np.arctan2(b, a)
+    half_diff = np.arctan2(d, c)
+    roll = half_sum - half_diff
+    yaw = half_sum + half_diff
+
+    lock_0 = np.abs(pitch) <= GIMBAL_EPS
+    lock_pi = np.abs(pitch - np.pi) <= GIMBAL_EPS
+    roll = np.where(lock_0, 2 * half_sum, np.where(lock_pi, -2 * half_diff, roll))
+    yaw = np.where(lock_0 | lock_pi, 0.0, yaw)
+
+    out = np.stack([roll, pitch - np.pi / 2, yaw], axis=-1)
+    angles = out[..., 0::2]  # view of roll and yaw
+    angles[angles < -np.pi] += 2 * np.pi
+    angles[angles > np.pi] -= 2 * np.pi
+    return out
+
+
+def euler_to_quaternion(roll, pitch, yaw):
+    """Extrinsic "xyz" euler angles to a unit quaternion (i, j, k, real)."""
+    cr, sr = math.cos(roll / 2), math.sin(roll / 2)
+    cp, sp = math.cos(pitch / 2), math.sin(pitch / 2)
+    cy, sy = math.cos(yaw / 2), math.sin(yaw / 2)
+    return (sr * cp * cy - cr * sp * sy,
+            cr * sp * cy + sr * cp * sy,
+            cr * cp * sy - sr * sp * cy,
+            cr * cp * cy + sr * sp * sy)
+
+
+def quaternion_nlerp(q0, q1, w):
+    """Normalized linear interpolation between two quaternions, w = 0 ... 1."""
+    dot = sum(a * b for a, b in zip(q0, q1))
+    sign = -1.0 if dot < 0 else 1.0  # q and -q are the same rotation, take the short way
+    q = [(1 - w) * a + w * sign * b for a, b in zip(q0, q1)]
+    norm = math.sqrt(sum(c * c for c in q))
+    return tuple(c / norm for c in q)
+
+
+def quaternion_mean(quats):
+    """Mean rotation of close quaternions (sign-aligned, normalized sum)."""
+    ref = quats[-1]
+    q = [0.0, 0.0, 0.0, 0.0]
+    for quat in quats:
+        sign = -1.0 if sum(a * b for a, b in zip(quat, ref)) < 0 else 1.0
+        for n in range(4):
+            q[n] += sign * quat[n]
+    norm = math.sqrt(sum(c * c for c in q))
+    return tuple(c / norm for c in q)
+
+
+if __name__ == "__main__":
+    # Benchmark gegen scipy (Vergleich der Ergebnisse: tests/test_orientation.py)
+    import warnings
+    from scipy.spatial.transform import Rotation as R
+
+    rng = np.random.default_rng(0)
+    quat = rng.normal(size=(20000, 4))
+
+    n = 10000
+    i, j, k, r = quat[0]
+    t = time.perf_counter()
+    for _ in range(n):
+        quaternion_to_euler(i, j, k, r)
+    t_fast = (time.perf_counter() - t) / n
+    t = time.perf_counter()
+    for _ in range(n):
+        R.from_quat(np.array([r, i, j, k]), scalar_first=True).as_euler("xyz", degrees=False)
+    t_scipy = (time.perf_counter() - t) / n
+    print(f"skalar: {t_fast * 1e6:.2f} µs, scipy: {t_scipy * 1e6:.2f} µs ({t_scipy / t_fast:.0f}x)")
+
+    t = time.perf_counter()
+    quaternions_to_euler(quat)
+    t_batch = time.perf_counter() - t
+    t = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        R.from_quat(quat).as_euler("xyz")
+    t_scipy = time.perf_counter() - t
+    print(f"batched {len(quat)} Quaternionen: {t_batch * 1e3:.2f} ms, scipy: {t_scipy * 1e3:.2f} ms")
@@ -1,4 +1,5 @@
 import logging
+import math
 import time
 import numpy as np
 
@@ -11,11 +12,11 @@ class PID:
         self.last_time = 0.0
         self.dt = 0.0
         self.en = False
-        self.config = config
-
-        self.Kp = self.config["Kp"]
-        self.Ki = self.config["Ki"]
-        self.Kd = self.config["Kd"]
+        self.config = None
+        self.Kp = 0.0
+        self.Ki = 0.0
+        self.Kd = 0.0
+        self.set_config(config)
         self.min = mini
         self.max = maxi
 
@@ -46,9 +47,10 @@ class PID:
         except Exception as e:
             self.logger.critical(str(e))
 
-    def _loop(self):
+    def _loop(self, dt=None):
         self.now = time.perf_counter()
-        self.dt = self.now - self.last_time
+        # dt of the caller (e.g. simulated time) or measured
+        self.dt = self.now - self.last_time if dt is None else dt
         self.frequency = (1 / self.dt)
         self.last_time = self.now
 
@@ -68,30 +70,35 @@ class PID:
             else:
                 self.out = 0.0
 
-            self.data = {
-                "config": self.config,
-                "out": self.out,
-                "en": self.en,
-                "time": self.now,
-                "frequency": self.frequency
-            }
+            self.data["config"] = self.config
+            self.data["out"] = self.out
+            self.data["en"] = self.en
+            self.data["time"] = self.now
+            self.data["frequency"] = self.frequency
 
             self.logger.debug(self.data)
         except Exception as e:
             self.logger.error(str(e))
 
-    def loop(self, sp, x, data):
+    def set_config(self, config):
+        """Takes the gains as Python floats, the arithmetic in _loop() stays on floats."""
+        self.config = config
+        self.Kp = float(config["Kp"])
+        self.Ki = float(config["Ki"])
+        self.Kd = float(config["Kd"])
+
+    def loop(self, sp, x, data, dt=None):
         self.sp = sp
-        self.config = data["config"]
-        self.Kp = np.array(self.config["Kp"])
-        self.Ki = np.array(self.config["Ki"])
-        self.Kd = np.array(self.config["Kd"])
+        # new gains come as a new config dict (communicate()), so the identity check is enough
+        config = data["config"]
+        if config is not self.config:
+            self.set_config(config)
 
         self.en = data["en"]
 
         self.x = x
 
-        self._loop()
+        self._loop(dt)
 
         return self.data
 
@@ -103,4 +110,167 @@ class PID:
         self.prev_error = 0.0
 
 
+class PIDBank:
+    """
+    Several PID channels in one vectorized update.
+
+    channels: dict name -> config with Kp, Ki, Kd and optional
+        "min"/"max":  output limits (default ±inf)
+        "cutoff":     low-pass of the derivative in Hz (default None = unfiltered)
+        "Kb":         back-calculation gain (default Ki/Kp, tracking time = integral time)
+    The integral is kept in output units; while the output is clipped the
+    difference between clipped and unclipped output is fed back with Kb, so
+    the integral does not wind up. Disabled channels output 0 and hold their
+    state, like PID.
+    """
+    def __init__(self, name="PIDBank", logging_level=logging.INFO, channels={}):
+        self.names = list(channels)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        n = len(self.names)
+        self.Kp = np.zeros(n)
+        self.Ki = np.zeros(n)
+        self.Kd = np.zeros(n)
+        self.Kb = np.zeros(n)
+        self.min = np.full(n, -np.inf)
+        self.max = np.full(n, np.inf)
+        self.Tf = np.zeros(n)  # time constant of the derivative filter
+        for name, config in channels.items():
+            self.set_config(name, config)
+
+        self.integral = np.zeros(n)
+        self.derivative = np.zeros(n)
+        self.prev_error = np.zeros(n)
+        self.primed = np.zeros(n)  # 1.0 once a channel has a previous error
+        self.all_primed = False
+        self.out = np.zeros(n)
+        # Zwischenspeicher, loop() rechnet ohne neue Arrays
+        self.error = np.zeros(n)
+        self.unclipped = np.zeros(n)
+        self.clipped = np.zeros(n)
+        self.next_integral = np.zeros(n)
+        self.next_derivative = np.zeros(n)
+        self.tmp = np.zeros(n)
+        # Koeffizienten für das aktuelle dt, siehe _coefficients()
+        self.dt = None
+        self.keep = None
+        self.gain = None
+        self.Ki_dt = None
+        self.Kb_dt = None
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+    def set_config(self, name, config):
+        i = self.index[name]
+        self.Kp[i] = config["Kp"]
+        self.Ki[i] = config["Ki"]
+        self.Kd[i] = config["Kd"]
+        self.min[i] = config.get("min", -math.inf)
+        self.max[i] = config.get("max", math.inf)
+        cutoff = config.get("cutoff")
+        self.Tf[i] = 0.0 if cutoff is None else 1 / (2 * math.pi * cutoff)
+        if "Kb" in config:
+            self.Kb[i] = config["Kb"]
+        else:
+            self.Kb[i] = config["Ki"] / config["Kp"] if config["Kp"] else 0.0
+        self.dt = None
+
+    def reset(self, names=None):
+        index = slice(None) if names is None else [self.index[name] for name in names]
+        self.integral[index] = 0.0
+        self.derivative[index] = 0.0
+        self.prev_error[index] = 0.0
+        self.primed[index] = 0.0
+        self.all_primed = False
+        self.dt = None
+
+    def _coefficients(self, dt):
+        """
+        derivative = keep * derivative + gain * (e - e_prev), gain = 0 in the first step
+        integral   = integral + Ki_dt * e + Kb_dt * (out - unclipped)
+        """
+        self.dt = dt
+        alpha = dt / (self.Tf + dt)
+        self.keep = 1.0 - alpha
+        self.gain = alpha / dt * self.primed
+        self.Ki_dt = self.Ki * dt
+        self.Kb_dt = self.Kb * dt
+
+    def loop(self, sp, x, en=True, dt=0.02):
+        """
+        One step of all channels; sp, x (and en) scalars or in channel order.
+        Returns the output array (the buffers are swapped, it is valid until the next call).
+        """
+        if dt != self.dt:
+            self._coefficients(dt)
+        e = self.error
+        np.subtract(sp, x, out=e)
+        tmp = self.tmp
+
+        # gefilterte Ableitung des Fehlers
+        d = self.next_derivative
+        np.subtract(e, self.prev_error, out=d)
+        d *= self.gain
+        np.multiply(self.keep, self.derivative, out=tmp)
+        d += tmp
+
+        u = self.unclipped
+        np.multiply(self.Kp, e, out=u)
+        u += self.integral
+        np.multiply(self.Kd, d, out=tmp)
+        u += tmp
+        out = self.clipped
+        np.minimum(u, self.max, out=out)
+        np.maximum(out, self.min, out=out)
+
+        # back-calculation: clipped - unclipped bremst den Integrator
+        i = self.next_integral
+        np.subtract(out, u, out=i)
+        i *= self.Kb_dt
+        np.multiply(self.Ki_dt, e, out=tmp)
+        i += tmp
+        i += self.integral
+
+        if en is True:
+            self.integral, self.next_integral = i, self.integral
+            self.derivative, self.next_derivative = d, self.derivative
+            self.prev_error, self.error = e, self.prev_error
+            if not self.all_primed:
+                self.primed.fill(1.0)
+                self.all_primed = True
+                self.dt = None
+            self.out, self.clipped = out, self.out
+        else:
+            en = np.broadcast_to(np.asarray(en, dtype=bool), e.shape)
+            np.copyto(self.integral, i, where=en)
+            np.copyto(self.derivative, d, where=en)
+            np.copyto(self.prev_error, e, where=en)
+            if not self.all_primed:
+                np.copyto(self.primed, 1.0, where=en)
+                self.all_primed = bool(self.primed.all())
+                self.dt = None
+            np.copyto(self.out, out, where=en)
+            np.copyto(self.out, 0.0, where=~en)
+        return self.out
+
+    def output(self, name):
+        return self.out[self.index[name]]
+
+
+if __name__ == "__main__":
+    # Benchmark PID und PIDBank (Vergleich mit den bisherigen 0-d Arrays und Anti-Windup: tests/test_pid.py)
+    data = {"config": {"Kp": 15, "Ki": 1, "Kd": 0.1}, "en": True}
+    pid = PID(config=data["config"], mini=-50, maxi=50)
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        pid.loop(0.1, 0.05, data, dt=0.02)
+    print(f"PID: {(time.perf_counter() - start) / n * 1e6:.2f} µs")
 
+    config = {"Kp": 2.0, "Ki": 4.0, "Kd": 0.05, "cutoff": 5.0, "min": -1.0, "max": 1.0}
+    bank8 = PIDBank(channels={f"c{i}": config for i in range(8)})
+    sp = np.zeros(8)
+    start = time.perf_counter()
+    for _ in range(n):
+        bank8.loop(sp, 0.05, dt=0.02)
+    print(f"PIDBank mit 8 Kanälen: {(time.perf_counter() - start) / n * 1e6:.2f} µs")
@@ -0,0 +1,112 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# log-linear buckets: 16 linear sub-buckets per power of two (max. 6.25 % error)
+SUB_BITS = 4
+SUB = 1 << SUB_BITS
+N_BUCKETS = 48 * SUB  # covers 0 ns ... > 1e5 s
+
+
+def bucket_index(ns):
+    if ns < SUB:
+        return ns if ns > 0 else 0
+    e = ns.bit_length() - SUB_BITS - 1
+    return (e + 1) * SUB + (ns >> e) - SUB
+
+
+def bucket_upper(idx):
+    """Upper bound of a bucket in ns."""
+    if idx < SUB:
+        return idx + 1
+    e = idx // SUB - 1
+    return (idx % SUB + SUB + 1) << e
+
+
+class StageProfiler:
+    """
+    Fixed-size latency histograms for the stages of the control tick.
+
+    Usage in the hot path, one perf_counter_ns() call per stage boundary:
+        t = time.perf_counter_ns()
+        ...stage...
+        t = profiler.lap(STAGE, t)
+    With `name` the histograms live in shared memory, so another process (the
+    web server) can read them while the controller writes.
+    """
+    def __init__(self, stages, name=None, create=False):
+        self.stages = list(stages)
+        self.index = {stage: i for i, stage in enumerate(self.stages)}
+        n = len(self.stages)
+        size = 8 * n * (N_BUCKETS + 2)
+
+        self.shm = None
+        self.owner = create
+        if name is None and not create:
+            buf = bytearray(size)
+        else:
+            if create:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            else:
+                self.shm = shared_memory.SharedMemory(name=name)
+            buf = self.shm.buf
+        self.name = None if self.shm is None else self.shm.name
+
+        self.counts = np.ndarray((n, N_BUCKETS), dtype=np.int64, buffer=buf, offset=0)
+        self.max = np.ndarray((n,), dtype=np.int64, buffer=buf, offset=8 * n * N_BUCKETS)
+        self.total = np.ndarray((n,), dtype=np.int64, buffer=buf, offset=8 * n * (N_BUCKETS + 1))
+        if create:
+            self.reset()
+
+    def stage(self, name):
+        return self.index[name]
+
+    def record(self, stage, ns):
+        idx = bucket_index(ns)
+        if idx >= N_BUCKETS:
+            idx = N_BUCKETS - 1
+        self.counts[stage, idx] += 1
+        self.total[stage] += ns
+        if ns > self.max[stage]:
+            self.max[stage] = ns
+
+    def lap(self, stage, start):
+        """Records the time since `start` for the stage and returns the current time."""
+        now = time.perf_counter_ns()
+        self.record(stage, now - start)
+        return now
+
+    def reset(self):
+        self.counts[:] = 0
+        self.max[:] = 0
+        self.total[:] = 0
+
+    def percentile(self, stage, p):
+        counts = self.counts[stage]
+        n = int(counts.sum())
+        if n == 0:
+            return 0
+        idx = int(np.searchsorted(np.cumsum(counts), p / 100 * n))
+        return min(bucket_upper(idx), int(self.max[stage]))
+
+    def summary(self):
+        """Count, mean, p50, p99 and max of every stage in microseconds."""
+        out = {}
+        for i, stage in enumerate(self.stages):
+            n = int(self.counts[i].sum())
+            out[stage] = {
+                "count": n,
+                "mean": (int(self.total[i]) / n / 1000) if n else 0.0,
+                "p50": self.percentile(i, 50) / 1000,
+                "p99": self.percentile(i, 99) / 1000,
+                "max": int(self.max[i]) / 1000
+            }
+        return out
+
+    def close(self):
+        self.counts = self.max = self.total = None
+        if self.shm is not None:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
@@ -206,30 +206,29 @@ class PS4Controller():
 
     def get(self):
         with self.lock:
-            self.data = {
-                "time": self.now,
-                "frequency": self.frequency,
-                "connected": self.connected,
-                "x": self.x,
-                "v": self.v,
-                "d": self.d,
-                "o": self.o,
-                "l1": self.l1,
-                "r1": self.r1,
-                "share": self.share,
-                "option": self.option,
-                "l3": self.l3,
-                "r3": self.r3,
-                "ps": self.ps,
-                "dpad_x": self.dpad_x,
-                "dpad_y": self.dpad_y,
-                "left_x": self.left_x,
-                "left_y": self.left_y,
-                "right_x": self.right_x,
-                "right_y": self.right_y,
-                "l2": self.l2,
-                "r2": self.r2
-            }
+            data = self.data
+            data["time"] = self.now
+            data["frequency"] = self.frequency
+            data["connected"] = self.connected
+            data["x"] = self.x
+            data["v"] = self.v
+            data["d"] = self.d
+            data["o"] = self.o
+            data["l1"] = self.l1
+            data["r1"] = self.r1
+            data["share"] = self.share
+            data["option"] = self.option
+            data["l3"] = self.l3
+            data["r3"] = self.r3
+            data["ps"] = self.ps
+            data["dpad_x"] = self.dpad_x
+            data["dpad_y"] = self.dpad_y
+            data["left_x"] = self.left_x
+            data["left_y"] = self.left_y
+            data["right_x"] = self.right_x
+            data["right_y"] = self.right_y
+            data["l2"] = self.l2
+            data["r2"] = self.r2
         return self.data
 
     def restart(self):
@@ -0,0 +1,213 @@
+import logging
+import math
+import time
+import traceback
+
+# Overrun policies
+SKIP = "skip"          # drop the missed deadlines and continue on the original grid
+CATCH_UP = "catch_up"  # run the missed ticks back-to-back until the grid is reached again
+RESYNC = "resync"      # restart the grid one period after the late tick
+
+
+class LoopScheduler:
+    """
+    Fixed-rate loop timing with absolute deadlines.
+
+    Deadlines are computed as start + n * period, so the period does not drift
+    when single ticks are late. wait() sleeps until shortly before the deadline
+    and spins for the last `spin` seconds to hit it precisely.
+    """
+    def __init__(self, name="Scheduler", logging_level=logging.INFO, freq=50.0, policy=SKIP, spin=0.0005,
+                 history=1000, clock=time.perf_counter, sleep=time.sleep):
+        if policy not in (SKIP, CATCH_UP, RESYNC):
+            raise ValueError(f"Unbekannte Overrun-Policy: {policy}")
+        self.freq = freq
+        self.period = 1 / freq
+        self.policy = policy
+        self.spin = spin
+        self.clock = clock
+        self.sleep = sleep
+
+        self.deadline = None
+        self.now = 0.0
+        self.last_time = 0.0
+        self.dt = self.period
+
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+
+        # ring buffer of the lateness of the last ticks in seconds
+        self.history = history
+        self.lateness = [0.0] * history
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+    def start(self):
+        self.now = self.clock()
+        self.last_time = self.now
+        self.deadline = self.now + self.period
+
+    def wait(self):
+        """Blocks until the next deadline and returns the time of the tick."""
+        if self.deadline is None:
+            self.start()
+        deadline = self.deadline
+
+        remaining = deadline - self.clock()
+        if remaining > self.spin:
+            self.sleep(remaining - self.spin)
+        while self.clock() < deadline:
+            pass
+
+        now = self.clock()
+        late = now - deadline
+        self.lateness[self.ticks % self.history] = late
+        self.last_lateness = late
+        if late > self.max_lateness:
+            self.max_lateness = late
+        self.ticks += 1
+
+        self.deadline = deadline + self.period
+        if now >= self.deadline:
+            self.overruns += 1
+            if self.policy == SKIP:
+                missed = int(late / self.period)
+                self.skipped += missed
+                self.deadline = deadline + (missed + 1) * self.period
+            elif self.policy == RESYNC:
+                self.deadline = now + self.period
+            self.logger.debug(f"Overrun: {late * 1000:.3f} ms zu spät")
+
+        self.dt = now - self.last_time
+        self.last_time = now
+        self.now = now
+        return now
+
+    def stats(self):
+        n = min(self.ticks, self.history)
+        values = sorted(self.lateness[:n]) if n else [0.0]
+        return {
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "lateness_mean": sum(values) / len(values),
+            "lateness_p99": values[min(len(values) - 1, int(0.99 * len(values)))],
+            "lateness_max": self.max_lateness
+        }
+
+
+class Task:
+    __slots__ = ("name", "func", "freq", "divider", "phase", "last_time", "calls",
+                 "frame_time", "budget", "budget_max", "time_max")
+
+    def __init__(self, name, func, freq, divider, phase):
+        self.name = name
+        self.func = func
+        self.freq = freq
+        self.divider = divider
+        self.phase = phase
+        self.last_time = None
+        self.calls = 0
+        self.frame_time = 0.0  # execution time in the running major frame
+        self.budget = 0.0  # share of the last major frame
+        self.budget_max = 0.0
+        self.time_max = 0.0
+
+
+class RateGroupScheduler:
+    """
+    Runs tasks at independent rates on top of a LoopScheduler.
+
+    The base rate defines the minor frame; every task runs each `divider`-th
+    minor frame, shifted by `phase` minor frames. The major frame is the least
+    common multiple of all dividers. At the end of every major frame the share
+    of the frame each task used is stored in Task.budget.
+    Task functions are called as func(now, dt) with dt since their last run.
+    `clock` gives the deadlines and `now`, `timer` measures the execution time
+    of the tasks; both differ when clock is simulated (VirtualClock), which
+    does not advance while a task runs.
+    """
+    def __init__(self, name="RateGroups", logging_level=logging.INFO, base_freq=100.0, policy=SKIP, spin=0.0005,
+                 clock=time.perf_counter, sleep=time.sleep, timer=time.perf_counter):
+        self.base_freq = base_freq
+        self.loop = LoopScheduler(name=name, logging_level=logging_level, freq=base_freq, policy=policy, spin=spin,
+                                  clock=clock, sleep=sleep)
+        self.clock = clock
+        self.timer = timer
+        self.tasks = []
+        self.minor = 0
+        self.major_frame = 1
+        self.frame_end = 1
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+    def add(self, name, func, freq, phase=0):
+        divider = round(self.base_freq / freq)
+        if divider < 1 or abs(self.base_freq / divider - freq) > 1e-6 * freq:
+            raise ValueError(f"{name}: {freq} Hz ist kein ganzzahliger Teiler von {self.base_freq} Hz")
+        if not 0 <= phase < divider:
+            raise ValueError(f"{name}: Phase {phase} muss zwischen 0 und {divider - 1} liegen")
+        task = Task(name, func, freq, divider, phase)
+        self.tasks.append(task)
+        self.major_frame = self.major_frame * divider // math.gcd(self.major_frame, divider)
+        self.frame_end = self.minor + self.major_frame
+        return task
+
+    def start(self):
+        self.loop.start()
+
+    def run_once(self):
+        """Waits for the next minor frame and runs all tasks due in it."""
+        skipped = self.loop.skipped
+        now = self.loop.wait()
+        # minor frames dropped by the SKIP policy still count, so phases stay aligned with time
+        self.minor += self.loop.skipped - skipped
+
+        for task in self.tasks:
+            if (self.minor - task.phase) % task.divider:
+                continue
+            dt = task.divider / self.base_freq if task.last_time is None else now - task.last_time
+            task.last_time = now
+            start = self.timer()
+            try:
+                task.func(now, dt)
+            except Exception as e:
+                self.logger.error(f"{task.name}: {e}")
+                traceback.print_exc()
+            spent = self.timer() - start
+            task.calls += 1
+            task.frame_time += spent
+            if spent > task.time_max:
+                task.time_max = spent
+
+        self.minor += 1
+        if self.minor >= self.frame_end:
+            frame = self.major_frame / self.base_freq
+            for task in self.tasks:
+                task.budget = task.frame_time / frame
+                if task.budget > task.budget_max:
+                    task.budget_max = task.budget
+                task.frame_time = 0.0
+            self.frame_end = self.minor + self.major_frame
+        return now
+
+    def stats(self):
+        out = {"major_frame": self.major_frame / self.base_freq}
+        for task in self.tasks:
+            out[task.name] = {
+                "freq": task.freq,
+                "calls": task.calls,
+                "budget": task.budget,
+                "budget_max": task.budget_max,
+                "time_max": task.time_max
+            }
+        return out
+
+    def report(self):
+        parts = [f"{task.name}:{task.budget * 100:.1f}%" for task in self.tasks]
+        return "\t".join(parts) + f"\tsumme:{sum(task.budget for task in self.tasks) * 100:.1f}%"
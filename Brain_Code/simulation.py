@@ -0,0 +1,206 @@
+import logging
+import time
+
+import numpy as np
+
+from model_cache import get_cache
+
+# relative standard deviation of each perturbed parameter (normal, clipped to ±3 sigma)
+DEFAULT_SPREAD = {
+    "m": 0.1,
+    "J": 0.2,
+    "R": 0.1,
+    "K_m": 0.1,
+    "tau_m": 0.15,
+    "noise": 0.5,  # scale of the sensor noise
+    "jitter": 0.1  # max. std of the sample period relative to 1/freq (uniform per instance)
+}
+# std of the measurements [pitch, x, pitch velocity, v] without perturbation
+DEFAULT_NOISE = (0.005, 0.001, 0.05, 0.02)
+
+
+class BatchSimulator:
+    """
+    Steps N robots at once, the instance is the leading axis of every array.
+
+    Each instance gets its own mass, inertia, cog distance, motor gain and time
+    constant, sensor noise level and sample jitter. The plant is integrated
+    with RK4 in continuous time (linear model of continuous_model() or the
+    nonlinear pendulum), the controller runs once per sample period on the
+    nominal model like on the robot: steady-state Kalman filter (optional)
+    and LQR with saturation at ±min_max, the clipped command is held for
+    the period.
+    """
+    def __init__(self, name="BatchSimulator", logging_level=logging.INFO, physics={}, n=10000, freq=50.0,
+                 spread=None, noise=DEFAULT_NOISE, nonlinear=False, substeps=4, min_max=100.0, seed=0, cache=None):
+        self.physics = dict(physics)
+        self.n = n
+        self.freq = freq
+        self.spread = dict(DEFAULT_SPREAD if spread is None else spread)
+        self.noise = np.asarray(noise, dtype=np.float64)
+        self.nonlinear = nonlinear
+        self.substeps = substeps
+        self.min_max = min_max
+        self.seed = seed
+        self.cache = cache if cache is not None else get_cache()
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+        self.rng = np.random.default_rng(seed)
+        self.params = self.perturb()
+
+    def perturb(self):
+        """Parameters of all instances, dict of arrays (N,)."""
+        params = {}
+        for key in ("r", "R", "g", "m", "J", "tau_m", "K_m"):
+            sigma = self.spread.get(key, 0.0)
+            factor = 1.0 + sigma * np.clip(self.rng.standard_normal(self.n), -3.0, 3.0)
+            params[key] = self.physics[key] * np.maximum(factor, 0.05)
+        sigma = self.spread.get("noise", 0.0)
+        params["noise"] = np.maximum(1.0 + sigma * np.clip(self.rng.standard_normal(self.n), -3.0, 3.0), 0.0)
+        params["jitter"] = self.rng.uniform(0.0, self.spread.get("jitter", 0.0), self.n)
+        return params
+
+    def _derivative(self, x, u, a, c, K_m, tau_m):
+        """dx/dt for all instances, x (N, 4) = [pitch, x, pitch velocity, v], u (N,)."""
+        dv = (K_m * u - x[:, 3]) / tau_m
+        if self.nonlinear:
+            dpv = a * np.sin(x[:, 0]) - c * dv * np.cos(x[:, 0])
+        else:
+            # gleiche Gleichung wie A, B in continuous_model()
+            dpv = a * x[:, 0] - c * dv
+        return np.column_stack((x[:, 2], x[:, 3], dpv, dv))
+
+    def gains(self, lqr_config, kalman_config=None):
+        """LQR gain and (optional) fused Kalman matrices of the nominal model."""
+        K = self.cache.lqr(self.physics, lqr_config["Q"], lqr_config["R"], self.freq)[0]
+        if kalman_config is None:
+            return K, None
+        Ad, Bd = self.cache.discrete(self.physics, self.freq)
+        L, P = self.cache.kalman(self.physics, kalman_config["Q"], kalman_config["R"], self.freq)
+        I_LC = np.eye(4) - L
+        return K, (I_LC @ Ad, I_LC @ Bd[:, 0], L)
+
+    def run(self, K, observer=None, duration=5.0, x0=(0.2, 0.0, 0.0, 0.0), tol=0.02, fall=np.radians(30.0)):
+        """
+        Closed-loop run of all instances against one gain set.
+
+        K: LQR gain (4,), observer: (F, G, L) from gains() or None for state feedback
+        on the noisy measurements. Returns a dict of arrays (N,): fell, fall_time,
+        settling (last time |pitch| > tol), max_pitch, rms_pitch, saturation
+        (fraction of the time), effort (sum u^2 dt).
+        """
+        p = self.params
+        n = self.n
+        dt = 1.0 / self.freq
+        steps = int(round(duration * self.freq))
+        a = p["m"] * p["g"] * p["R"] / p["J"]
+        c = p["m"] * p["r"] * p["R"] / p["J"]
+        K_m = p["K_m"]
+        tau_m = p["tau_m"]
+        K = np.asarray(K, dtype=np.float64).reshape(-1)
+        noise_std = p["noise"][:, None] * self.noise
+
+        x = np.tile(np.asarray(x0, dtype=np.float64), (n, 1))
+        x_hat = np.zeros((n, 4))
+        u = np.zeros(n)
+        alive = np.ones(n, dtype=bool)
+        fall_time = np.full(n, np.inf)
+        settling = np.zeros(n)
+        max_pitch = np.abs(x[:, 0])
+        pitch_sq = np.zeros(n)
+        saturated = np.zeros(n)
+        effort = np.zeros(n)
+
+        for k in range(steps):
+            y = x + self.rng.standard_normal((n, 4)) * noise_std
+            if observer is None:
+                x_hat = y
+            else:
+                F, G, L = observer
+                # u ist der Stellwert des vorherigen Ticks, wie in main_loop
+                x_hat = x_hat @ F.T + np.outer(u, G) + y @ L.T
+            u_raw = -(x_hat @ K)
+            u = np.clip(u_raw, -self.min_max, self.min_max)
+            u[~alive] = 0.0
+            saturated += (u != u_raw) & alive
+            effort += u * u * dt
+
+            # echte Periode mit Jitter, Stellwert wird gehalten (ZOH)
+            h = dt * np.maximum(1.0 + p["jitter"] * self.rng.standard_normal(n), 0.2) / self.substeps
+            h = h[:, None]
+            for _ in range(self.substeps):
+                k1 = self._derivative(x, u, a, c, K_m, tau_m)
+                k2 = self._derivative(x + 0.5 * h * k1, u, a, c, K_m, tau_m)
+                k3 = self._derivative(x + 0.5 * h * k2, u, a, c, K_m, tau_m)
+                k4 = self._derivative(x + h * k3, u, a, c, K_m, tau_m)
+                x = x + h / 6.0 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+
+            pitch = np.abs(x[:, 0])
+            # umgefallene Roboter bleiben liegen und werden nicht weiter bewertet
+            fallen = alive & (pitch > fall)
+            fall_time[fallen] = (k + 1) * dt
+            alive &= ~fallen
+            x[~alive] = 0.0
+            np.maximum(max_pitch, np.where(alive | fallen, pitch, 0.0), out=max_pitch)
+            pitch_sq += np.where(alive, pitch * pitch, 0.0)
+            settling[alive & (pitch > tol)] = (k + 1) * dt
+
+        settling[~alive] = np.inf
+        settling[alive & (settling >= steps * dt)] = np.inf
+        return {
+            "fell": ~alive,
+            "fall_time": fall_time,
+            "settling": settling,
+            "max_pitch": max_pitch,
+            "rms_pitch": np.sqrt(pitch_sq / steps),
+            "saturation": saturated / steps,
+            "effort": effort
+        }
+
+    def evaluate(self, lqr_config, kalman_config=None, **kwargs):
+        """run() with gains computed from the weights (nominal model)."""
+        K, observer = self.gains(lqr_config, kalman_config)
+        start = time.perf_counter()
+        result = self.run(K, observer, **kwargs)
+        self.logger.debug(f"{self.n} Instanzen in {time.perf_counter() - start:.2f} s simuliert.")
+        return result
+
+
+def summary(result):
+    """Robustness figures of a run() result."""
+    ok = ~result["fell"]
+    settled = np.isfinite(result["settling"])
+    settling = result["settling"][settled]
+    return {
+        "n": int(ok.size),
+        "stable": float(ok.mean()),
+        "settled": float(settled.mean()),
+        "settling_p50": float(np.percentile(settling, 50)) if settling.size else float("inf"),
+        "settling_p95": float(np.percentile(settling, 95)) if settling.size else float("inf"),
+        "max_pitch_p95": float(np.percentile(result["max_pitch"][ok], 95)) if ok.any() else float("inf"),
+        "saturation_mean": float(result["saturation"].mean()),
+        "effort_p50": float(np.median(result["effort"][ok])) if ok.any() else float("inf")
+    }
+
+
+if __name__ == "__main__":
+    # 10k gestörte Roboter gegen die Gains aus state.py
+    from state import State
+
+    state = State()
+    for nonlinear in (False, True):
+        sim = BatchSimulator(physics=state.physics, n=10000, nonlinear=nonlinear)
+        start = time.perf_counter()
+        result = sim.evaluate(state.lqr.config, state.kalman.config)
+        elapsed = time.perf_counter() - start
+        print(f"nonlinear={nonlinear}: {sim.n} Instanzen in {elapsed:.2f} s")
+        for key, value in summary(result).items():
+            print(f"    {key}: {value:.4g}")
+        fell = result["fell"]
+        if fell.any():
+            for key in ("m", "J", "R", "K_m", "tau_m"):
+                ratio = sim.params[key] / state.physics[key]
+                print(f"    {key}: umgefallen bei Faktor {ratio[fell].min():.2f} ... {ratio[fell].max():.2f}, "
+                      f"alle {ratio.min():.2f} ... {ratio.max():.2f}")
@@ -0,0 +1,265 @@
+import copy
+import json
+import math
+
+
+class Record:
+    """
+    Fixed set of named fields stored in __slots__.
+
+    Records are allocated once and then updated in place every tick. Item access
+    (record["pitch"]) is supported, so code written for the old nested dicts
+    keeps working; as_dict() builds a plain dict view for telemetry.
+    """
+    __slots__ = ()
+    fields = {}
+
+    def __init__(self, **values):
+        for key, default in self.fields.items():
+            if key in values:
+                value = values[key]
+            elif isinstance(default, type) and issubclass(default, Record):
+                value = default()
+            else:
+                value = copy.deepcopy(default)
+            setattr(self, key, value)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.fields
+
+    def keys(self):
+        return self.fields.keys()
+
+    def update(self, values, keys=None):
+        """Copies the values of a dict (or record) into the existing fields, only `keys` if given."""
+        for key in (values.keys() if keys is None else keys):
+            current = getattr(self, key)
+            if isinstance(current, Record):
+                current.update(values[key])
+            else:
+                setattr(self, key, values[key])
+
+    def copy_from(self, other):
+        """Copies the fields of this record from another record (same type or a superset) without allocating."""
+        for key in self.__slots__:
+            value = getattr(other, key)
+            if isinstance(value, Record):
+                getattr(self, key).copy_from(value)
+            else:
+                setattr(self, key, value)
+
+    def reset(self):
+        """Restores the default values of all scalar fields."""
+        for key, default in self.fields.items():
+            value = getattr(self, key)
+            if isinstance(value, Record):
+                value.reset()
+            elif not isinstance(default, (dict, list)):
+                setattr(self, key, default)
+
+    def as_dict(self):
+        out = {}
+        for key in self.__slots__:
+            value = getattr(self, key)
+            out[key] = value.as_dict() if isinstance(value, Record) else value
+        return out
+
+
+def record(name, fields):
+    """Creates a Record subclass with the given fields and their default values."""
+    return type(name, (Record,), {"__slots__": tuple(fields), "fields": fields})
+
+
+MainState = record("MainState", {
+    "mode": 0,  # 0=off, 1=armed, 2=tolerance, 3=activation_delay 4=on
+    "upright": False,
+    "upright_tol": math.radians(3.0),
+    "activation_delay": 5.0,
+    "en": False,
+    "tol": math.radians(30.0),
+    "in_tol": False,
+    "yaw": 0.0,
+    "time": 0.0,
+    "frequency": 0.0,
+    "lateness": 0.0,
+    "stale": False,
+    "gains_version": 0
+})
+
+MotorState = record("MotorState", {
+    "sp": 0.0,
+    "en": False,
+    "position": 0.0,
+    "velocity": 0.0,
+    "velocity_LP": 0.0,
+    "velocity_mean": 0.0,
+    "velocity_slope": 0.0,
+    "frames": 0,
+    "time": 0.0,
+    "frequency": 0.0,
+    "age": 0.0
+})
+
+# fields of MotorState reported by MOTOR.get(); sp and en are the command of the loop and are not overwritten
+MOTOR_FEEDBACK = ("position", "velocity", "velocity_mean", "velocity_slope", "frames", "time", "frequency")
+
+ImuState = record("ImuState", {
+    "roll": 0.0,
+    "pitch": 0.0,
+    "pitch_LP": 0.0,
+    "yaw": 0.0,
+    "gyro_x": 0.0,
+    "gyro_x_LP": 0.0,
+    "gyro_y": 0.0,
+    "gyro_z": 0.0,
+    "time": 0.0,
+    "frequency": 0.0,
+    "age": 0.0
+})
+
+SetpointState = record("SetpointState", {
+    "p": 0.0,
+    "x": 0.0,
+    "pv": 0.0,
+    "v": 0.0,
+    "yaw": 0.0
+})
+
+EstimateState = record("EstimateState", {
+    "p": 0.0,
+    "x": 0.0,
+    "pv": 0.0,
+    "v": 0.0
+})
+
+LqrState = record("LqrState", {
+    "config": {
+        "Q": [100, 15, 50, 25],
+        "R": 1.0
+    },
+    "out": 0.0,
+    "en": False,
+    "time": 0.0,
+    "frequency": 0.0
+})
+
+KalmanState = record("KalmanState", {
+    "config": {
+        "Q": [50, 50, 25, 25],
+        "R": [0.05, 0.05, 0.5, 0.5]
+    },
+    "out": EstimateState,
+    "time": 0.0,
+    "frequency": 0.0
+})
+
+PidState = record("PidState", {
+    "config": {
+        "Kp": 15,
+        "Ki": 1,
+        "Kd": 0.0
+    },
+    "out": 0.0,
+    "en": False,
+    "time": 0.0,
+    "frequency": 0.0
+})
+
+Ps4State = record("Ps4State", {
+    "time": 0,
+    "frequency": 0,
+    "connected": False,
+    "x": False,
+    "v": False,
+    "d": False,
+    "o": False,
+    "l1": False,
+    "r1": False,
+    "share": False,
+    "option": False,
+    "l3": False,
+    "r3": False,
+    "ps": False,
+    "dpad_x": 0,
+    "dpad_y": 0,
+    "left_x": 0,
+    "left_y": 0,
+    "right_x": 0,
+    "right_y": 0,
+    "l2": 0,
+    "r2": 0
+})
+
+State = record("State", {
+    "main": MainState,
+    "physics": {
+        "r": 57.75 / 1000,  # wheel radius in m
+        "r_y": 272.59000 / 1000,  # wheel distance (center to center)
+        "R": 138.441 / 1000,  # wheel to cog in m
+        "g": 9.81,  # gravitation im m/s^2
+        "m": 885.54481 / 1000,  # mass of robot in kg
+        "J": 25612452.77099 / 1000000000,  # 0.00545106520548, # Inertia of chassis kg*m^2
+        "tau_m": (0.103 + 0.108) / 2,  # time constant of motors
+        "K_m": (0.231 + 0.235) / 2,  # motor Gain
+        "v_max": 1.0,  # m/s
+        "y_max": math.pi / 4  # rad/s
+    },
+    "motor_left": MotorState,
+    "motor_right": MotorState,
+    "imu": ImuState,
+    "sp": SetpointState,
+    "sp_LP": SetpointState,
+    "lqr": LqrState,
+    "kalman": KalmanState,
+    "yaw_pid": PidState,
+    "ps4": Ps4State
+})
+
+
+# fields of the previous tick the loop compares against (button and dpad edges, mode changes)
+LastMainState = record("LastMainState", {"mode": 0})
+LastPs4State = record("LastPs4State", {"x": False, "dpad_x": 0, "dpad_y": 0})
+LastState = record("LastState", {"main": LastMainState, "ps4": LastPs4State})
+
+
+class StateBuffer:
+    """
+    Loop state and the values of the previous tick.
+
+    cur is the state tree, allocated once and written in place every tick.
+    last only holds the few fields the loop compares against the previous
+    tick (LastState); advance() copies them at the end of a tick, the tree
+    itself is never copied.
+    """
+    def __init__(self, state=None):
+        self.cur = state if state is not None else State()
+        self.last = LastState()
+        self.last.copy_from(self.cur)
+
+    def advance(self):
+        self.last.copy_from(self.cur)
+        return self.cur
+
+
+def json_value(value):
+    """json.dumps default: NumPy scalars and arrays (e.g. the np.clip values of PS4Controller) as Python values."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def reply_message(state, tuning):
+    """Answer of communicate(): the state as JSON, an error message if it cannot be serialized."""
+    try:
+        reply = state.as_dict()
+        reply["main"]["tuning"] = tuning
+        return json.dumps(reply, default=json_value)
+    except Exception as e:
+        print(f"Antwort nicht serialisierbar: {e}")
+        return json.dumps({"error": str(e)})
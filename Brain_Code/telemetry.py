@@ -0,0 +1,64 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class TelemetryRing:
+    """
+    Ring buffer of float records in shared memory, written by one process.
+
+    Layout: [count int64][seq int64 * slots][values float64 * slots * width].
+    Every slot carries a sequence number that is negative while the writer is
+    filling it (seqlock), so readers never lock the writer and simply retry if
+    a slot was overwritten while they copied it.
+    """
+    def __init__(self, name=None, create=False, width=8, slots=64):
+        size = 8 + 8 * slots + 8 * slots * width
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.width = width
+        self.slots = slots
+        self.owner = create
+
+        buf = self.shm.buf
+        self.count = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self.seq = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=8)
+        self.values = np.ndarray((slots, width), dtype=np.float64, buffer=buf, offset=8 + 8 * slots)
+        if create:
+            self.count[0] = 0
+            self.seq[:] = 0
+            self.values[:] = 0.0
+
+        self._out = np.zeros(width)
+
+    def write(self, values):
+        n = int(self.count[0]) + 1
+        idx = (n - 1) % self.slots
+        self.seq[idx] = -n
+        self.values[idx, :len(values)] = values
+        self.seq[idx] = n
+        self.count[0] = n
+
+    def read(self, retries=10):
+        """Returns a copy of the newest record as list or None if nothing was written yet."""
+        for _ in range(retries):
+            n = int(self.count[0])
+            if n == 0:
+                return None
+            idx = (n - 1) % self.slots
+            if self.seq[idx] != n:
+                continue
+            np.copyto(self._out, self.values[idx])
+            if self.seq[idx] == n:
+                return self._out.tolist()
+        return None
+
+    def close(self):
+        # views have to be released before the shared memory can be closed
+        self.count = self.seq = self.values = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# the modules of Brain_Code are imported flat like in main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def cache():
+    """Model and gain cache in memory only, tests do not touch ~/.cache."""
+    pytest.importorskip("control")
+    from model_cache import ModelCache
+    return ModelCache(name="ModelCache_Test", path=None)
+
+
+@pytest.fixture
+def state():
+    from state import State
+    return State()
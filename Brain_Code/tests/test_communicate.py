@@ -0,0 +1,27 @@
+import json
+
+import numpy as np
+
+from state import State, reply_message
+
+
+def test_reply_with_numpy_scalars():
+    """PS4Controller stores the sticks as np.clip results (numpy.int64), the reply must still be JSON."""
+    state = State()
+    state.ps4.update({"left_x": np.int64(200), "l2": np.int64(17), "r2": np.float64(3.5), "connected": np.bool_(True)})
+    state.kalman.out.p = np.float64(0.01)
+    reply = json.loads(reply_message(state, True))
+    assert reply["ps4"]["left_x"] == 200
+    assert reply["ps4"]["l2"] == 17
+    assert reply["ps4"]["r2"] == 3.5
+    assert reply["ps4"]["connected"] is True
+    assert reply["kalman"]["out"]["p"] == 0.01
+    assert reply["main"]["tuning"] is True
+
+
+def test_reply_not_serializable():
+    """Anything else still gives an answer, so the REP socket is never left without a send."""
+    state = State()
+    state.ps4.left_x = object()
+    reply = json.loads(reply_message(state, False))
+    assert "error" in reply
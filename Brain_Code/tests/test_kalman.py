@@ -0,0 +1,15 @@
+import numpy as np
+
+from kalman import KalmanFilter
+
+
+def test_matches_predict_correct(state, cache):
+    """The fused step gives the same estimate as the separate predict / correct step."""
+    kf = KalmanFilter(config=state.kalman.config, physics=state.physics, freq=50.0, cache=cache)
+    rng = np.random.default_rng(0)
+    x_ref = np.zeros((4, 1))
+    for y1, y2, y3, y4, u in rng.normal(size=(2000, 5)).tolist():
+        x_ref = kf.Ad @ x_ref + kf.Bd * u
+        x_ref = x_ref + kf.L @ (np.array([[y1], [y2], [y3], [y4]]) - kf.C @ x_ref)
+        out = kf.loop(y1, y2, y3, y4, u, None)["out"]
+        assert np.allclose([out["p"], out["x"], out["pv"], out["v"]], x_ref.ravel(), rtol=0, atol=1e-12)
@@ -0,0 +1,63 @@
+import math
+
+import numpy as np
+import pytest
+
+from LowPass import LowPassFilter, FilterBank, BUTTER2
+
+CHANNELS = [("pitch", 25.0), ("gyro_x", 25.0), ("vel_left", 5.0), ("vel_right", 5.0),
+            ("sp_p", 0.5), ("sp_x", 0.5), ("sp_pv", 0.5), ("sp_v", 0.5), ("sp_yaw", 0.5)]
+
+
+def run_singles(singles, row, dt):
+    return [f.filter(value, dt) for f, value in zip(singles, row)]
+
+
+def test_matches_lowpassfilter():
+    dt = 0.02
+    bank = FilterBank(CHANNELS, dt=dt)
+    singles = [LowPassFilter(cutoff) for _, cutoff in CHANNELS]
+    for row in np.random.default_rng(0).normal(size=(2000, len(CHANNELS))).tolist():
+        np.testing.assert_allclose(bank.filter(row, dt), run_singles(singles, row, dt), rtol=0, atol=1e-12)
+
+
+def test_other_dt():
+    """A dt outside the tolerance (overrun) uses coefficients for that dt, like LowPassFilter."""
+    bank = FilterBank(CHANNELS, dt=0.02)
+    singles = [LowPassFilter(cutoff) for _, cutoff in CHANNELS]
+    rng = np.random.default_rng(1)
+    for dt in (0.02, 0.02, 0.05, 0.05, 0.02, 0.031, 0.02, 0.02):
+        row = rng.normal(size=len(CHANNELS)).tolist()
+        np.testing.assert_allclose(bank.filter(row, dt), run_singles(singles, row, dt), rtol=0, atol=1e-12)
+
+
+def test_first_input_and_reset():
+    bank = FilterBank([("a", 1.0), ("b", 1.0, BUTTER2)], dt=0.02)
+    np.testing.assert_allclose(bank.filter([3.0, -2.0]), [3.0, -2.0], atol=1e-12)
+    bank.filter([0.0, 0.0])
+    bank.reset(["b"])
+    out = bank.filter([1.0, 5.0])
+    assert out[0] < 3.0
+    assert out[1] == pytest.approx(5.0, abs=1e-12)
+    assert bank.output("b") == out[1]
+
+
+@pytest.mark.parametrize("freq", [1.0, 5.0, 20.0])
+def test_butterworth_response(freq):
+    """Amplitude of a 5 Hz second order Butterworth at 100 Hz sampling rate (bilinear transformation)."""
+    dt = 0.01
+    cutoff = 5.0
+    bank = FilterBank([("b", cutoff, BUTTER2)], dt=dt)
+    t = np.arange(2000) * dt
+    out = np.array([bank.filter([math.sin(2 * math.pi * freq * ti)])[0] for ti in t])
+    # Amplitude im eingeschwungenen Zustand aus der Projektion auf sin / cos
+    t, out = t[1000:], out[1000:]
+    basis = np.stack([np.sin(2 * math.pi * freq * t), np.cos(2 * math.pi * freq * t)], axis=1)
+    amplitude = np.hypot(*np.linalg.lstsq(basis, out, rcond=None)[0])
+    ratio = math.tan(math.pi * freq * dt) / math.tan(math.pi * cutoff * dt)
+    assert amplitude == pytest.approx(1 / math.sqrt(1 + ratio ** 4), rel=1e-3)
+
+
+def test_unknown_type():
+    with pytest.raises(ValueError):
+        FilterBank([("a", 1.0, "butter4")])
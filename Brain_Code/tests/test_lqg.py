@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from kalman import KalmanFilter
+from lqg import LQG
+from lqr import LQR
+
+KEYS = ("p", "x", "pv", "v")
+
+
+def test_matches_kalman_and_lqr(state, cache):
+    """One fused step equals KalmanFilter.loop() followed by LQR.loop(), with saturation and enable toggling."""
+    kalman = KalmanFilter(config=state.kalman.config, physics=state.physics, cache=cache)
+    lqr = LQR(config=state.lqr.config, physics=state.physics, cache=cache)
+    lqg = LQG(lqr_config=state.lqr.config, kalman_config=state.kalman.config, physics=state.physics, cache=cache)
+
+    rng = np.random.default_rng(0)
+    u_last = 0.0
+    saturated = 0
+    for n in range(2000):
+        y = rng.normal(scale=0.05, size=4).tolist()
+        sp = dict(zip(KEYS, rng.normal(scale=0.01, size=4).tolist()))
+        en = n % 500 < 400
+        estimate = kalman.loop(*y, u=u_last, data=None)["out"]
+        u_last = lqr.loop(sp, estimate["p"], estimate["x"], estimate["pv"], estimate["v"], {"en": en})["out"]
+        out = lqg.loop(sp, *y, en=en)
+        saturated += abs(u_last) == lqr.max
+        assert out["out"] == pytest.approx(u_last, abs=1e-10)
+        for key in KEYS:
+            assert out["estimate"][key] == pytest.approx(estimate[key], abs=1e-10)
+    # the comparison has to cover the clipped command
+    assert saturated > 0
+
+
+def test_set_gains(state, cache):
+    """Gains swapped in by set_gains() give the same result as a new LQG with these weights."""
+    lqr_config = {"Q": [200, 10, 40, 20], "R": 2.0}
+    kalman_config = {"Q": [20, 20, 10, 10], "R": [0.1, 0.1, 1.0, 1.0]}
+    swapped = LQG(lqr_config=state.lqr.config, kalman_config=state.kalman.config, physics=state.physics, cache=cache)
+    Ad, Bd = cache.discrete(state.physics, 50.0)
+    L, P = cache.kalman(state.physics, kalman_config["Q"], kalman_config["R"], 50.0)
+    swapped.set_gains(lqr_config, cache.lqr(state.physics, lqr_config["Q"], lqr_config["R"], 50.0), kalman_config,
+                      Ad, Bd, L)
+    fresh = LQG(lqr_config=lqr_config, kalman_config=kalman_config, physics=state.physics, cache=cache)
+    sp = dict.fromkeys(KEYS, 0.0)
+    for y in np.random.default_rng(1).normal(scale=0.05, size=(100, 4)).tolist():
+        assert swapped.loop(sp, *y, en=True)["out"] == pytest.approx(fresh.loop(sp, *y, en=True)["out"], abs=1e-10)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from lqr import LQR
+
+SP = {"p": 0.01, "x": -0.2, "pv": 0.0, "v": 0.1}
+
+
+@pytest.fixture
+def lqr(state, cache):
+    return LQR(config=state.lqr.config, physics=state.physics, freq=50.0, cache=cache)
+
+
+def test_output_is_state_feedback(lqr):
+    x = np.array([0.02, 0.1, -0.05, 0.3])
+    out = lqr.loop(SP, *x, {"en": True})["out"]
+    expected = -float(lqr.Gains[0] @ (x - [SP["p"], SP["x"], SP["pv"], SP["v"]]))
+    assert isinstance(out, float)
+    assert out == pytest.approx(expected, rel=1e-12)
+    assert out != 0.0
+
+
+def test_saturation(lqr):
+    # a large pitch error drives the command into the limit of its sign
+    assert lqr.loop(SP, 1.0, 0.0, 0.0, 0.0, {"en": True})["out"] == lqr.max
+    assert lqr.loop(SP, -1.0, 0.0, 0.0, 0.0, {"en": True})["out"] == lqr.min
+
+
+def test_disabled(lqr):
+    assert lqr.loop(SP, 0.02, 0.1, -0.05, 0.3, {"en": False})["out"] == 0.0
@@ -0,0 +1,56 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from orientation import quaternion_to_euler, quaternions_to_euler, euler_to_quaternion
+
+R = pytest.importorskip("scipy.spatial.transform").Rotation
+
+
+def angle_error(a, b):
+    diff = np.abs(np.asarray(a) - np.asarray(b))
+    return np.minimum(diff, 2 * np.pi - diff).max()
+
+
+@pytest.fixture(scope="module")
+def quat():
+    rng = np.random.default_rng(0)
+    random = rng.normal(size=(20000, 4))
+    # gimbal lock and its neighbourhood
+    lock = R.from_euler("xyz", np.column_stack([
+        rng.uniform(-np.pi, np.pi, 400),
+        np.repeat([np.pi / 2, -np.pi / 2, np.pi / 2 - 1e-6, -np.pi / 2 + 1e-9], 100),
+        rng.uniform(-np.pi, np.pi, 400)])).as_quat()
+    return np.vstack([random, lock, np.eye(4), -np.eye(4)])
+
+
+@pytest.fixture(scope="module")
+def expected(quat):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return R.from_quat(quat).as_euler("xyz")
+
+
+def test_scalar_matches_scipy(quat, expected):
+    scalar = np.array([quaternion_to_euler(*q) for q in quat])
+    assert angle_error(scalar, expected) < 1e-9
+
+
+def test_batched_matches_scipy(quat, expected):
+    assert angle_error(quaternions_to_euler(quat), expected) < 1e-9
+
+
+def test_scalar_first(quat, expected):
+    assert angle_error(quaternions_to_euler(quat[:, [3, 0, 1, 2]], scalar_first=True), expected) < 1e-9
+
+
+def test_unnormalized_quaternion():
+    q = np.array(euler_to_quaternion(0.1, -0.4, 2.0))
+    assert angle_error(quaternion_to_euler(*(3.5 * q)), (0.1, -0.4, 2.0)) < 1e-12
+
+
+def test_euler_roundtrip(expected):
+    roundtrip = np.array([quaternion_to_euler(*euler_to_quaternion(*e)) for e in expected[:1000]])
+    assert angle_error(roundtrip, expected[:1000]) < 1e-9
+
@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+import pytest
+
+from pid import PID, PIDBank
+
+
+class ArrayPID(PID):
+    """loop() as before: gains converted to 0-d arrays on every call."""
+    def loop(self, sp, x, data, dt=None):
+        self.sp = sp
+        self.config = data["config"]
+        self.Kp = np.array(self.config["Kp"])
+        self.Ki = np.array(self.config["Ki"])
+        self.Kd = np.array(self.config["Kd"])
+        self.en = data["en"]
+        self.x = x
+        self._loop(dt)
+        return self.data
+
+
+class ScalarPID:
+    """One PIDBank channel written out with floats."""
+    def __init__(self, config):
+        self.Kp, self.Ki, self.Kd = config["Kp"], config["Ki"], config["Kd"]
+        self.Kb = config.get("Kb", self.Ki / self.Kp)
+        self.min = config.get("min", -math.inf)
+        self.max = config.get("max", math.inf)
+        cutoff = config.get("cutoff")
+        self.Tf = 0.0 if cutoff is None else 1 / (2 * math.pi * cutoff)
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.prev_error = None
+
+    def loop(self, sp, x, en, dt):
+        if not en:
+            return 0.0
+        e = sp - x
+        alpha = dt / (self.Tf + dt)
+        d = (1 - alpha) * self.derivative
+        if self.prev_error is not None:
+            d += alpha * (e - self.prev_error) / dt
+        u = self.Kp * e + self.integral + self.Kd * d
+        out = min(max(u, self.min), self.max)
+        self.integral += self.Ki * dt * e + self.Kb * dt * (out - u)
+        self.derivative = d
+        self.prev_error = e
+        return out
+
+
+CHANNELS = {
+    "pitch": {"Kp": 15.0, "Ki": 1.0, "Kd": 0.1, "min": -2.0, "max": 2.0},
+    "yaw": {"Kp": 2.0, "Ki": 4.0, "Kd": 0.05, "cutoff": 5.0, "min": -1.0, "max": 1.0},
+    "velocity": {"Kp": 0.5, "Ki": 0.2, "Kd": 0.0, "Kb": 0.0},
+}
+
+
+def test_pid_matches_arrays():
+    data = {"config": {"Kp": 15, "Ki": 1, "Kd": 0.1}, "en": True}
+    fast = PID(config=data["config"], mini=-50, maxi=50)
+    reference = ArrayPID(config=data["config"], mini=-50, maxi=50)
+    for sp, x in np.random.default_rng(0).normal(size=(2000, 2)).tolist():
+        a = fast.loop(sp, x, data, dt=0.02)["out"]
+        assert a == pytest.approx(float(reference.loop(sp, x, data, dt=0.02)["out"]), abs=1e-12)
+
+
+def test_pid_new_config():
+    data = {"config": {"Kp": 1.0, "Ki": 0.0, "Kd": 0.0}, "en": True}
+    pid = PID(config=data["config"], mini=-50, maxi=50)
+    assert pid.loop(1.0, 0.0, data, dt=0.02)["out"] == pytest.approx(1.0)
+    data["config"] = {"Kp": 3.0, "Ki": 0.0, "Kd": 0.0}
+    assert pid.loop(1.0, 0.0, data, dt=0.02)["out"] == pytest.approx(3.0)
+
+
+def test_bank_matches_scalar():
+    """Clipping, derivative filter, en mask, reset and a changing dt against the scalar channels."""
+    bank = PIDBank(channels=CHANNELS)
+    singles = [ScalarPID(config) for config in CHANNELS.values()]
+    rng = np.random.default_rng(1)
+    for k in range(600):
+        sp = rng.normal(size=3) * 2
+        x = rng.normal(size=3)
+        en = [True, True, True] if k < 100 else (rng.random(3) > 0.2).tolist()
+        dt = 0.02 if k % 50 else 0.035
+        if k == 300:
+            bank.reset(["yaw"])
+            singles[1].reset()
+        out = bank.loop(sp, x, en=en if k >= 100 else True, dt=dt)
+        reference = [pid.loop(s, xi, e, dt) for pid, s, xi, e in zip(singles, sp.tolist(), x.tolist(), en)]
+        np.testing.assert_allclose(out, reference, rtol=0, atol=1e-9)
+    assert bank.output("pitch") == out[0]
+
+
+def test_back_calculation_limits_overshoot():
+    """Step on an integrator with a clipped output: back-calculation overshoots less than Kb = 0."""
+    config = CHANNELS["yaw"]
+    bank = PIDBank(channels={"back_calculation": config, "none": dict(config, Kb=0.0)})
+    y = np.zeros(2)
+    peak = np.zeros(2)
+    for _ in range(500):
+        y += bank.loop(1.0, y, dt=0.02) * 0.02
+        peak = np.maximum(peak, y)
+    assert peak[0] < peak[1]
+    assert y == pytest.approx([1.0, 1.0], abs=0.01)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import replay as replay_module
+from kalman import KalmanFilter
+from lqr import LQR
+from replay import replay
+
+FREQ = 50.0
+
+
+@pytest.fixture
+def log():
+    """Recorded-like measurements and inputs, 2000 samples at 50 Hz."""
+    rng = np.random.default_rng(0)
+    t = np.arange(2000) / FREQ
+    y = np.column_stack([0.02 * np.sin(2 * np.pi * 0.5 * t), 0.1 * np.sin(2 * np.pi * 0.05 * t),
+                         0.02 * np.pi * np.cos(2 * np.pi * 0.5 * t), 0.01 * np.pi * np.cos(2 * np.pi * 0.05 * t)])
+    y += rng.normal(scale=[0.005, 0.001, 0.05, 0.02], size=y.shape)
+    u = 20 * np.sin(2 * np.pi * 0.5 * t) + rng.normal(scale=2.0, size=t.size)
+    return y, u
+
+
+def test_matches_kalman_and_lqr(state, cache, log):
+    y, u = log
+    kf = KalmanFilter(config=state.kalman.config, physics=state.physics, freq=FREQ, cache=cache)
+    lqr = LQR(config=state.lqr.config, physics=state.physics, freq=FREQ, cache=cache)
+    zero = {"p": 0.0, "x": 0.0, "pv": 0.0, "v": 0.0}
+    reference = np.empty_like(y)
+    reference_u = np.empty(len(u))
+    for k in range(len(u)):
+        kf.loop(*y[k], u=u[k], data=None)
+        reference[k] = kf.x_hat
+        reference_u[k] = lqr.loop(zero, *kf.x_hat, {"en": True})["out"]
+
+    result = replay(y, u, state.physics, state.kalman.config, FREQ, lqr_config=state.lqr.config, cache=cache)
+    np.testing.assert_allclose(result["x"], reference, rtol=0, atol=1e-10)
+    np.testing.assert_allclose(result["u_lqr"], reference_u, rtol=0, atol=1e-8)
+    np.testing.assert_allclose(result["innovation"], y - result["x_pred"], rtol=0, atol=1e-15)
+
+
+def test_recursions_agree(state, cache, log):
+    """The numpy recursion and the loop (compiled by numba if installed) give the same estimates."""
+    y, u = log
+    result = replay(y, u, state.physics, state.kalman.config, FREQ, cache=cache)
+    L, P = result["L"], result["P"]
+    Ad, Bd = cache.discrete(state.physics, FREQ)
+    I_LC = np.eye(4) - L
+    F = np.ascontiguousarray(I_LC @ Ad)
+    drive = np.outer(u, I_LC @ Bd[:, 0]) + y @ L.T
+    x0 = np.zeros(4)
+    numpy_x = replay_module._recursion_numpy(F, drive, x0, np.empty_like(y))
+    loop_x = replay_module._recursion_loop(F, drive, x0, np.empty_like(y))
+    np.testing.assert_allclose(numpy_x, result["x"], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(loop_x, result["x"], rtol=0, atol=1e-12)
@@ -0,0 +1,150 @@
+import pytest
+
+from clock import VirtualClock
+from scheduler import LoopScheduler, RateGroupScheduler, SKIP, CATCH_UP, RESYNC
+
+
+def loop_scheduler(policy, freq=100.0):
+    clock = VirtualClock()
+    return clock, LoopScheduler(freq=freq, policy=policy, spin=0.0, clock=clock, sleep=clock.sleep)
+
+
+def test_deadlines_on_time():
+    clock, loop = loop_scheduler(SKIP)
+    times = [loop.wait() for _ in range(100)]
+    assert times == pytest.approx([0.01 * (k + 1) for k in range(100)])
+    assert loop.dt == pytest.approx(0.01)
+    stats = loop.stats()
+    assert stats["ticks"] == 100
+    assert stats["overruns"] == stats["skipped"] == 0
+    assert stats["lateness_max"] == pytest.approx(0.0, abs=1e-12)
+
+
+@pytest.mark.parametrize("policy, after", [
+    (SKIP, [0.04, 0.05]),        # 0.02 and 0.03 are dropped, back on the original grid
+    (CATCH_UP, [0.035, 0.04]),   # the missed tick runs at once, then the grid again
+    (RESYNC, [0.045, 0.055]),    # new grid one period after the late tick
+])
+def test_overrun_policies(policy, after):
+    clock, loop = loop_scheduler(policy)
+    assert loop.wait() == pytest.approx(0.01)
+    clock.advance(0.025)  # the tick takes 2.5 periods
+    assert loop.wait() == pytest.approx(0.035)
+    assert loop.last_lateness == pytest.approx(0.015)
+    assert [loop.wait() for _ in after] == pytest.approx(after)
+    assert loop.overruns == 1
+    assert loop.skipped == (1 if policy == SKIP else 0)
+    assert loop.stats()["lateness_max"] == pytest.approx(0.015)
+
+
+def test_lateness_stats():
+    clock, loop = loop_scheduler(RESYNC)
+    for k in range(10):
+        loop.wait()
+        clock.advance(0.012 if k % 2 else 0.0)  # the next tick 2 ms late, no overrun
+    stats = loop.stats()
+    assert stats["ticks"] == 10
+    assert stats["overruns"] == 0
+    assert stats["lateness_mean"] == pytest.approx(0.0008)
+    assert stats["lateness_max"] == pytest.approx(0.002)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        LoopScheduler(policy="later")
+
+
+def rate_groups(policy=SKIP):
+    clock = VirtualClock()
+    timer = VirtualClock()
+    scheduler = RateGroupScheduler(base_freq=100.0, policy=policy, spin=0.0, clock=clock, sleep=clock.sleep,
+                                   timer=timer)
+    return clock, timer, scheduler
+
+
+def test_rate_group_phasing():
+    clock, timer, scheduler = rate_groups()
+    calls = {"fast": [], "slow": [], "shifted": []}
+    for name, freq, phase in (("fast", 100.0, 0), ("slow", 25.0, 0), ("shifted", 25.0, 1)):
+        scheduler.add(name, lambda now, dt, name=name: calls[name].append((now, dt)), freq, phase=phase)
+    assert scheduler.major_frame == 4
+    for _ in range(12):
+        scheduler.run_once()
+    assert [now for now, _ in calls["fast"]] == pytest.approx([0.01 * (k + 1) for k in range(12)])
+    assert [now for now, _ in calls["slow"]] == pytest.approx([0.01, 0.05, 0.09])
+    assert [now for now, _ in calls["shifted"]] == pytest.approx([0.02, 0.06, 0.10])
+    # dt since the last run of the task, the first one gets its nominal period
+    assert [dt for _, dt in calls["slow"]] == pytest.approx([0.04, 0.04, 0.04])
+    assert scheduler.stats()["slow"]["calls"] == 3
+
+
+def test_skipped_frames_keep_phase():
+    """Minor frames dropped by SKIP still count, a 25 Hz task stays on its 40 ms grid."""
+    clock, timer, scheduler = rate_groups()
+    times = []
+    slow = [0.025]  # one tick takes 2.5 minor frames
+
+    def work(now, dt):
+        if len(times) == 2 and slow:
+            clock.advance(slow.pop())
+
+    scheduler.add("control", lambda now, dt: times.append(now), 25.0)
+    scheduler.add("work", work, 100.0)
+    for _ in range(12):
+        scheduler.run_once()
+    # the frame at 0.06 s is dropped, the late tick at 0.075 s is the one of 0.07 s
+    assert scheduler.loop.skipped == 1
+    assert [round(t * 100) % 4 for t in times] == [1] * len(times)
+
+
+def test_task_budgets():
+    clock, timer, scheduler = rate_groups()
+    scheduler.add("imu", lambda now, dt: timer.advance(0.002), 100.0)    # 2 ms of 10 ms
+    scheduler.add("eyes", lambda now, dt: timer.advance(0.012), 25.0, phase=1)  # 12 ms of 40 ms
+    for _ in range(8):
+        scheduler.run_once()
+    stats = scheduler.stats()
+    assert stats["major_frame"] == pytest.approx(0.04)
+    assert stats["imu"]["budget"] == pytest.approx(0.2)
+    assert stats["eyes"]["budget"] == pytest.approx(0.3)
+    assert stats["eyes"]["time_max"] == pytest.approx(0.012)
+    # the execution time comes from the timer, the simulated clock did not move during the tasks
+    assert clock() == pytest.approx(0.08)
+    assert scheduler.loop.overruns == 0
+    assert "summe:50.0%" in scheduler.report()
+
+
+def test_budget_overrun():
+    """A task longer than two frames: budget over 100 % and overruns of the loop."""
+    clock, timer, scheduler = rate_groups()
+
+    def slow(now, dt):
+        timer.advance(0.0245)
+        clock.advance(0.0245)
+
+    scheduler.add("slow", slow, 100.0)
+    for _ in range(4):
+        scheduler.run_once()
+    stats = scheduler.stats()
+    assert stats["slow"]["calls"] == 4
+    assert stats["slow"]["budget_max"] == pytest.approx(2.45)
+    assert scheduler.loop.overruns >= 2
+    assert scheduler.loop.skipped >= scheduler.loop.overruns
+
+
+def test_failing_task_does_not_stop_the_others():
+    clock, timer, scheduler = rate_groups()
+    calls = []
+    scheduler.add("broken", lambda now, dt: 1 / 0, 100.0)
+    scheduler.add("next", lambda now, dt: calls.append(now), 100.0)
+    scheduler.run_once()
+    scheduler.run_once()
+    assert len(calls) == 2
+
+
+def test_add_checks_rate_and_phase():
+    clock, timer, scheduler = rate_groups()
+    with pytest.raises(ValueError):
+        scheduler.add("odd", lambda now, dt: None, 30.0)
+    with pytest.raises(ValueError):
+        scheduler.add("late", lambda now, dt: None, 50.0, phase=2)
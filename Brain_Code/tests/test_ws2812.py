@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import ws2812
+from hal import NullSPI
+
+
+class RecordingSPI(NullSPI):
+    """NullSPI that keeps the last transfer."""
+    def xfer(self, data, speed_hz=0, *args):
+        self.sent = bytes(data)
+        return super().xfer(data, speed_hz, *args)
+
+    def writebytes2(self, data):
+        self.sent = bytes(data)
+        super().writebytes2(data)
+
+
+def reference(data):
+    spi = RecordingSPI()
+    ws2812.write2812_numpy4(spi, data)
+    return spi.sent
+
+
+@pytest.mark.parametrize("numpy_imported", [True, False])
+def test_encoder_matches_write2812(monkeypatch, numpy_imported):
+    monkeypatch.setattr(ws2812, "NumpyImported", numpy_imported)
+    spi = RecordingSPI()
+    encoder = ws2812.WS2812Encoder(spi, 4)
+    data = np.random.default_rng(0).integers(0, 256, size=(4, 3)).tolist()
+    encoder.write(data)
+    assert spi.sent == reference(data)
+    # more LEDs than allocated: the buffer grows
+    data = data * 3
+    encoder.write(data)
+    assert spi.sent == reference(data)
+
+
+def test_encoder_incomplete_led():
+    """Data that is not whole GRB triplets is encoded as it is."""
+    spi = RecordingSPI()
+    encoder = ws2812.WS2812Encoder(spi, 8)
+    data = np.arange(250, dtype=np.uint8)
+    encoder.write(data)
+    assert encoder.n_leds == 84
+    assert spi.sent == reference(data)
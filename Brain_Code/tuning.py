@@ -0,0 +1,95 @@
+import copy
+import logging
+import multiprocessing
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from model_cache import ModelCache, DEFAULT_PATH
+
+
+def compute_gains(physics, freq, lqr_config, kalman_config, path=DEFAULT_PATH):
+    """Runs in the worker process: LQR gain and Kalman matrices for the new weights."""
+    cache = ModelCache(name="ModelCache_Worker", path=path)
+    K = cache.lqr(physics, lqr_config["Q"], lqr_config["R"], freq)
+    Ad, Bd = cache.discrete(physics, freq)
+    L, P = cache.kalman(physics, kalman_config["Q"], kalman_config["R"], freq)
+    return {
+        "lqr": {"config": lqr_config, "K": K},
+        "kalman": {"config": kalman_config, "Ad": Ad, "Bd": Bd, "L": L, "P": P}
+    }
+
+
+def _warmup():
+    return True
+
+
+class GainTuner:
+    """
+    Recomputes LQR and Kalman gains in a worker process.
+
+    request() only submits the job, poll() is called once per tick and returns
+    the finished result, so the loop can swap the matrices in between two
+    ticks and dlqr/dlqe never run inside the control period. Requests that
+    arrive while a job is running are coalesced, only the newest one is
+    submitted by the next flush() (submitting pickles the job, so it is kept
+    out of the control tick). Every applied result increases `version`.
+    """
+    def __init__(self, physics, freq, name="GainTuner", logging_level=logging.INFO, path=DEFAULT_PATH):
+        self.physics = dict(physics)
+        self.freq = freq
+        self.path = path
+        self.version = 0
+        self.future = None
+        self.pending = None
+        self.failures = 0
+
+        # spawn: the controller process already runs reader threads, fork is not safe then;
+        # the worker imports the main module once, which is guarded by __name__ == "__main__"
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging_level)
+
+    def start(self):
+        """Starts the worker now instead of at the first request (import of numpy/control takes seconds)."""
+        self.executor.submit(_warmup)
+
+    def request(self, lqr_config, kalman_config):
+        configs = (copy.deepcopy(lqr_config), copy.deepcopy(kalman_config))
+        if self.future is None:
+            self._submit(configs)
+        else:
+            self.pending = configs
+
+    def flush(self):
+        """Submits a coalesced request once the worker is free."""
+        if self.future is None and self.pending is not None:
+            self._submit(self.pending)
+            self.pending = None
+
+    def _submit(self, configs):
+        self.future = self.executor.submit(compute_gains, self.physics, self.freq, *configs, path=self.path)
+
+    @property
+    def busy(self):
+        return self.future is not None or self.pending is not None
+
+    def poll(self):
+        """Result of a finished job or None, never blocks."""
+        future = self.future
+        if future is None or not future.done():
+            return None
+        self.future = None
+        try:
+            result = future.result()
+        except Exception as e:
+            self.failures += 1
+            self.logger.error(f"Neuberechnung der Gains fehlgeschlagen: {e}")
+            traceback.print_exc()
+            return None
+        self.version += 1
+        result["version"] = self.version
+        return result
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
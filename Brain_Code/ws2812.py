@@ -78,6 +78,89 @@ else:
     write2812=write2812_pylist4    
 
 
+# SPI clock of the 4-bit encoding (4 SPI bits per 1.25 us WS2812 bit), as in write2812_numpy4
+SPEED_HZ4=int(4/1.25e-6)
+
+def pattern4(byte):
+    """The 4 SPI bytes of one colour byte, 2 WS2812 bits per SPI byte (same as write2812_numpy4)."""
+    return bytes(((byte>>(2*ibit+1))&1)*0x60 + ((byte>>(2*ibit+0))&1)*0x06 + 0x88
+                 for ibit in range(3,-1,-1))
+
+def make_table4(gamma=1.0, brightness=1.0):
+    """256 SPI patterns, index = colour byte; gamma and brightness are applied before the encoding."""
+    table=[]
+    for value in range(256):
+        corrected=int(round(255*brightness*(value/255.0)**gamma))
+        table.append(pattern4(min(max(corrected,0),255)))
+    return table
+
+class WS2812Encoder:
+    """
+    Table based encoder with a persistent SPI buffer.
+
+    Every colour byte is replaced by its 4 byte pattern from a 256 entry table
+    (gamma/brightness folded in), written into a buffer that is allocated once
+    and handed to spidev's writebytes2(), which takes any buffer object, so no
+    list of Python ints is built per frame. The SPI clock is set once with
+    max_speed_hz (xfer() got it per call). Without writebytes2 (spidev < 3.3)
+    the buffer is sent with xfer() like before.
+    """
+    def __init__(self, spi, n_leds, gamma=1.0, brightness=1.0, speed_hz=SPEED_HZ4):
+        self.spi=spi
+        self.speed_hz=speed_hz
+        self.n_leds=0
+        self.set_table(gamma, brightness)
+        self._allocate(n_leds)
+        spi.max_speed_hz=speed_hz
+        self.write_buffer=getattr(spi, "writebytes2", None)
+
+    def set_table(self, gamma=1.0, brightness=1.0):
+        self.gamma=gamma
+        self.brightness=brightness
+        table=make_table4(gamma, brightness)
+        if NumpyImported:
+            self.table=numpy.frombuffer(b"".join(table), dtype=numpy.uint8).reshape(256,4)
+        else:
+            self.table=table
+
+    def _allocate(self, n_leds):
+        self.n_leds=n_leds
+        if NumpyImported:
+            self.buffer=numpy.zeros(n_leds*3*4, dtype=numpy.uint8)
+            self.patterns=self.buffer.reshape(n_leds*3,4)
+        else:
+            self.buffer=bytearray(n_leds*3*4)
+
+    def encode(self, data):
+        """Encodes [[G,R,B], ...] (or an uint8 array) into the buffer, returns the used part."""
+        if NumpyImported:
+            d=numpy.asarray(data, dtype=numpy.uint8).reshape(-1)
+            n=d.shape[0]
+            if n>3*self.n_leds:
+                self._allocate(-(-n//3))  # also a last incomplete LED
+            # indices are uint8 into 256 rows: mode="clip" never clips, but writes into out directly
+            # (mode="raise" goes through a temporary array)
+            numpy.take(self.table, d, axis=0, out=self.patterns[:n], mode="clip")
+            return self.buffer[:4*n]
+        n=0
+        table=self.table
+        buffer=self.buffer
+        for rgb in data:
+            for byte in rgb:
+                if 4*n>=len(buffer):
+                    buffer.extend(bytes(4))
+                buffer[4*n:4*n+4]=table[byte]
+                n+=1
+        return memoryview(buffer)[:4*n]
+
+    def write(self, data):
+        tx=self.encode(data)
+        if self.write_buffer is not None:
+            self.write_buffer(tx)
+        else:
+            self.spi.xfer(list(tx), self.speed_hz)
+
+
 if __name__=="__main__":
     import spidev
     import time
@@ -0,0 +1,233 @@
+"""
+Closed-loop tuning sweep for the LQR and Kalman weights.
+
+Every candidate is simulated with the linear model of Brain_Code/lqr.py at
+the controller rate: plant -> sensor noise -> FilterBank stages as in
+main_loop -> steady-state Kalman filter -> LQR with saturation at ±min_max.
+Settling and saturation time come from the noise-free response to the
+initial tilt, control effort and pitch RMS from the same run with sensor
+noise (same noise sequence for every candidate). The simulations run in a
+process pool, the candidates are ranked by settling time, control effort and
+saturation time (in this order; settling times within --resolution count as
+equal, so the effort decides between them) and written to a CSV table; the
+best one is printed in the config_changer.py format.
+
+Examples:
+    python LQR-Sweep.py --samples 2000 --span 4
+    python LQR-Sweep.py --mode grid --vary lqr_Q0 lqr_Q2 lqr_R --points 7
+    python LQR-Sweep.py --vary lqr_Q0 lqr_Q1 kalman_Q0 kalman_R0 --samples 5000 --output sweep.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Brain_Code"))
+
+from LowPass import FilterBank
+from model_cache import ModelCache
+from state import State
+
+PARAMETERS = (["lqr_Q0", "lqr_Q1", "lqr_Q2", "lqr_Q3", "lqr_R"]
+              + [f"kalman_Q{i}" for i in range(4)] + [f"kalman_R{i}" for i in range(4)])
+
+_cache = None
+
+
+def base_candidate(state):
+    lqr, kalman = state.lqr.config, state.kalman.config
+    values = list(lqr["Q"]) + [lqr["R"]] + list(kalman["Q"]) + list(kalman["R"])
+    return dict(zip(PARAMETERS, [float(v) for v in values]))
+
+
+def configs(candidate):
+    """LQR and Kalman config dicts of a candidate."""
+    return ({"Q": [candidate[f"lqr_Q{i}"] for i in range(4)], "R": candidate["lqr_R"]},
+            {"Q": [candidate[f"kalman_Q{i}"] for i in range(4)], "R": [candidate[f"kalman_R{i}"] for i in range(4)]})
+
+
+def _run(Ad, Bd, F, G, L, K, noise, dt, settings):
+    """One closed-loop run: plant -> noise -> FilterBank -> Kalman -> LQR with saturation."""
+    filters = FilterBank([("pitch", settings["lp_pitch"]), ("gyro_x", settings["lp_gyro"]),
+                          ("velocity", settings["lp_vel"])], dt=dt)
+    min_max = settings["min_max"]
+    tol = np.array(settings["tol"])
+    steps = noise.shape[0]
+
+    x = np.array(settings["x0"], dtype=np.float64)
+    x_hat = np.zeros(4)
+    u = 0.0
+    last_outside = 0
+    saturated = 0
+    effort = 0.0
+    pitch_sq = 0.0
+    fell = False
+    for k in range(steps):
+        y = x + noise[k]
+        y[0], y[2], y[3] = filters.filter((y[0], y[2], y[3]), dt).tolist()
+        # Kalman mit dem Stellwert des vorherigen Ticks, wie in main_loop
+        x_hat = F @ x_hat + G * u + L @ y
+        u_raw = -float(K @ x_hat)
+        u = min(max(u_raw, -min_max), min_max)
+        if u != u_raw:
+            saturated += 1
+        effort += u * u * dt
+        x = Ad @ x + Bd * u
+        pitch_sq += x[0] * x[0]
+        if np.any(np.abs(x) > tol):
+            last_outside = k + 1
+        if abs(x[0]) > settings["fall"]:
+            fell = True
+            break
+    return {
+        "settling": float("inf") if fell or last_outside == steps else last_outside * dt,
+        "saturation": saturated * dt,
+        "effort": effort,
+        "rms_pitch": float(np.sqrt(pitch_sq / (k + 1))),
+        "fell": fell
+    }
+
+
+def simulate(candidate, physics, settings):
+    """Closed-loop simulation of one candidate, returns the candidate with its metrics."""
+    global _cache
+    if _cache is None:
+        # per worker, in memory only: thousands of candidates should not end up in the gain cache
+        _cache = ModelCache(name="ModelCache_Sweep", path=None)
+    freq = settings["freq"]
+    dt = 1 / freq
+    lqr_config, kalman_config = configs(candidate)
+    result = dict(candidate)
+    try:
+        Ad, Bd = _cache.discrete(physics, freq)
+        K = _cache.lqr(physics, lqr_config["Q"], lqr_config["R"], freq)[0]
+        L, P = _cache.kalman(physics, kalman_config["Q"], kalman_config["R"], freq)
+    except Exception as e:
+        result.update({"settling": float("inf"), "saturation": float("inf"), "effort": float("inf"),
+                       "rms_pitch": float("inf"), "fell": True, "error": str(e)})
+        return result
+    I_LC = np.eye(4) - L
+    F = I_LC @ Ad
+    G = I_LC @ Bd[:, 0]
+    Bd = Bd[:, 0]
+
+    steps = int(settings["duration"] * freq)
+    noise = np.random.default_rng(settings["seed"]).normal(size=(steps, 4)) * settings["noise"]
+
+    # Sprungantwort ohne Rauschen: Ausregelzeit und Sättigung
+    clean = _run(Ad, Bd, F, G, L, K, np.zeros((steps, 4)), dt, settings)
+    # gleiche Anfangslage mit Sensorrauschen (für alle Kandidaten dasselbe): Stellaufwand, Unruhe, Umfallen
+    noisy = _run(Ad, Bd, F, G, L, K, noise, dt, settings)
+    result.update({
+        "settling": clean["settling"],
+        "saturation": clean["saturation"],
+        "effort": noisy["effort"],
+        "rms_pitch": noisy["rms_pitch"],
+        "fell": clean["fell"] or noisy["fell"],
+        "K0": float(K[0]), "K1": float(K[1]), "K2": float(K[2]), "K3": float(K[3])
+    })
+    return result
+
+
+def make_candidates(base, args):
+    rng = np.random.default_rng(args.seed)
+    candidates = [dict(base)]
+    if args.mode == "grid":
+        axes = [np.geomspace(base[name] / args.span, base[name] * args.span, args.points) for name in args.vary]
+        for values in itertools.product(*axes):
+            candidate = dict(base)
+            candidate.update(zip(args.vary, (float(v) for v in values)))
+            candidates.append(candidate)
+    else:
+        for _ in range(args.samples):
+            candidate = dict(base)
+            for name in args.vary:
+                # log-uniform in [base / span, base * span]
+                candidate[name] = float(base[name] * args.span ** rng.uniform(-1, 1))
+            candidates.append(candidate)
+    return candidates
+
+
+def rank(results, resolution):
+    """Sorted by settling time in steps of `resolution` s, then control effort, then saturation time."""
+    def key(r):
+        settling = r["settling"]
+        if math.isfinite(settling):
+            settling = round(settling / resolution)
+        return r["fell"], settling, r["effort"], r["saturation"]
+    return sorted(results, key=key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop sweep of the LQR / Kalman weights")
+    parser.add_argument("--mode", choices=["random", "grid"], default="random")
+    parser.add_argument("--vary", nargs="+", default=["lqr_Q0", "lqr_Q1", "lqr_Q2", "lqr_Q3", "lqr_R"],
+                        choices=PARAMETERS, help="parameters to sweep, the others keep the values of state.py")
+    parser.add_argument("--samples", type=int, default=500, help="random mode: number of candidates")
+    parser.add_argument("--points", type=int, default=5, help="grid mode: values per parameter")
+    parser.add_argument("--span", type=float, default=4.0, help="range base / span ... base * span (log)")
+    parser.add_argument("--freq", type=float, default=50.0, help="controller rate in Hz")
+    parser.add_argument("--duration", type=float, default=10.0, help="simulated time in s")
+    parser.add_argument("--x0", type=float, nargs=4, default=[0.2, 0.0, 0.0, 0.0], help="initial state")
+    parser.add_argument("--noise", type=float, nargs=4, default=[0.005, 0.001, 0.05, 0.02],
+                        help="sensor noise std of [pitch, x, pitch velocity, v]")
+    parser.add_argument("--tol", type=float, nargs=4, default=[0.01, 0.05, 0.1, 0.1],
+                        help="settling tolerance per state (noise-free step response)")
+    parser.add_argument("--fall", type=float, default=np.radians(30.0), help="pitch limit in rad (main.tol)")
+    parser.add_argument("--resolution", type=float, default=0.1,
+                        help="settling times closer than this (s) rank as equal, the control effort decides")
+    parser.add_argument("--min-max", type=float, default=100.0, help="saturation of the command")
+    parser.add_argument("--lp", type=float, nargs=3, default=[25.0, 25.0, 5.0],
+                        help="low-pass cutoffs of pitch, gyro and wheel velocity in Hz")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="lqr_sweep.csv")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    state = State()
+    base = base_candidate(state)
+    candidates = make_candidates(base, args)
+    settings = {
+        "freq": args.freq, "duration": args.duration, "x0": args.x0, "noise": args.noise, "tol": args.tol,
+        "fall": args.fall, "min_max": args.min_max, "lp_pitch": args.lp[0], "lp_gyro": args.lp[1],
+        "lp_vel": args.lp[2], "seed": args.seed
+    }
+
+    workers = args.workers or os.cpu_count() or 1
+    chunksize = max(1, len(candidates) // (4 * workers))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(partial(simulate, physics=dict(state.physics), settings=settings),
+                                    candidates, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+    ranked = rank(results, args.resolution)
+
+    columns = ["rank"] + PARAMETERS + ["settling", "effort", "saturation", "rms_pitch", "fell", "K0", "K1", "K2", "K3"]
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for i, result in enumerate(ranked):
+            writer.writerow({"rank": i + 1, **result})
+
+    print(f"{len(candidates)} Kandidaten in {elapsed:.1f} s ({workers} Prozesse) -> {args.output}")
+    baseline = results[0]
+    print(f"aktuelle Werte: settling {baseline['settling']:.2f} s, effort {baseline['effort']:.0f}, "
+          f"saturation {baseline['saturation']:.2f} s, rms pitch {baseline['rms_pitch']:.4f}")
+    for i, result in enumerate(ranked[:args.top]):
+        print(f"{i + 1:3d}: settling {result['settling']:.2f} s, effort {result['effort']:.0f}, "
+              f"saturation {result['saturation']:.2f} s, rms pitch {result['rms_pitch']:.4f}  " + ", ".join(f"{name}={result[name]:.3g}" for name in args.vary))
+    lqr_config, kalman_config = configs(ranked[0])
+    print("Config:", json.dumps({"lqr": lqr_config, "kalman": kalman_config}))
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,66 @@ void doTarget(char *cmd) {
   // Serial.println(latency);
 }
 
+// binary command frame: 0x02 <uint8 seq> <uint8 flags> <float target> <uint8 checksum> 0x03
+// flags bit 0 = enable, checksum = XOR of seq, flags and target bytes
+const uint8_t CMD_FRAME_SIZE = 9;
+uint8_t frame_buf[CMD_FRAME_SIZE];
+uint8_t frame_len = 0;
+uint8_t last_seq = 0;
+// ASCII line for the commander (fallback protocol)
+char line_buf[64];
+uint8_t line_len = 0;
+
+bool handleCommandFrame() {
+  uint8_t checksum = 0;
+  for (uint8_t i = 1; i < CMD_FRAME_SIZE - 2; i++) {
+    checksum ^= frame_buf[i];
+  }
+  if (frame_buf[CMD_FRAME_SIZE - 1] != 0x03 || frame_buf[CMD_FRAME_SIZE - 2] != checksum) {
+    return false;
+  }
+  last_seq = frame_buf[1];
+  float target;
+  memcpy(&target, &frame_buf[3], sizeof(float));
+  if (frame_buf[2] & 0x01) {
+    if (!motor.enabled) motor.enable();
+    motor.target = target;
+  } else {
+    motor.target = 0;
+    if (motor.enabled) motor.disable();
+  }
+  return true;
+}
+
+void readSerial() {
+  while (Serial.available()) {
+    uint8_t ch = Serial.read();
+    // binary frames start with 0x02, which never occurs in a commander line
+    if (frame_len > 0 || (line_len == 0 && ch == 0x02)) {
+      frame_buf[frame_len++] = ch;
+      if (frame_len == CMD_FRAME_SIZE) {
+        if (handleCommandFrame()) {
+          frame_len = 0;
+        } else {
+          // resync: continue at the next start marker inside the buffer
+          uint8_t start = 1;
+          while (start < CMD_FRAME_SIZE && frame_buf[start] != 0x02) start++;
+          frame_len = CMD_FRAME_SIZE - start;
+          memmove(frame_buf, &frame_buf[start], frame_len);
+        }
+      }
+      continue;
+    }
+    if (ch == '\n') {
+      line_buf[line_len] = 0;
+      command.run(line_buf);
+      line_len = 0;
+    } else if (line_len < sizeof(line_buf) - 1) {
+      line_buf[line_len++] = ch;
+    }
+  }
+}
+
 void setup()
 {
 
@@ -121,10 +181,8 @@ void setup()
 
 void loop()
 {
-  // user communication
-  while (Serial.available()) {
-    command.run();
-  }
+  // user communication (commander lines and binary command frames)
+  readSerial();
 
   // main FOC algorithm
   motor.loopFOC();
@@ -1,43 +1,231 @@
-import serial
+"""
+Benchmark of the serial link between Brain_Code/motor.py and a motor board.
+
+Drives MOTOR against a real port or the PTY emulator (Brain_Code/motor_emulator.py)
+with one set() per tick at the setpoint rate. Between the ticks the benchmark
+waits on the port and timestamps every telemetry frame as it arrives, so the
+ticks do not block on frames and rates above the frame rate are reached.
+Every `step` seconds the setpoint jumps between -amplitude and +amplitude,
+the other ticks only dither it slightly so every tick writes a command.
+Reports for every protocol and setpoint rate:
+    latency     round trip: setpoint step written until a telemetry frame reports
+                the velocity moved by `threshold` in the step direction (ms),
+                includes the command latency, the motor response and the report cycle
+    setpoint_hz commands written per second
+    fps         telemetry frames received per second
+    parse_us    parser time per received frame (µs)
+    drops/resyncs of the parser and, with the emulator, frames lost on the way
+
+Examples:
+    python Serial_Benchmark.py --rates 50 100 200 --protocols ascii binary
+    python Serial_Benchmark.py --port /dev/ttyACM0 --duration 10 --output result.json
+    python Serial_Benchmark.py --corrupt 0.01 --drop 0.01 --jitter 0.001
+    python Serial_Benchmark.py --latency 0.05 --rates 50
+"""
+import argparse
+import json
+import os
+import platform
+import select
+import sys
 import time
-import matplotlib.pyplot as plt
-
-# Öffne die serielle Verbindung
-ser = serial.Serial('COM5', 921600, timeout=0.1)
-time.sleep(2)  # Warten bis Arduino bereit ist
-
-# Ergebnisse speichern
-latenzen = []
-
-print("Starte Test...")
-
-for i in range(1000):
-    # Sende T-Befehl (z.B. mit Ziel 0.0)
-    string = "T0.000\n"
-    ser.write(string.encode('utf-8'))
-
-    start_time = time.perf_counter()
-
-    # Warten auf Antwort
-    while True:
-        line = ser.readline().decode('utf-8').strip()
-        print(line)
-        if line.startswith("Latenz(us):"):
-            latency_us = int(line.split(':')[1])
-            latenzen.append(1/(latency_us/1000000.0))
-            print(f"{i + 1}/1000: {latency_us/1000.0} ms")
-            break
-
-    # Minimal warten, bevor nächster Befehl kommt
-    dl = 1/100.0
-    time.sleep(dl)
-
-ser.close()
-
-# Plot anzeigen
-plt.plot(latenzen, marker='o')
-plt.xlabel('Befehl #')
-plt.ylabel('Frequenz')
-plt.title('Arduino Antwort-Latenz')
-plt.grid(True)
-plt.show()
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Brain_Code"))
+
+from motor import MOTOR
+from motor_emulator import MotorEmulator
+from scheduler import LoopScheduler
+
+
+def percentiles(values, scale=1.0):
+    if not values:
+        return None
+    values = np.asarray(values) * scale
+    return {
+        "count": int(values.size),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max())
+    }
+
+
+class TimedParse:
+    """Wraps TelemetryParser.parse() and sums up the time spent in it."""
+    def __init__(self, parser):
+        self.parse = parser.parse
+        self.ns = 0
+
+    def __call__(self, *args):
+        t = time.perf_counter_ns()
+        result = self.parse(*args)
+        self.ns += time.perf_counter_ns() - t
+        return result
+
+
+# setpoint change in percent between two ticks, keeps MOTOR from skipping unchanged commands
+DITHER = 0.1
+
+
+def run(motor, rate, duration, amplitude, step, threshold, emulator=None):
+    parser = motor.parser
+    timed = TimedParse(parser)
+    parser.parse = timed
+    frames, dropped, resyncs, overflows = parser.frames, parser.dropped, parser.resyncs, parser.overflows
+    writes = motor.writes
+    sent = emulator.frames_sent if emulator else 0
+
+    latency = []
+    parse_per_frame = []
+    steps = 0
+    timeouts = 0
+    step_time = None  # write time of the step waiting for its response
+    direction = 0.0
+    baseline = 0.0
+    velocity = 0.0
+
+    def receive(now):
+        """Takes the frames buffered now and checks the newest one for the step response."""
+        nonlocal step_time, velocity
+        n, ns = parser.frames, timed.ns
+        floats = motor._poll()
+        if parser.frames > n:
+            parse_per_frame.append((timed.ns - ns) / (parser.frames - n))
+        if floats is None:
+            return
+        velocity = floats[1]
+        if step_time is not None and (velocity - baseline) * direction > threshold:
+            latency.append(now - step_time)
+            step_time = None
+
+    def wait(seconds):
+        """Sleep of the scheduler: waits on the port and timestamps the frames as they arrive."""
+        deadline = time.perf_counter() + seconds
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            if motor.fd is not None:
+                select.select([motor.fd], [], [], remaining)
+            else:
+                time.sleep(min(remaining, 0.001))
+            receive(time.perf_counter())
+
+    scheduler = LoopScheduler(name="Benchmark", freq=rate, spin=0.0, sleep=wait)
+    scheduler.start()
+    start = time.perf_counter()
+    next_step = start + step
+    level = -amplitude
+    i = 0
+    while time.perf_counter() - start < duration:
+        now = scheduler.wait()
+        receive(now)
+        stepped = now >= next_step
+        if stepped:
+            if step_time is not None:
+                timeouts += 1
+            level = -level
+            direction = 1.0 if level > 0 else -1.0
+            baseline = velocity
+            next_step += step
+            steps += 1
+        sp = level + (DITHER if i % 2 else -DITHER)
+        i += 1
+        t = time.perf_counter()
+        motor.set({"en": True, "sp": sp})
+        if stepped:
+            step_time = t
+    elapsed = time.perf_counter() - start
+    if step_time is not None:
+        # the last step had no time to get its response
+        steps -= 1
+    motor.set({"en": False, "sp": 0.0})
+    parser.parse = timed.parse
+
+    frames = parser.frames - frames
+    result = {
+        "rate": rate,
+        "duration": elapsed,
+        "ticks": scheduler.ticks,
+        "overruns": scheduler.overruns,
+        "writes": motor.writes - writes,
+        "setpoint_hz": (motor.writes - writes) / elapsed,
+        "steps": steps,
+        "timeouts": timeouts,
+        "frames": frames,
+        "fps": frames / elapsed,
+        "dropped": parser.dropped - dropped,
+        "resyncs": parser.resyncs - resyncs,
+        "overflows": parser.overflows - overflows,
+        "latency_ms": percentiles(latency, 1e3),
+        "parse_us": percentiles(parse_per_frame, 1e-3),
+        "parse_total_us_per_frame": (timed.ns / 1000 / frames) if frames else None
+    }
+    if emulator is not None:
+        result["lost"] = emulator.frames_sent - sent - frames
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial link benchmark for MOTOR")
+    parser.add_argument("--port", default=None, help="serial port of a motor board (default: emulator)")
+    parser.add_argument("--protocols", nargs="+", default=["ascii", "binary"], choices=["ascii", "binary"])
+    parser.add_argument("--rates", nargs="+", type=float, default=[50.0, 100.0, 200.0], help="setpoint rates in Hz")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per rate")
+    parser.add_argument("--amplitude", type=float, default=10.0, help="setpoint in percent, alternating sign")
+    parser.add_argument("--step", type=float, default=0.5, help="time between two setpoint steps in s")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="velocity change in rad/s that counts as response to a step")
+    parser.add_argument("--aggregate", action="store_true", help="keep all frames in a FrameWindow")
+    parser.add_argument("--report-cycle", type=float, default=0.013, help="emulator: telemetry period in s")
+    parser.add_argument("--latency", type=float, default=0.0, help="emulator: command latency in s")
+    parser.add_argument("--jitter", type=float, default=0.0, help="emulator: report jitter in s")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="emulator: probability of a corrupted frame")
+    parser.add_argument("--drop", type=float, default=0.0, help="emulator: probability of a dropped frame")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    report = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": []
+    }
+    for protocol in args.protocols:
+        emulator = None
+        port = args.port
+        if port is None:
+            emulator = MotorEmulator(report_cycle=args.report_cycle, latency=args.latency, jitter=args.jitter,
+                                     corrupt=args.corrupt, drop=args.drop, seed=args.seed).start()
+            port = emulator.port
+        motor = MOTOR(name="Motor_Benchmark", port=port, protocol=protocol, aggregate=args.aggregate)
+        if motor.mot is None:
+            sys.exit(f"Port {port} konnte nicht geöffnet werden")
+        try:
+            for rate in args.rates:
+                result = run(motor, rate, args.duration, args.amplitude, args.step, args.threshold, emulator)
+                result["protocol"] = protocol
+                report["results"].append(result)
+                print(f"{protocol:6s} {rate:6.1f} Hz: {result['setpoint_hz']:6.1f} setpoints/s, {result['fps']:6.1f} fps, "
+                      f"latency p50 {result['latency_ms']['p50'] if result['latency_ms'] else float('nan'):.2f} ms, "
+                      f"resyncs {result['resyncs']}", file=sys.stderr)
+        finally:
+            motor.mot.close()
+            if emulator is not None:
+                emulator.close()
+
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out)
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()